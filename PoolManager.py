@@ -1,77 +1,104 @@
-﻿from web3 import Web3
-from typing import List, Dict, Optional
+﻿from typing import List, Dict, Optional, Iterator
+import json
 import time
+from functools import lru_cache
 from dotenv import load_dotenv
 import os
 
+import metrics
+import rpc_client
+from rpc_client import RpcClient
+from log_scanner import LogScanner
+from protocols import CHAINS, protocols_for_chain, compute_pool_address
+from price_oracle import PriceOracle
+from alert_triggers import is_in_range
+
 load_dotenv()
 
-class LiquidityPoolTracker:
+MAX_UINT128 = 2 ** 128 - 1
+POSITION_BATCH_SIZE = 10  # Positions fetched per batch request while streaming a wallet
+POSITION_EVENT_TOPICS = [rpc_client.TRANSFER_TOPIC, rpc_client.INCREASE_LIQUIDITY_TOPIC, rpc_client.DECREASE_LIQUIDITY_TOPIC]
+ABI_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "abis")
 
-    def __init__(self, rpc_url: str, chain_id: int = 1, delay_between_calls: float = 0.5):
-        self.w3 = Web3(Web3.HTTPProvider(rpc_url))
-        self.chain_id = chain_id
-        self.delay = delay_between_calls
-        self.last_call_time = 0
 
-        self.position_manager_abi = [{"inputs":[{"internalType":"address","name":"_factory","type":"address"},{"internalType":"address","name":"_WETH9","type":"address"},{"internalType":"address","name":"_tokenDescriptor_","type":"address"}],"stateMutability":"nonpayable","type":"constructor"},{"anonymous":False,"inputs":[{"indexed":True,"internalType":"address","name":"owner","type":"address"},{"indexed":True,"internalType":"address","name":"approved","type":"address"},{"indexed":True,"internalType":"uint256","name":"tokenId","type":"uint256"}],"name":"Approval","type":"event"},{"anonymous":False,"inputs":[{"indexed":True,"internalType":"address","name":"owner","type":"address"},{"indexed":True,"internalType":"address","name":"operator","type":"address"},{"indexed":False,"internalType":"bool","name":"approved","type":"bool"}],"name":"ApprovalForAll","type":"event"},{"anonymous":False,"inputs":[{"indexed":True,"internalType":"uint256","name":"tokenId","type":"uint256"},{"indexed":False,"internalType":"address","name":"recipient","type":"address"},{"indexed":False,"internalType":"uint256","name":"amount0","type":"uint256"},{"indexed":False,"internalType":"uint256","name":"amount1","type":"uint256"}],"name":"Collect","type":"event"},{"anonymous":False,"inputs":[{"indexed":True,"internalType":"uint256","name":"tokenId","type":"uint256"},{"indexed":False,"internalType":"uint128","name":"liquidity","type":"uint128"},{"indexed":False,"internalType":"uint256","name":"amount0","type":"uint256"},{"indexed":False,"internalType":"uint256","name":"amount1","type":"uint256"}],"name":"DecreaseLiquidity","type":"event"},{"anonymous":False,"inputs":[{"indexed":True,"internalType":"uint256","name":"tokenId","type":"uint256"},{"indexed":False,"internalType":"uint128","name":"liquidity","type":"uint128"},{"indexed":False,"internalType":"uint256","name":"amount0","type":"uint256"},{"indexed":False,"internalType":"uint256","name":"amount1","type":"uint256"}],"name":"IncreaseLiquidity","type":"event"},{"anonymous":False,"inputs":[{"indexed":True,"internalType":"address","name":"from","type":"address"},{"indexed":True,"internalType":"address","name":"to","type":"address"},{"indexed":True,"internalType":"uint256","name":"tokenId","type":"uint256"}],"name":"Transfer","type":"event"},{"inputs":[],"name":"DOMAIN_SEPARATOR","outputs":[{"internalType":"bytes32","name":"","type":"bytes32"}],"stateMutability":"view","type":"function"},{"inputs":[],"name":"PERMIT_TYPEHASH","outputs":[{"internalType":"bytes32","name":"","type":"bytes32"}],"stateMutability":"view","type":"function"},{"inputs":[],"name":"WETH9","outputs":[{"internalType":"address","name":"","type":"address"}],"stateMutability":"view","type":"function"},{"inputs":[{"internalType":"address","name":"to","type":"address"},{"internalType":"uint256","name":"tokenId","type":"uint256"}],"name":"approve","outputs":[],"stateMutability":"nonpayable","type":"function"},{"inputs":[{"internalType":"address","name":"owner","type":"address"}],"name":"balanceOf","outputs":[{"internalType":"uint256","name":"","type":"uint256"}],"stateMutability":"view","type":"function"},{"inputs":[],"name":"baseURI","outputs":[{"internalType":"string","name":"","type":"string"}],"stateMutability":"pure","type":"function"},{"inputs":[{"internalType":"uint256","name":"tokenId","type":"uint256"}],"name":"burn","outputs":[],"stateMutability":"payable","type":"function"},{"inputs":[{"components":[{"internalType":"uint256","name":"tokenId","type":"uint256"},{"internalType":"address","name":"recipient","type":"address"},{"internalType":"uint128","name":"amount0Max","type":"uint128"},{"internalType":"uint128","name":"amount1Max","type":"uint128"}],"internalType":"struct INonfungiblePositionManager.CollectParams","name":"params","type":"tuple"}],"name":"collect","outputs":[{"internalType":"uint256","name":"amount0","type":"uint256"},{"internalType":"uint256","name":"amount1","type":"uint256"}],"stateMutability":"payable","type":"function"},{"inputs":[{"internalType":"address","name":"token0","type":"address"},{"internalType":"address","name":"token1","type":"address"},{"internalType":"uint24","name":"fee","type":"uint24"},{"internalType":"uint160","name":"sqrtPriceX96","type":"uint160"}],"name":"createAndInitializePoolIfNecessary","outputs":[{"internalType":"address","name":"pool","type":"address"}],"stateMutability":"payable","type":"function"},{"inputs":[{"components":[{"internalType":"uint256","name":"tokenId","type":"uint256"},{"internalType":"uint128","name":"liquidity","type":"uint128"},{"internalType":"uint256","name":"amount0Min","type":"uint256"},{"internalType":"uint256","name":"amount1Min","type":"uint256"},{"internalType":"uint256","name":"deadline","type":"uint256"}],"internalType":"struct INonfungiblePositionManager.DecreaseLiquidityParams","name":"params","type":"tuple"}],"name":"decreaseLiquidity","outputs":[{"internalType":"uint256","name":"amount0","type":"uint256"},{"internalType":"uint256","name":"amount1","type":"uint256"}],"stateMutability":"payable","type":"function"},{"inputs":[],"name":"factory","outputs":[{"internalType":"address","name":"","type":"address"}],"stateMutability":"view","type":"function"},{"inputs":[{"internalType":"uint256","name":"tokenId","type":"uint256"}],"name":"getApproved","outputs":[{"internalType":"address","name":"","type":"address"}],"stateMutability":"view","type":"function"},{"inputs":[{"components":[{"internalType":"uint256","name":"tokenId","type":"uint256"},{"internalType":"uint256","name":"amount0Desired","type":"uint256"},{"internalType":"uint256","name":"amount1Desired","type":"uint256"},{"internalType":"uint256","name":"amount0Min","type":"uint256"},{"internalType":"uint256","name":"amount1Min","type":"uint256"},{"internalType":"uint256","name":"deadline","type":"uint256"}],"internalType":"struct INonfungiblePositionManager.IncreaseLiquidityParams","name":"params","type":"tuple"}],"name":"increaseLiquidity","outputs":[{"internalType":"uint128","name":"liquidity","type":"uint128"},{"internalType":"uint256","name":"amount0","type":"uint256"},{"internalType":"uint256","name":"amount1","type":"uint256"}],"stateMutability":"payable","type":"function"},{"inputs":[{"internalType":"address","name":"owner","type":"address"},{"internalType":"address","name":"operator","type":"address"}],"name":"isApprovedForAll","outputs":[{"internalType":"bool","name":"","type":"bool"}],"stateMutability":"view","type":"function"},{"inputs":[{"components":[{"internalType":"address","name":"token0","type":"address"},{"internalType":"address","name":"token1","type":"address"},{"internalType":"uint24","name":"fee","type":"uint24"},{"internalType":"int24","name":"tickLower","type":"int24"},{"internalType":"int24","name":"tickUpper","type":"int24"},{"internalType":"uint256","name":"amount0Desired","type":"uint256"},{"internalType":"uint256","name":"amount1Desired","type":"uint256"},{"internalType":"uint256","name":"amount0Min","type":"uint256"},{"internalType":"uint256","name":"amount1Min","type":"uint256"},{"internalType":"address","name":"recipient","type":"address"},{"internalType":"uint256","name":"deadline","type":"uint256"}],"internalType":"struct INonfungiblePositionManager.MintParams","name":"params","type":"tuple"}],"name":"mint","outputs":[{"internalType":"uint256","name":"tokenId","type":"uint256"},{"internalType":"uint128","name":"liquidity","type":"uint128"},{"internalType":"uint256","name":"amount0","type":"uint256"},{"internalType":"uint256","name":"amount1","type":"uint256"}],"stateMutability":"payable","type":"function"},{"inputs":[{"internalType":"bytes[]","name":"data","type":"bytes[]"}],"name":"multicall","outputs":[{"internalType":"bytes[]","name":"results","type":"bytes[]"}],"stateMutability":"payable","type":"function"},{"inputs":[],"name":"name","outputs":[{"internalType":"string","name":"","type":"string"}],"stateMutability":"view","type":"function"},{"inputs":[{"internalType":"uint256","name":"tokenId","type":"uint256"}],"name":"ownerOf","outputs":[{"internalType":"address","name":"","type":"address"}],"stateMutability":"view","type":"function"},{"inputs":[{"internalType":"address","name":"spender","type":"address"},{"internalType":"uint256","name":"tokenId","type":"uint256"},{"internalType":"uint256","name":"deadline","type":"uint256"},{"internalType":"uint8","name":"v","type":"uint8"},{"internalType":"bytes32","name":"r","type":"bytes32"},{"internalType":"bytes32","name":"s","type":"bytes32"}],"name":"permit","outputs":[],"stateMutability":"payable","type":"function"},{"inputs":[{"internalType":"uint256","name":"tokenId","type":"uint256"}],"name":"positions","outputs":[{"internalType":"uint96","name":"nonce","type":"uint96"},{"internalType":"address","name":"operator","type":"address"},{"internalType":"address","name":"token0","type":"address"},{"internalType":"address","name":"token1","type":"address"},{"internalType":"uint24","name":"fee","type":"uint24"},{"internalType":"int24","name":"tickLower","type":"int24"},{"internalType":"int24","name":"tickUpper","type":"int24"},{"internalType":"uint128","name":"liquidity","type":"uint128"},{"internalType":"uint256","name":"feeGrowthInside0LastX128","type":"uint256"},{"internalType":"uint256","name":"feeGrowthInside1LastX128","type":"uint256"},{"internalType":"uint128","name":"tokensOwed0","type":"uint128"},{"internalType":"uint128","name":"tokensOwed1","type":"uint128"}],"stateMutability":"view","type":"function"},{"inputs":[],"name":"refundETH","outputs":[],"stateMutability":"payable","type":"function"},{"inputs":[{"internalType":"address","name":"from","type":"address"},{"internalType":"address","name":"to","type":"address"},{"internalType":"uint256","name":"tokenId","type":"uint256"}],"name":"safeTransferFrom","outputs":[],"stateMutability":"nonpayable","type":"function"},{"inputs":[{"internalType":"address","name":"from","type":"address"},{"internalType":"address","name":"to","type":"address"},{"internalType":"uint256","name":"tokenId","type":"uint256"},{"internalType":"bytes","name":"_data","type":"bytes"}],"name":"safeTransferFrom","outputs":[],"stateMutability":"nonpayable","type":"function"},{"inputs":[{"internalType":"address","name":"token","type":"address"},{"internalType":"uint256","name":"value","type":"uint256"},{"internalType":"uint256","name":"deadline","type":"uint256"},{"internalType":"uint8","name":"v","type":"uint8"},{"internalType":"bytes32","name":"r","type":"bytes32"},{"internalType":"bytes32","name":"s","type":"bytes32"}],"name":"selfPermit","outputs":[],"stateMutability":"payable","type":"function"},{"inputs":[{"internalType":"address","name":"token","type":"address"},{"internalType":"uint256","name":"nonce","type":"uint256"},{"internalType":"uint256","name":"expiry","type":"uint256"},{"internalType":"uint8","name":"v","type":"uint8"},{"internalType":"bytes32","name":"r","type":"bytes32"},{"internalType":"bytes32","name":"s","type":"bytes32"}],"name":"selfPermitAllowed","outputs":[],"stateMutability":"payable","type":"function"},{"inputs":[{"internalType":"address","name":"token","type":"address"},{"internalType":"uint256","name":"nonce","type":"uint256"},{"internalType":"uint256","name":"expiry","type":"uint256"},{"internalType":"uint8","name":"v","type":"uint8"},{"internalType":"bytes32","name":"r","type":"bytes32"},{"internalType":"bytes32","name":"s","type":"bytes32"}],"name":"selfPermitAllowedIfNecessary","outputs":[],"stateMutability":"payable","type":"function"},{"inputs":[{"internalType":"address","name":"token","type":"address"},{"internalType":"uint256","name":"value","type":"uint256"},{"internalType":"uint256","name":"deadline","type":"uint256"},{"internalType":"uint8","name":"v","type":"uint8"},{"internalType":"bytes32","name":"r","type":"bytes32"},{"internalType":"bytes32","name":"s","type":"bytes32"}],"name":"selfPermitIfNecessary","outputs":[],"stateMutability":"payable","type":"function"},{"inputs":[{"internalType":"address","name":"operator","type":"address"},{"internalType":"bool","name":"approved","type":"bool"}],"name":"setApprovalForAll","outputs":[],"stateMutability":"nonpayable","type":"function"},{"inputs":[{"internalType":"bytes4","name":"interfaceId","type":"bytes4"}],"name":"supportsInterface","outputs":[{"internalType":"bool","name":"","type":"bool"}],"stateMutability":"view","type":"function"},{"inputs":[{"internalType":"address","name":"token","type":"address"},{"internalType":"uint256","name":"amountMinimum","type":"uint256"},{"internalType":"address","name":"recipient","type":"address"}],"name":"sweepToken","outputs":[],"stateMutability":"payable","type":"function"},{"inputs":[],"name":"symbol","outputs":[{"internalType":"string","name":"","type":"string"}],"stateMutability":"view","type":"function"},{"inputs":[{"internalType":"uint256","name":"index","type":"uint256"}],"name":"tokenByIndex","outputs":[{"internalType":"uint256","name":"","type":"uint256"}],"stateMutability":"view","type":"function"},{"inputs":[{"internalType":"address","name":"owner","type":"address"},{"internalType":"uint256","name":"index","type":"uint256"}],"name":"tokenOfOwnerByIndex","outputs":[{"internalType":"uint256","name":"","type":"uint256"}],"stateMutability":"view","type":"function"},{"inputs":[{"internalType":"uint256","name":"tokenId","type":"uint256"}],"name":"tokenURI","outputs":[{"internalType":"string","name":"","type":"string"}],"stateMutability":"view","type":"function"},{"inputs":[],"name":"totalSupply","outputs":[{"internalType":"uint256","name":"","type":"uint256"}],"stateMutability":"view","type":"function"},{"inputs":[{"internalType":"address","name":"from","type":"address"},{"internalType":"address","name":"to","type":"address"},{"internalType":"uint256","name":"tokenId","type":"uint256"}],"name":"transferFrom","outputs":[],"stateMutability":"nonpayable","type":"function"},{"inputs":[{"internalType":"uint256","name":"amount0Owed","type":"uint256"},{"internalType":"uint256","name":"amount1Owed","type":"uint256"},{"internalType":"bytes","name":"data","type":"bytes"}],"name":"uniswapV3MintCallback","outputs":[],"stateMutability":"nonpayable","type":"function"},{"inputs":[{"internalType":"uint256","name":"amountMinimum","type":"uint256"},{"internalType":"address","name":"recipient","type":"address"}],"name":"unwrapWETH9","outputs":[],"stateMutability":"payable","type":"function"},{"stateMutability":"payable","type":"receive"}]
-
-        self.erc20_abi = [
-            {
-                "inputs": [],
-                "name": "decimals",
-                "outputs": [{"internalType": "uint8", "name": "", "type": "uint8"}],
-                "stateMutability": "view",
-                "type": "function"
-            },
-            {
-                "inputs": [],
-                "name": "symbol",
-                "outputs": [{"internalType": "string", "name": "", "type": "string"}],
-                "stateMutability": "view",
-                "type": "function"
-            }
-        ]
+@lru_cache(maxsize=None)
+def load_abi(name: str) -> List[Dict]:
+    """ABI from abis/<name>.json, trimmed to the fragments the tracker uses and loaded on first use"""
+    with open(os.path.join(ABI_DIR, f"{name}.json"), encoding='utf-8') as f:
+        return json.load(f)
 
-        self.pool_abi = [
-            {
-                "inputs": [],
-                "name": "slot0",
-                "outputs": [
-                    {"internalType": "uint160", "name": "sqrtPriceX96", "type": "uint160"},
-                    {"internalType": "int24", "name": "tick", "type": "int24"},
-                    {"internalType": "uint16", "name": "observationIndex", "type": "uint16"},
-                    {"internalType": "uint16", "name": "observationCardinality", "type": "uint16"},
-                    {"internalType": "uint16", "name": "observationCardinalityNext", "type": "uint16"},
-                    {"internalType": "uint8", "name": "feeProtocol", "type": "uint8"},
-                    {"internalType": "bool", "name": "unlocked", "type": "bool"}
-                ],
-                "stateMutability": "view",
-                "type": "function"
-            }
-        ]
 
-        self.factory_abi = [
-            {
-                "inputs": [
-                    {"internalType": "address", "name": "tokenA", "type": "address"},
-                    {"internalType": "address", "name": "tokenB", "type": "address"},
-                    {"internalType": "uint24", "name": "fee", "type": "uint24"}
-                ],
-                "name": "getPool",
-                "outputs": [{"internalType": "address", "name": "pool", "type": "address"}],
-                "stateMutability": "view",
-                "type": "function"
-            }
-        ]
+class LiquidityPoolTracker:
 
-        self.position_managers = {
-            999: "0xeaD19AE861c29bBb2101E834922B2FEee69B9091",  # Hyperliquid EVM - ProjectX
-        }
+    def __init__(self, rpc_url: str, chain_id: int = 1, delay_between_calls: float = 0.5, batch_window: float = 0,
+                 protocols: Optional[List[Dict]] = None, fallback_urls: tuple = ()):
+        self.rpc_url = rpc_url
+        # Reads go through the lean client. With a batch_window, single reads issued concurrently
+        # from several threads share batch requests.
+        self.rpc = RpcClient(rpc_url, batch_window=batch_window, fallback_urls=fallback_urls)
+        self.chain_id = chain_id
+        self.delay = delay_between_calls
+        self.last_call_time = 0
 
-        self.factories = {
-            999: "0xFf7B3e8C00e57ea31477c32A5B52a58Eea47b072",  # Hyperliquid EVM - ProjectX
-        }
+        # web3 is slow to import and only needed for ad-hoc contract use, see the w3 property
+        self._w3 = None
+        self.contracts = {}
+
+        # Protocols of the chain (see protocols.py), the first one is the default of every method
+        # taking a position_manager_address
+        self.protocols = protocols if protocols is not None else protocols_for_chain(chain_id)
+        self.protocols_by_manager = {rpc_client.checksum_address(p['position_manager']): p for p in self.protocols}
+
+        self.position_managers = {chain_id: self.protocols[0]['position_manager']} if self.protocols else {}
+        self.factories = {chain_id: self.protocols[0]['factory']} if self.protocols else {}
+
+        # Token metadata and pool addresses never change, so they are cached for the process lifetime
+        self.token_info_cache = {}
+        self.pool_address_cache = {}
+
+        # Pool state changes every block, entries are (fetched_at, pool_info) and only reused within a max age
+        self.pool_state_cache = {}
+        self.pool_state_version = 0  # Bumped on every stored pool state or liquidity, see PriceOracle
+        # In-range liquidity, (fetched_at, liquidity) per pool: only used to rank price routes, read rarely
+        self.pool_liquidity = {}
+        self.pool_tokens = {}  # pool address -> (token0, token1) of the pools seen in positions
+
+        self.prices = PriceOracle(self, CHAINS.get(chain_id, {}).get('stablecoins', ()))
+
+        # Scanners used by get_position_events, one per position manager so each keeps its adapted window
+        self.event_scanners = {}
+
+    @property
+    def w3(self):
+        if self._w3 is None:
+            from web3 import Web3
+            self._w3 = Web3(Web3.HTTPProvider(self.rpc_url))
+        return self._w3
+
+    @property
+    def position_manager_abi(self) -> List[Dict]:
+        return load_abi("NonfungiblePositionManager")
+
+    @property
+    def erc20_abi(self) -> List[Dict]:
+        return load_abi("ERC20")
+
+    @property
+    def pool_abi(self) -> List[Dict]:
+        return load_abi("UniswapV3Pool")
+
+    @property
+    def factory_abi(self) -> List[Dict]:
+        return load_abi("UniswapV3Factory")
+
+    def get_contract(self, address: str, abi_name: str):
+        """web3 contract object, built once per address and ABI"""
+        key = (rpc_client.checksum_address(address), abi_name)
+        contract = self.contracts.get(key)
+        if contract is None:
+            contract = self.w3.eth.contract(address=key[0], abi=load_abi(abi_name))
+            self.contracts[key] = contract
+        return contract
 
     def _rate_limit_sleep(self):
         current_time = time.time()
@@ -80,18 +107,22 @@ class LiquidityPoolTracker:
         if time_since_last_call < self.delay:
             sleep_time = self.delay - time_since_last_call
             time.sleep(sleep_time)
+            metrics.RPC_THROTTLE_SECONDS.inc(sleep_time)
 
         self.last_call_time = time.time()
 
-    def _call_with_retry(self, func, max_retries=3, backoff_factor=2):
+    def _call_with_retry(self, func, max_retries=3, backoff_factor=2, method: str = 'unknown', calls: int = 1):
         for attempt in range(max_retries):
             try:
                 self._rate_limit_sleep()
-                result = func()
+                metrics.RPC_CALLS.inc(calls, method=method)
+                with metrics.RPC_LATENCY.time(method=method):
+                    result = func()
                 return result
             except Exception as e:
                 error_msg = str(e)
                 if "429" in error_msg or "Too Many Requests" in error_msg:
+                    metrics.RPC_RATE_LIMITED.inc(method=method)
                     if attempt < max_retries - 1:
                         wait_time = (backoff_factor ** attempt) * self.delay
                         print(f"Rate limit reached, waiting {wait_time:.1f}s before retrying...")
@@ -99,34 +130,71 @@ class LiquidityPoolTracker:
                     else:
                         raise Exception(f"Rate limit exceeded after {max_retries} retry.")
                 else:
+                    metrics.RPC_ERRORS.inc(method=method)
                     raise e
         return None
 
+    def _call_batch_with_retry(self, calls: List[tuple], method: str) -> List:
+        """
+        Send (to, function, *args) reads as one batch request, throttled and retried as a single call.
+        Results are in order, each the decoded value or the exception raised for that read.
+        """
+        if not calls:
+            return []
+
+        metrics.RPC_BATCH_SIZE.observe(len(calls))
+        return self._call_with_retry(lambda: self.rpc.call_batch(calls), method=method, calls=len(calls))
+
+    def request_batch(self, requests: List[tuple], method: str) -> List:
+        """
+        Send raw (method, params) JSON-RPC requests as one batch, throttled and retried as a single call.
+        Results are in order, each the JSON result or the RpcError returned for that request.
+        """
+        if not requests:
+            return []
+
+        metrics.RPC_BATCH_SIZE.observe(len(requests))
+        return self._call_with_retry(lambda: self.rpc.request_batch(requests), method=method, calls=len(requests))
+
     def tick_to_price(self, tick: int, decimals0: int = 18, decimals1: int = 18) -> float:
         price = 1.0001 ** tick
         price = price * (10 ** decimals0) / (10 ** decimals1)
         return price
 
     def get_token_info(self, token_address: str) -> Dict:
-        try:
-            token_contract = self.w3.eth.contract(
-                address=Web3.to_checksum_address(token_address),
-                abi=self.erc20_abi
-            )
-
-            def _get_symbol():
-                return token_contract.functions.symbol().call()
+        token_address = rpc_client.checksum_address(token_address)
+        if token_address in self.token_info_cache:
+            return self.token_info_cache[token_address]
+
+        self._prefetch_token_info([token_address])
+        return self.token_info_cache.get(token_address, {'symbol': 'UNKNOWN', 'decimals': 18})
+
+    def _prefetch_token_info(self, token_addresses: List[str]):
+        """Read symbol and decimals of every uncached token in one batch"""
+        missing = list(dict.fromkeys(
+            address for address in map(rpc_client.checksum_address, token_addresses)
+            if address not in self.token_info_cache
+        ))
+        if not missing:
+            return
+
+        calls = []
+        for address in missing:
+            calls.append((address, rpc_client.SYMBOL))
+            calls.append((address, rpc_client.DECIMALS))
 
-            def _get_decimals():
-                return token_contract.functions.decimals().call()
-
-            symbol = self._call_with_retry(_get_symbol)
-            decimals = self._call_with_retry(_get_decimals)
-
-            return {'symbol': symbol, 'decimals': decimals}
+        try:
+            results = self._call_batch_with_retry(calls, method='token_info')
         except Exception as e:
             print(f"Error while getting token infos : {e}")
-            return {'symbol': 'UNKNOWN', 'decimals': 18}
+            return
+
+        for i, address in enumerate(missing):
+            symbol, decimals = results[2 * i], results[2 * i + 1]
+            if isinstance(symbol, Exception) or isinstance(decimals, Exception):
+                print(f"Error while getting token infos for {address} : {symbol if isinstance(symbol, Exception) else decimals}")
+                continue
+            self.token_info_cache[address] = {'symbol': symbol, 'decimals': decimals}
 
     def get_pool_address(self, token0: str, token1: str, fee: int, factory_address: Optional[str] = None) -> Optional[str]:
         if factory_address is None:
@@ -134,29 +202,76 @@ class LiquidityPoolTracker:
             if not factory_address:
                 return None
 
-        try:
-            factory_contract = self.w3.eth.contract(
-                address=Web3.to_checksum_address(factory_address),
-                abi=self.factory_abi
-            )
+        cache_key = (factory_address.lower(), token0.lower(), token1.lower(), fee)
+        if cache_key in self.pool_address_cache:
+            return self.pool_address_cache[cache_key]
 
+        init_code_hash = self._init_code_hash(factory_address)
+        if init_code_hash:
+            pool_address = compute_pool_address(rpc_client.checksum_address(factory_address), init_code_hash, token0, token1, fee)
+            self.pool_address_cache[cache_key] = pool_address
+            return pool_address
+
+        try:
             def _get_pool():
-                return factory_contract.functions.getPool(
-                    Web3.to_checksum_address(token0),
-                    Web3.to_checksum_address(token1),
+                return self.rpc.call(
+                    rpc_client.checksum_address(factory_address),
+                    rpc_client.GET_POOL,
+                    token0,
+                    token1,
                     fee
-                ).call()
+                )
 
-            pool_address = self._call_with_retry(_get_pool)
+            pool_address = self._call_with_retry(_get_pool, method='getPool')
 
             if pool_address == "0x0000000000000000000000000000000000000000":
                 return None
 
+            self.pool_address_cache[cache_key] = pool_address
             return pool_address
         except Exception as e:
             print(f"Error while getting pool address : {e}")
             return None
 
+    def _init_code_hash(self, factory_address: str) -> Optional[str]:
+        for protocol in self.protocols:
+            if protocol['factory'].lower() == factory_address.lower():
+                return protocol.get('init_code_hash')
+        return None
+
+    def _factory_of(self, position_manager: str) -> Optional[str]:
+        """Factory of a registered position manager, the chain default for unknown ones"""
+        protocol = self.protocols_by_manager.get(position_manager)
+        return protocol['factory'] if protocol else self.factories.get(self.chain_id)
+
+    def _prefetch_pool_addresses(self, pool_keys: List[tuple], factory_address: Optional[str] = None):
+        """Resolve every uncached (token0, token1, fee) pool of a factory (the chain default if None) in one batch"""
+        factory_address = factory_address or self.factories.get(self.chain_id)
+        if not factory_address or self._init_code_hash(factory_address):
+            return
+
+        missing = list(dict.fromkeys(
+            (token0, token1, fee) for token0, token1, fee in pool_keys
+            if (factory_address.lower(), token0.lower(), token1.lower(), fee) not in self.pool_address_cache
+        ))
+        if not missing:
+            return
+
+        factory = rpc_client.checksum_address(factory_address)
+        try:
+            results = self._call_batch_with_retry(
+                [(factory, rpc_client.GET_POOL, token0, token1, fee) for token0, token1, fee in missing],
+                method='getPool'
+            )
+        except Exception as e:
+            print(f"Error while getting pool address : {e}")
+            return
+
+        for (token0, token1, fee), pool_address in zip(missing, results):
+            if isinstance(pool_address, Exception) or pool_address == "0x0000000000000000000000000000000000000000":
+                continue
+            self.pool_address_cache[(factory_address.lower(), token0.lower(), token1.lower(), fee)] = pool_address
+
     def calculate_token_amounts(self, liquidity: int, sqrt_price_x96: int,
                                 tick_lower: int, tick_upper: int,
                                 current_tick: int, decimals0: int, decimals1: int) -> Dict:
@@ -205,131 +320,504 @@ class LiquidityPoolTracker:
             'price': price_adjusted
         }
 
-    def get_pool_current_tick(self, pool_address: str) -> Optional[Dict]:
+    def get_pool_current_tick(self, pool_address: str, max_age: float = 0) -> Optional[Dict]:
+        """
+        Read slot0 of a pool.
+
+        Args:
+            pool_address: Pool to read
+            max_age: Reuse a cached slot0 read if it is younger than this many seconds (0 = always fetch)
+        """
+        cached = self.pool_state_cache.get(pool_address)
+        if max_age > 0 and cached and time.time() - cached[0] <= max_age:
+            return cached[1]
+
         try:
-            pool_contract = self.w3.eth.contract(
-                address=Web3.to_checksum_address(pool_address),
-                abi=self.pool_abi
-            )
+            pool_checksum = rpc_client.checksum_address(pool_address)
 
             def _call():
-                return pool_contract.functions.slot0().call()
+                return self.rpc.call(pool_checksum, rpc_client.SLOT0)
 
-            slot0 = self._call_with_retry(_call)
-            sqrt_price_x96 = slot0[0]
-            current_tick = slot0[1]
+            slot0 = self._call_with_retry(_call, method='slot0')
+            return self._store_pool_state(pool_address, slot0)
+        except Exception as e:
+            print(f"Error while getting current tick: {e}")
+            return None
 
-            price = (sqrt_price_x96 / (2**96)) ** 2
+    def get_pool_states(self, pool_addresses: List[str], max_age: float = 0) -> Dict[str, Optional[Dict]]:
+        """
+        Read slot0 of several pools in one batch request.
 
-            return {
-                'current_tick': current_tick,
-                'sqrt_price_x96': sqrt_price_x96,
-                'price': price
-            }
+        Pools read less than max_age seconds ago come from the cache. Returns pool address ->
+        pool info (None for pools that could not be read).
+        """
+        states = {}
+        missing = []
+        now = time.time()
+        for pool_address in dict.fromkeys(pool_addresses):
+            cached = self.pool_state_cache.get(pool_address)
+            if max_age > 0 and cached and now - cached[0] <= max_age:
+                states[pool_address] = cached[1]
+            else:
+                missing.append(pool_address)
+
+        try:
+            results = self._call_batch_with_retry(
+                [(rpc_client.checksum_address(pool_address), rpc_client.SLOT0) for pool_address in missing],
+                method='slot0'
+            )
         except Exception as e:
-            print(f"Error while getting current tick: {e}")
+            print(f"Error while getting current ticks: {e}")
+            results = [e] * len(missing)
+
+        for pool_address, slot0 in zip(missing, results):
+            if isinstance(slot0, Exception):
+                print(f"Error while getting current tick of {pool_address}: {slot0}")
+                states[pool_address] = None
+            else:
+                states[pool_address] = self._store_pool_state(pool_address, slot0)
+
+        return states
+
+    def _store_pool_state(self, pool_address: str, slot0: tuple) -> Dict:
+        sqrt_price_x96 = slot0[0]
+        current_tick = slot0[1]
+
+        price = (sqrt_price_x96 / (2**96)) ** 2
+
+        pool_info = {
+            'current_tick': current_tick,
+            'sqrt_price_x96': sqrt_price_x96,
+            'price': price,
+            'read_at': time.time()
+        }
+        self.pool_state_cache[pool_address] = (pool_info['read_at'], pool_info)
+        self.pool_state_version += 1
+        return pool_info
+
+    def get_pool_liquidities(self, pool_addresses: List[str], max_age: float = 0) -> Dict[str, Optional[int]]:
+        """
+        Read the in-range liquidity of several pools in one batch request, pools read less than
+        max_age seconds ago coming from the cache. Returns pool address -> liquidity (None on errors).
+        """
+        liquidities = {}
+        missing = []
+        now = time.time()
+        for pool_address in dict.fromkeys(pool_addresses):
+            cached = self.pool_liquidity.get(pool_address)
+            if max_age > 0 and cached and now - cached[0] <= max_age:
+                liquidities[pool_address] = cached[1]
+            else:
+                missing.append(pool_address)
+
+        try:
+            results = self._call_batch_with_retry(
+                [(rpc_client.checksum_address(pool_address), rpc_client.LIQUIDITY) for pool_address in missing],
+                method='liquidity'
+            )
+        except Exception as e:
+            print(f"Error while getting pool liquidities: {e}")
+            results = [e] * len(missing)
+
+        for pool_address, liquidity in zip(missing, results):
+            if isinstance(liquidity, Exception):
+                liquidities[pool_address] = None
+            else:
+                self._store_pool_liquidity(pool_address, liquidity)
+                liquidities[pool_address] = liquidity
+
+        return liquidities
+
+    def _store_pool_liquidity(self, pool_address: str, liquidity: int):
+        self.pool_liquidity[pool_address] = (time.time(), liquidity)
+        self.pool_state_version += 1
+
+    def apply_swap_log(self, log: Dict) -> Optional[str]:
+        """
+        Update the cached state of a pool from one of its Swap logs, which carry the new
+        sqrtPriceX96, liquidity and tick, without any call. Returns the pool address, None for other logs.
+        """
+        if log.get('removed') or not log.get('topics') or log['topics'][0] != rpc_client.SWAP_TOPIC:
             return None
 
-    def get_positions(self, wallet_address: str, position_manager_address: Optional[str] = None,
-                      include_pool_info: bool = True) -> List[Dict]:
+        _, _, sqrt_price_x96, liquidity, tick = rpc_client.SWAP_DATA.decode(bytes.fromhex(log['data'][2:]))
+        pool_address = rpc_client.checksum_address(log['address'])
+        self._store_pool_state(pool_address, (sqrt_price_x96, tick))
+        self._store_pool_liquidity(pool_address, liquidity)
+        return pool_address
+
+    def _get_position_manager(self, position_manager_address: Optional[str] = None) -> str:
+        """Checksummed position manager address, the chain default if none is given"""
+        if position_manager_address is None:
+            position_manager_address = self.position_managers.get(self.chain_id)
+            if not position_manager_address:
+                raise ValueError(f"Position manager not configured for this chain_id {self.chain_id}")
+
+        return rpc_client.checksum_address(position_manager_address)
+
+    def get_position_count(self, wallet_address: str, position_manager_address: Optional[str] = None) -> int:
+        """Number of position NFTs held by a wallet (open and closed)"""
+        position_manager = self._get_position_manager(position_manager_address)
+        wallet_address = rpc_client.checksum_address(wallet_address)
+
+        def _get_balance():
+            return self.rpc.call(position_manager, rpc_client.BALANCE_OF, wallet_address)
+
+        return self._call_with_retry(_get_balance, method='balanceOf')
+
+    def get_position_counts(self, wallet_addresses: List[str], position_manager_address: Optional[str] = None) -> Dict[str, Optional[int]]:
+        """balanceOf of several wallets in one batch request, None for wallets that could not be read"""
+        position_manager = self._get_position_manager(position_manager_address)
+
+        results = self._call_batch_with_retry(
+            [(position_manager, rpc_client.BALANCE_OF, rpc_client.checksum_address(address)) for address in wallet_addresses],
+            method='balanceOf'
+        )
+        return {
+            address: None if isinstance(balance, Exception) else balance
+            for address, balance in zip(wallet_addresses, results)
+        }
+
+    def get_block_number(self) -> int:
+        return self._call_with_retry(self.rpc.block_number, method='blockNumber')
+
+    def position_event_scanner(self, checkpoints=None, name: Optional[str] = None,
+                               position_manager_address: Optional[str] = None, **kwargs) -> LogScanner:
         """
-        Fetch all LP positions for a given wallet address.
-        
+        LogScanner of the position manager's Transfer, IncreaseLiquidity and DecreaseLiquidity
+        events, parsed by _parse_position_event and tagged with the chain and protocol of the
+        position manager. checkpoints and name are needed for scan().
+        """
+        position_manager = self._get_position_manager(position_manager_address)
+        protocol = self.protocols_by_manager.get(position_manager)
+
+        def _parse(log: Dict) -> Dict:
+            event = self._parse_position_event(log)
+            event['chain_id'] = self.chain_id
+            if protocol:
+                event['protocol'] = protocol['name']
+            return event
+
+        return LogScanner(
+            self, position_manager, [POSITION_EVENT_TOPICS],
+            parse=_parse, checkpoints=checkpoints, name=name, **kwargs
+        )
+
+    def get_position_events(self, from_block: int, to_block: int, position_manager_address: Optional[str] = None) -> List[Dict]:
+        """
+        Transfer, IncreaseLiquidity and DecreaseLiquidity events of the position manager between two
+        blocks (inclusive), oldest first, read in chunks adapted to the endpoint's limits.
+
+        Returns dicts with 'event', 'block', 'chain_id', 'protocol' (registered position managers)
+        and 'token_id', plus 'from' and 'to' for transfers.
+        """
+        position_manager = self._get_position_manager(position_manager_address)
+        if position_manager not in self.event_scanners:
+            self.event_scanners[position_manager] = self.position_event_scanner(position_manager_address=position_manager)
+        return self.event_scanners[position_manager].fetch(from_block, to_block)
+
+    @staticmethod
+    def _parse_position_event(log: Dict) -> Dict:
+        topics = log['topics']
+        block = int(log['blockNumber'], 16)
+
+        if topics[0] == rpc_client.TRANSFER_TOPIC:
+            return {
+                'event': 'Transfer',
+                'block': block,
+                'from': rpc_client.checksum_address("0x" + topics[1][-40:]),
+                'to': rpc_client.checksum_address("0x" + topics[2][-40:]),
+                'token_id': int(topics[3], 16)
+            }
+
+        event = 'IncreaseLiquidity' if topics[0] == rpc_client.INCREASE_LIQUIDITY_TOPIC else 'DecreaseLiquidity'
+        return {'event': event, 'block': block, 'token_id': int(topics[1], 16)}
+
+    def get_token_ids(self, wallet_address: str, start: int = 0, count: Optional[int] = None,
+                      position_manager_address: Optional[str] = None, balance: Optional[int] = None) -> List[int]:
+        """
+        Fetch the token IDs owned by a wallet for the index window [start, start + count).
+
         Args:
             wallet_address: Wallet to analyze
+            start: First owner index to fetch
+            count: Number of indexes to fetch (all remaining if None)
             position_manager_address: Position manager address (optionnal)
-            include_pool_info: If True, fetch pool info (token symbols, decimals, pool address)
-            
+            balance: Known balanceOf result, avoids an extra call when provided
+
         Returns:
-            Detailed list of positions with relevant data
+            List of token IDs, in owner index order
         """
-        if position_manager_address is None:
-            position_manager_address = self.position_managers.get(self.chain_id)
-            if not position_manager_address:
-                raise ValueError(f"Position manager not configured for this chain_id {self.chain_id}")
+        position_manager = self._get_position_manager(position_manager_address)
+        wallet_address = rpc_client.checksum_address(wallet_address)
+
+        if balance is None:
+            balance = self.get_position_count(wallet_address, position_manager_address)
 
-        wallet_address = Web3.to_checksum_address(wallet_address)
-        position_manager_address = Web3.to_checksum_address(position_manager_address)
+        end = balance if count is None else min(balance, start + count)
 
-        position_manager = self.w3.eth.contract(
-            address=position_manager_address,
-            abi=self.position_manager_abi
+        results = self._call_batch_with_retry(
+            [(position_manager, rpc_client.TOKEN_OF_OWNER_BY_INDEX, wallet_address, i) for i in range(start, end)],
+            method='tokenOfOwnerByIndex'
         )
+        for result in results:
+            if isinstance(result, Exception):
+                raise result
 
-        positions = []
+        return results
 
-        try:
-            def _get_balance():
-                return position_manager.functions.balanceOf(wallet_address).call()
+    def get_position(self, token_id: int, position_manager_address: Optional[str] = None,
+                     include_pool_info: bool = True) -> Dict:
+        """
+        Fetch a single position by token ID.
 
-            balance = self._call_with_retry(_get_balance)
-            print(f"Positions found : {balance}")
+        Closed positions (liquidity = 0) are returned as well, callers decide whether to skip them.
+        Token and pool data come from the tracker caches when available.
+        """
+        position_manager = self._get_position_manager(position_manager_address)
+
+        def _get_position():
+            return self.rpc.call(position_manager, rpc_client.POSITIONS, token_id)
+
+        position_data = self._call_with_retry(_get_position, method='positions')
+        position_info = self._parse_position(token_id, position_data, position_manager)
+
+        if include_pool_info and position_info['liquidity'] > 0:
+            self._add_pool_info(position_info, self._factory_of(position_manager))
+
+        return position_info
+
+    def get_positions_by_ids(self, token_ids: List[int], position_manager_address: Optional[str] = None,
+                             include_pool_info: bool = True) -> List:
+        """
+        Fetch several positions with one batch request, plus one batch each for the token metadata
+        and pool addresses missing from the caches.
+
+        Returns position dictionaries in token_ids order, or the exception raised for a position.
+        """
+        position_manager = self._get_position_manager(position_manager_address)
+
+        results = self._call_batch_with_retry(
+            [(position_manager, rpc_client.POSITIONS, token_id) for token_id in token_ids],
+            method='positions'
+        )
+        positions = [
+            data if isinstance(data, Exception) else self._parse_position(token_id, data, position_manager)
+            for token_id, data in zip(token_ids, results)
+        ]
+
+        if include_pool_info:
+            factory_address = self._factory_of(position_manager)
+            open_positions = [p for p in positions if not isinstance(p, Exception) and p['liquidity'] > 0]
+            self._prefetch_token_info([p[key] for p in open_positions for key in ('token0', 'token1')])
+            self._prefetch_pool_addresses([(p['token0'], p['token1'], p['fee']) for p in open_positions], factory_address)
+            for position_info in open_positions:
+                self._add_pool_info(position_info, factory_address)
+
+        return positions
+
+    def _parse_position(self, token_id: int, position_data: tuple, position_manager: Optional[str] = None) -> Dict:
+        token0_address = position_data[2]
+        token1_address = position_data[3]
+        tick_lower = position_data[5]
+        tick_upper = position_data[6]
+
+        position_info = {
+            'token_id': token_id,
+            'token0': token0_address,
+            'token1': token1_address,
+            'fee': position_data[4],
+            'tick_lower': tick_lower,
+            'tick_upper': tick_upper,
+            'liquidity': position_data[7],
+            'tokens_owed0': position_data[10],
+            'tokens_owed1': position_data[11],
+            'price_lower': self.tick_to_price(tick_lower),
+            'price_upper': self.tick_to_price(tick_upper),
+            'chain_id': self.chain_id
+        }
+        protocol = self.protocols_by_manager.get(position_manager)
+        if protocol:
+            position_info['protocol'] = protocol['name']
+        return position_info
+
+    def _add_pool_info(self, position_info: Dict, factory_address: Optional[str] = None):
+        """Token symbols, decimals and pool address, from the caches when available"""
+        token0_info = self.get_token_info(position_info['token0'])
+        token1_info = self.get_token_info(position_info['token1'])
+
+        position_info['token0_symbol'] = token0_info['symbol']
+        position_info['token1_symbol'] = token1_info['symbol']
+        position_info['token0_decimals'] = token0_info['decimals']
+        position_info['token1_decimals'] = token1_info['decimals']
+
+        position_info['pool_address'] = self.get_pool_address(
+            position_info['token0'],
+            position_info['token1'],
+            position_info['fee'],
+            factory_address
+        )
+        if position_info['pool_address']:
+            self.pool_tokens[position_info['pool_address']] = (position_info['token0'], position_info['token1'])
+
+    def get_uncollected_fees(self, token_id: int, owner: str,
+                             position_manager_address: Optional[str] = None) -> Optional[Dict]:
+        """
+        Exact fees claimable by a position, including fees accrued since the last poke.
+
+        Simulates collect() from the owner with max amounts, which is what the position manager
+        would actually pay out. Returns raw token amounts, or None if the simulation fails
+        (e.g. owner is not the current holder of the NFT).
+        """
+        position_manager = self._get_position_manager(position_manager_address)
+        owner = rpc_client.checksum_address(owner)
+
+        def _collect():
+            return self.rpc.call(
+                position_manager,
+                rpc_client.COLLECT,
+                (token_id, owner, MAX_UINT128, MAX_UINT128),
+                sender=owner
+            )
+
+        try:
+            amount0, amount1 = self._call_with_retry(_collect, method='collect')
+            return {'fees0': amount0, 'fees1': amount1}
+        except Exception as e:
+            print(f"Error while simulating collect for position {token_id}: {e}")
+            return None
 
-            for i in range(balance):
-                try:
-                    print(f"Fetching position {i+1}/{balance}...")
+    def get_position_details(self, token_id: int, owner: Optional[str] = None,
+                             position_manager_address: Optional[str] = None,
+                             pool_max_age: float = 15) -> Dict:
+        """
+        Deep fetch of a single position: position data, pool state and exact uncollected fees.
 
-                    def _get_token_id():
-                        return position_manager.functions.tokenOfOwnerByIndex(wallet_address, i).call()
+        Token metadata and pool address come from the tracker caches, pool state is reused
+        if it was read less than pool_max_age seconds ago.
+        """
+        position = self.get_position(token_id, position_manager_address, include_pool_info=True)
 
-                    token_id = self._call_with_retry(_get_token_id)
+        pool_info = None
+        if position.get('pool_address'):
+            pool_info = self.get_pool_current_tick(position['pool_address'], max_age=pool_max_age)
 
-                    def _get_position():
-                        return position_manager.functions.positions(token_id).call()
+        fees = None
+        if owner:
+            fees = self.get_uncollected_fees(token_id, owner, position_manager_address)
 
-                    position_data = self._call_with_retry(_get_position)
+        return {'position': position, 'pool_info': pool_info, 'fees': fees}
 
-                    liquidity = position_data[7]
+    def iter_positions(self, wallet_address: str, position_manager_address: Optional[str] = None,
+                       include_pool_info: bool = True, start: int = 0, count: Optional[int] = None,
+                       balance: Optional[int] = None, include_closed: bool = False) -> Iterator[Dict]:
+        """
+        Stream LP positions for a given wallet address, yielding each one as soon as it is fetched.
 
-                    if liquidity == 0:
-                        print(f"  Position #{token_id} ignored (liquidity = 0)")
-                        continue
+        Args:
+            wallet_address: Wallet to analyze
+            position_manager_address: Position manager address (optionnal)
+            include_pool_info: If True, fetch pool info (token symbols, decimals, pool address)
+            start: First owner index to fetch
+            count: Number of owner indexes to fetch (all remaining if None)
+            balance: Known balanceOf result, avoids an extra call when provided
+            include_closed: If True, also yield positions with liquidity = 0
 
-                    token0_address = position_data[2]
-                    token1_address = position_data[3]
-                    tick_lower = position_data[5]
-                    tick_upper = position_data[6]
+        Yields:
+            Position dictionaries, in owner index order
+        """
+        self._get_position_manager(position_manager_address)
 
-                    position_info = {
-                        'token_id': token_id,
-                        'token0': token0_address,
-                        'token1': token1_address,
-                        'fee': position_data[4],
-                        'tick_lower': tick_lower,
-                        'tick_upper': tick_upper,
-                        'liquidity': liquidity,
-                        'price_lower': self.tick_to_price(tick_lower),
-                        'price_upper': self.tick_to_price(tick_upper)
-                    }
+        if balance is None:
+            balance = self.get_position_count(wallet_address, position_manager_address)
+            print(f"Positions found : {balance}")
 
-                    if include_pool_info:
-                        token0_info = self.get_token_info(token0_address)
-                        token1_info = self.get_token_info(token1_address)
+        end = balance if count is None else min(balance, start + count)
 
-                        position_info['token0_symbol'] = token0_info['symbol']
-                        position_info['token1_symbol'] = token1_info['symbol']
-                        position_info['token0_decimals'] = token0_info['decimals']
-                        position_info['token1_decimals'] = token1_info['decimals']
+        # Positions are fetched in batches, each batch is yielded as soon as it arrives
+        for batch_start in range(start, end, POSITION_BATCH_SIZE):
+            batch_end = min(end, batch_start + POSITION_BATCH_SIZE)
+            print(f"Fetching positions {batch_start+1}-{batch_end}/{balance}...")
 
-                        pool_address = self.get_pool_address(
-                            token0_address,
-                            token1_address,
-                            position_data[4]  # fee
-                        )
-                        position_info['pool_address'] = pool_address
+            try:
+                token_ids = self.get_token_ids(wallet_address, batch_start, batch_end - batch_start,
+                                               position_manager_address, balance)
+                positions = self.get_positions_by_ids(token_ids, position_manager_address, include_pool_info)
+            except Exception as e:
+                print(f"Error while fetching positions {batch_start}-{batch_end - 1}: {e}")
+                continue
 
-                    positions.append(position_info)
+            for i, position_info in enumerate(positions, start=batch_start):
+                if isinstance(position_info, Exception):
+                    print(f"Error while fetching position {i}: {position_info}")
+                    continue
 
-                except Exception as e:
-                    print(f"Error while fetching position {i}: {e}")
+                if position_info['liquidity'] == 0 and not include_closed:
+                    print(f"  Position #{position_info['token_id']} ignored (liquidity = 0)")
                     continue
 
-            return positions
+                yield position_info
+
+    def get_positions(self, wallet_address: str, position_manager_address: Optional[str] = None,
+                      include_pool_info: bool = True) -> List[Dict]:
+        """
+        Fetch all LP positions for a given wallet address.
+        
+        Args:
+            wallet_address: Wallet to analyze
+            position_manager_address: Position manager address (optionnal)
+            include_pool_info: If True, fetch pool info (token symbols, decimals, pool address)
+            
+        Returns:
+            Detailed list of positions with relevant data
+        """
+        self._get_position_manager(position_manager_address)
 
+        try:
+            return list(self.iter_positions(wallet_address, position_manager_address, include_pool_info))
         except Exception as e:
             print(f"Error while fetching positions: {e}")
             return []
 
+    def get_wallets_positions(self, wallet_addresses: List[str], position_manager_address: Optional[str] = None,
+                              include_pool_info: bool = True) -> Dict[str, Optional[List[Dict]]]:
+        """
+        Open positions of several wallets, each step batched across all of them: one batch of
+        balanceOf, one of tokenOfOwnerByIndex, one of positions (plus the metadata missing from the
+        caches), so reading many wallets takes the round trips of a single one.
+
+        Returns wallet address -> positions, None for wallets that could not be read.
+        """
+        position_manager = self._get_position_manager(position_manager_address)
+        counts = self.get_position_counts(wallet_addresses, position_manager)
+
+        owners = [(address, i) for address, count in counts.items() for i in range(count or 0)]
+        token_ids = self._call_batch_with_retry(
+            [(position_manager, rpc_client.TOKEN_OF_OWNER_BY_INDEX, rpc_client.checksum_address(address), i)
+             for address, i in owners],
+            method='tokenOfOwnerByIndex'
+        )
+
+        wallets = {address: None if count is None else [] for address, count in counts.items()}
+        read = [(address, token_id) for (address, _), token_id in zip(owners, token_ids)
+                if not isinstance(token_id, Exception)]
+        for (address, i), token_id in zip(owners, token_ids):
+            if isinstance(token_id, Exception):
+                print(f"Error while fetching position {i} of {address}: {token_id}")
+                wallets[address] = None
+
+        positions = self.get_positions_by_ids([token_id for _, token_id in read], position_manager, include_pool_info)
+        for (address, token_id), position_info in zip(read, positions):
+            if wallets[address] is None:
+                continue
+            if isinstance(position_info, Exception):
+                print(f"Error while fetching position #{token_id} of {address}: {position_info}")
+                wallets[address] = None
+            elif position_info['liquidity'] > 0:
+                wallets[address].append(position_info)
+
+        return wallets
+
     def display_position_info(self, position: Dict, pool_address: Optional[str] = None):
         """
         Display detailed information about a given position.
@@ -368,7 +856,7 @@ class LiquidityPoolTracker:
             print(f"  Current tick: {current_tick}")
             print(f"  Current price: {pool_info['price']:.6f}")
 
-            in_range = position['tick_lower'] <= current_tick <= position['tick_upper']
+            in_range = is_in_range(position, current_tick)
 
             if in_range:
                 print(f"  ✅ Position IN RANGE (active)")
@@ -0,0 +1,236 @@
+"""
+Precomputed alert trigger ticks, indexed per pool.
+
+When a position is synced, the ticks at which its alert state changes are computed once: the
+range bounds and the early-warning ticks where the price comes within a user's threshold of
+either bound. The zones they delimit are
+
+    below | near_lower | inside | near_upper | above
+         tick_lower   warn_lower  warn_upper   tick_upper
+
+Every pool keeps the trigger ticks of its positions sorted, so a slot0 read only has to bisect
+the ticks crossed since the previous read to find the positions whose zone changed, instead of
+re-deriving prices for every position on every cycle.
+"""
+
+import bisect
+import math
+import threading
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from protocols import position_key
+
+TICK_BASE = 1.0001
+DEFAULT_EDGE_WARNING_PCT = 5.0
+EDGE_WARNING_OPTIONS = [0.0, 2.0, 5.0, 10.0]  # Thresholds offered in the notification settings, 0 = off
+
+NEAR_ZONES = ('near_lower', 'near_upper')
+OUT_ZONES = ('below', 'above')
+
+
+def edge_warning_ticks(tick_lower: int, tick_upper: int, warning_pct: float) -> Tuple[int, int]:
+    """
+    Ticks where the price is within warning_pct of the lower and upper bound of the range.
+
+    A price ratio of (1 + pct) is a constant tick distance, so no price is derived here. The warning
+    zones are capped at half the range each: a narrow range is then always near one of its edges.
+    """
+    if warning_pct <= 0:
+        return tick_lower, tick_upper + 1
+
+    offset = math.ceil(math.log(1 + warning_pct / 100) / math.log(TICK_BASE))
+    offset = min(offset, (tick_upper - tick_lower + 1) // 2)
+    return tick_lower + offset, tick_upper + 1 - offset
+
+
+def is_in_range(position: Dict, tick: int) -> bool:
+    """Whether `tick` is inside the position's range, both bounds included. Every range check goes through here"""
+    return position['tick_lower'] <= tick <= position['tick_upper']
+
+
+def zone(trigger: Dict, tick: int) -> str:
+    """Zone of a position at `tick`, consistent with is_in_range: only 'below' and 'above' are out of range"""
+    if tick < trigger['tick_lower']:
+        return 'below'
+    if tick < trigger['warn_lower']:
+        return 'near_lower'
+    if tick < trigger['warn_upper']:
+        return 'inside'
+    if tick <= trigger['tick_upper']:
+        return 'near_upper'
+    return 'above'
+
+
+class TriggerIndex:
+    """
+    Trigger ticks of the monitored positions, keyed (user_id, wallet address, position_key) and
+    indexed per pool, pools being keyed (chain_id, pool address).
+
+    All boundaries are stored as "zone changes when tick >= value" (tick_upper + 1 for the upper
+    bound), so a move from tick a to tick b crosses exactly the values in (min(a, b), max(a, b)].
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.triggers: Dict[Tuple, Dict] = {}
+        self.by_wallet: Dict[Tuple[int, str], Set[Tuple]] = {}
+        self.by_pool: Dict[Tuple, Set[Tuple]] = {}
+        self.boundaries: Dict[Tuple, Tuple[List[int], List[Tuple]]] = {}
+        self.stale_pools: Set[Tuple] = set()
+        self.pending: Dict[Tuple, Set[Tuple]] = {}
+        self.last_ticks: Dict[Tuple, int] = {}
+
+    def sync_wallet(self, user_id: int, wallet: Dict, positions: List[Dict], warning_pct: float):
+        """Replace the triggers of a wallet with those of its freshly fetched positions"""
+        wallet_key = (user_id, wallet['address'])
+
+        with self.lock:
+            previous = self.by_wallet.get(wallet_key, set())
+            current = set()
+
+            for position in positions:
+                if not position.get('pool_address'):
+                    continue
+
+                key = (user_id, wallet['address'], position_key(position))
+                pool = (key[2][0], position['pool_address'])
+                warn_lower, warn_upper = edge_warning_ticks(position['tick_lower'], position['tick_upper'], warning_pct)
+                trigger = {
+                    'user_id': user_id,
+                    'wallet': wallet,
+                    'position': position,
+                    'pool': pool,
+                    'tick_lower': position['tick_lower'],
+                    'tick_upper': position['tick_upper'],
+                    'warn_lower': warn_lower,
+                    'warn_upper': warn_upper,
+                    'warning_pct': warning_pct,
+                }
+                current.add(key)
+
+                old = self.triggers.get(key)
+                self.triggers[key] = trigger
+                if old and all(old[field] == trigger[field] for field in ('pool', 'tick_lower', 'tick_upper', 'warn_lower', 'warn_upper')):
+                    continue
+
+                # New or moved triggers are evaluated on the next check of their pool, whatever the tick did
+                if old:
+                    self._unindex(key, old['pool'])
+                self.by_pool.setdefault(pool, set()).add(key)
+                self.pending.setdefault(pool, set()).add(key)
+                self.stale_pools.add(pool)
+
+            for key in previous - current:
+                self._unindex(key, self.triggers.pop(key)['pool'])
+
+            # Kept when empty: the wallet is synced, it just has no position
+            self.by_wallet[wallet_key] = current
+
+    def retain_wallets(self, wallet_keys: Iterable[Tuple[int, str]]):
+        """Drop the triggers of every wallet not in wallet_keys, e.g. wallets whose notifications were turned off"""
+        keep = set(wallet_keys)
+        with self.lock:
+            for wallet_key in [k for k in self.by_wallet if k not in keep]:
+                for key in self.by_wallet.pop(wallet_key):
+                    self._unindex(key, self.triggers.pop(key)['pool'])
+
+    def _unindex(self, key: Tuple, pool: Tuple):
+        keys = self.by_pool.get(pool)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self.by_pool[pool]
+                self.boundaries.pop(pool, None)
+                self.last_ticks.pop(pool, None)
+        if pool in self.pending:
+            self.pending[pool].discard(key)
+        self.stale_pools.add(pool)
+
+    def _pool_boundaries(self, pool: Tuple) -> Tuple[List[int], List[Tuple]]:
+        if pool in self.stale_pools or pool not in self.boundaries:
+            entries = sorted(
+                (value, key)
+                for key in self.by_pool.get(pool, ())
+                for value in self._trigger_values(self.triggers[key])
+            )
+            self.boundaries[pool] = ([value for value, _ in entries], [key for _, key in entries])
+            self.stale_pools.discard(pool)
+        return self.boundaries[pool]
+
+    @staticmethod
+    def _trigger_values(trigger: Dict) -> Tuple[int, ...]:
+        return trigger['tick_lower'], trigger['warn_lower'], trigger['warn_upper'], trigger['tick_upper'] + 1
+
+    def get(self, key: Tuple) -> Optional[Dict]:
+        with self.lock:
+            return self.triggers.get(key)
+
+    def boundary_distance(self, pool: Tuple, tick: int) -> Optional[int]:
+        """Ticks the price has to move before a position of the pool changes zone, None if the pool has no position"""
+        with self.lock:
+            if pool not in self.by_pool:
+                return None
+
+            values, _ = self._pool_boundaries(pool)
+            i = bisect.bisect_right(values, tick)
+            distances = []
+            if i < len(values):
+                distances.append(values[i] - tick)
+            if i > 0:
+                distances.append(tick - values[i - 1] + 1)
+            return min(distances)
+
+    def is_synced(self, user_id: int, address: str) -> bool:
+        """Whether a wallet was synced and not dropped since, so a key of it missing from the index is a dropped position"""
+        with self.lock:
+            return (user_id, address) in self.by_wallet
+
+    def wallet_positions(self, user_id: int, address: str) -> Optional[List[Dict]]:
+        """Positions of a wallet as of its last sync, None if it was never synced"""
+        with self.lock:
+            keys = self.by_wallet.get((user_id, address))
+            if keys is None:
+                return None
+            return [self.triggers[key]['position'] for key in keys]
+
+    def pending_pools(self) -> List[Tuple]:
+        """Pools with new or changed triggers not evaluated yet"""
+        with self.lock:
+            return [pool for pool, keys in self.pending.items() if keys]
+
+    def pools(self) -> List[Tuple]:
+        with self.lock:
+            return list(self.by_pool)
+
+    def check_pool(self, pool: Tuple, tick: int) -> List[Tuple[Dict, str, Optional[str]]]:
+        """
+        Record a pool's current tick and return (trigger, zone, previous_zone) for every position
+        whose zone may have changed since the previous check. previous_zone is None for positions
+        seen for the first time.
+        """
+        with self.lock:
+            previous_tick = self.last_ticks.get(pool)
+            self.last_ticks[pool] = tick
+            pending = self.pending.pop(pool, set())
+
+            if previous_tick is None:
+                keys = set(self.by_pool.get(pool, ()))
+            else:
+                keys = set()
+                if tick != previous_tick:
+                    values, value_keys = self._pool_boundaries(pool)
+                    low, high = sorted((previous_tick, tick))
+                    keys.update(value_keys[bisect.bisect_right(values, low):bisect.bisect_right(values, high)])
+                keys |= pending
+
+            changes = []
+            for key in keys:
+                trigger = self.triggers.get(key)
+                if not trigger:
+                    continue
+                previous_zone = None if previous_tick is None or key in pending else zone(trigger, previous_tick)
+                current_zone = zone(trigger, tick)
+                if current_zone != previous_zone:
+                    changes.append((trigger, current_zone, previous_zone))
+
+            return changes
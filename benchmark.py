@@ -0,0 +1,430 @@
+"""
+Offline benchmarks for the tracker and the monitor, run against fake_rpc.py instead of the real chain.
+
+    python benchmark.py                          # 1, 100 and 10k wallets
+    python benchmark.py --wallets 1,100 --latency 0.02 --error-rate 0.05 --json bench.json
+
+First, call_overhead measures the CPU per call of web3 contract calls and of the lean rpc_client
+path, both answered by the same in-process fake node, so the difference is encoding, decoding and
+middleware only. The node's own share and rpc_client's encode/decode alone are reported next to them.
+
+For every wallet count it reports RPC calls per wallet, wall time and throughput of:
+  - get_positions: every wallet fetched sequentially by a fresh tracker (cold caches)
+  - calculate_token_amounts: pure math over every open position
+  - monitor_positions: two full cycles (the second after moving pool prices) with alerts captured
+    by a stub scheduler instead of Telegram
+
+Compare the JSON output of two runs to spot regressions before deploying. With --record the
+traffic is saved through rpc_replay.py, and --replay serves a recording instead of the fake
+server, so two versions of the code can be compared on identical responses.
+
+--cold-start measures how long a fresh interpreter takes to import the modules and build a tracker
+and the bot application (no network involved), which bounds the startup of autoscaled instances.
+
+Traffic recorded in production (RPC_RECORD_FILE) is replayed against a copy of the bot database:
+
+    python benchmark.py --replay rpc.jsonl.gz --db bot_data.db
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import math
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import Future
+from typing import Dict, List
+
+import metrics
+import rpc_replay
+from PoolManager import LiquidityPoolTracker
+import rpc_client
+from fake_rpc import FakeChain, FakeRpcServer, InProcessProvider
+from pool_polling import PoolPollScheduler
+from rpc_client import HttpTransport, RpcClient
+from telegram_bot import TelegramLPBot
+
+
+class StubScheduler:
+    """Counts the messages the monitor queues instead of delivering them"""
+
+    def __init__(self):
+        self.sent = 0
+
+    def send(self, chat_id: int, text: str, priority: int, parse_mode=None, persist: bool = True) -> Future:
+        self.sent += 1
+        future = Future()
+        future.set_result(None)
+        return future
+
+
+def _quiet(verbose: bool):
+    # The tracker and the monitor print progress for every position
+    return contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+
+
+class RpcSource:
+    """Where the benchmarked trackers get their responses: the fake server, optionally recorded, or a replay"""
+
+    def __init__(self, server: FakeRpcServer = None, recorder=None, replay: rpc_replay.ReplayProvider = None):
+        self.server = server
+        self.recorder = recorder
+        self.replay = replay
+        self.counters = replay or server
+
+    def tracker(self, delay: float) -> LiquidityPoolTracker:
+        tracker = LiquidityPoolTracker(self.server.url if self.server else "http://127.0.0.1:0", 999,
+                                       delay_between_calls=delay)
+        if self.replay:
+            tracker.rpc.transport = self.replay
+        elif self.recorder:
+            tracker.rpc.transport = self.recorder
+        return tracker
+
+
+def _rpc_stats(server, wallets: int, elapsed: float) -> Dict:
+    return {
+        'wall_time_s': round(elapsed, 3),
+        'wallets_per_s': round(wallets / elapsed, 1) if elapsed else None,
+        'rpc_calls': server.total_calls,
+        'rpc_calls_per_wallet': round(server.total_calls / wallets, 2),
+        'http_requests_per_wallet': round(server.http_requests / wallets, 2) if hasattr(server, 'http_requests') else None,
+        'http_429': server.rate_limited,
+        'calls_by_method': dict(sorted(server.calls.items())),
+    }
+
+
+def bench_get_positions(source: RpcSource, chain: FakeChain, args) -> Dict:
+    tracker = source.tracker(args.delay)
+    server = source.counters
+    server.reset_counters()
+
+    positions = 0
+    start = time.perf_counter()
+    with _quiet(args.verbose):
+        for wallet in chain.wallets:
+            positions += len(tracker.get_positions(wallet, include_pool_info=True))
+    elapsed = time.perf_counter() - start
+
+    result = _rpc_stats(server, len(chain.wallets), elapsed)
+    result['open_positions'] = positions
+    return result
+
+
+def bench_calculate_token_amounts(chain: FakeChain, args) -> Dict:
+    tracker = LiquidityPoolTracker("http://127.0.0.1:0", 999, delay_between_calls=0)
+    inputs = []
+    for position in chain.positions.values():
+        if position[7] == 0:
+            continue
+        pool = chain.pools[chain.pool_by_key[(position[2].lower(), position[3].lower(), position[4])].lower()]
+        inputs.append((position[7], chain.sqrt_price_x96(pool['tick']), position[5], position[6], pool['tick'], 18, 6))
+
+    iterations = max(args.min_math_iterations, len(inputs))
+    start = time.perf_counter()
+    for i in range(iterations):
+        tracker.calculate_token_amounts(*inputs[i % len(inputs)])
+    elapsed = time.perf_counter() - start
+
+    return {
+        'iterations': iterations,
+        'wall_time_s': round(elapsed, 3),
+        'ops_per_s': round(iterations / elapsed),
+        'us_per_op': round(elapsed / iterations * 1e6, 2),
+    }
+
+
+def _bench_bot(source: RpcSource, db_path: str, args) -> TelegramLPBot:
+    bot = TelegramLPBot("0:bench", "http://127.0.0.1:0", db_path=db_path)
+    bot.tracker = bot.trackers.trackers[999] = bot.trackers.primary = source.tracker(args.delay)
+    bot.scheduler = StubScheduler()
+    bot.monitor_wallet_pause = 0
+    # Cycles run back to back, every pool is due on every cycle
+    bot.pool_polls = PoolPollScheduler(math.inf, max_interval=0, min_interval=0)
+    return bot
+
+
+def _bench_cycle(bot: TelegramLPBot, source: RpcSource, wallets: int, args) -> Dict:
+    server = source.counters
+    server.reset_counters()
+    sent_before = bot.scheduler.sent
+    start = time.perf_counter()
+    with _quiet(args.verbose):
+        asyncio.run(bot.monitor_positions(None))
+    elapsed = time.perf_counter() - start
+
+    result = _rpc_stats(server, wallets, elapsed)
+    result['alert_messages'] = bot.scheduler.sent - sent_before
+    result['phases_s'] = {
+        phase: round(metrics.MONITOR_LAST_PHASE_SECONDS.get(phase=phase), 3)
+        for phase in ('fetch', 'evaluate', 'db', 'alert', 'pause')
+    }
+    return result
+
+
+def bench_monitor(source: RpcSource, chain: FakeChain, args) -> Dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        bot = _bench_bot(source, os.path.join(tmp, "bench.db"), args)
+
+        # One user per wallet, the worst case for per-user work
+        for user_id, wallet in enumerate(chain.wallets, start=1):
+            bot.db.add_user(user_id)
+            bot.db.add_wallet(user_id, wallet)
+
+        cycles = []
+        for cycle in range(2):
+            if cycle:
+                # Move every pool so some positions leave their range and others come back
+                for n, pool in enumerate(chain.pools):
+                    chain.move_pool(pool, 1200 if n % 2 else -1200)
+            cycles.append(_bench_cycle(bot, source, len(chain.wallets), args))
+
+        for n, pool in enumerate(chain.pools):
+            chain.move_pool(pool, -1200 if n % 2 else 1200)
+
+    return {'cold_cycle': cycles[0], 'second_cycle': cycles[1]}
+
+
+def bench_monitor_replay(source: RpcSource, args) -> Dict:
+    """Monitoring cycles over a copy of a real bot database, answered from a recording"""
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        shutil.copyfile(args.db, db_path)
+        bot = _bench_bot(source, db_path, args)
+
+        conn = bot.db.get_connection()
+        wallets = conn.execute("SELECT COUNT(*) FROM wallets WHERE notifications_enabled = 1").fetchone()[0]
+
+        cycles = [_bench_cycle(bot, source, max(wallets, 1), args) for _ in range(args.cycles)]
+        conn.close()
+
+    return {'wallets': wallets, 'cycles': cycles}
+
+
+def overhead_calls():
+    """
+    The same contract calls made through web3 and through rpc_client against one in-process node.
+
+    Returns the node and, per call, (web3 call, rpc_client call, (to, function, *args)).
+    """
+    chain = FakeChain(1, 1, 1, closed_ratio=0)
+    server = FakeRpcServer(chain)
+    provider = InProcessProvider(server)
+
+    tracker = LiquidityPoolTracker("http://127.0.0.1:0", 999, delay_between_calls=0)
+    tracker.w3.provider = provider
+    lean = RpcClient("http://127.0.0.1:0")
+    lean.transport = provider
+
+    wallet = chain.wallets[0]
+    token_id = chain.owned[wallet.lower()][0]
+    position = chain.positions[token_id]
+    pool = rpc_client.checksum_address(next(iter(chain.pools)))
+    pm = tracker.position_managers[999]
+
+    position_manager = tracker.get_contract(pm, "NonfungiblePositionManager")
+    pool_contract = tracker.get_contract(pool, "UniswapV3Pool")
+    token_contract = tracker.get_contract(position[2], "ERC20")
+    factory_contract = tracker.get_contract(tracker.factories[999], "UniswapV3Factory")
+
+    calls = {
+        'balanceOf': (lambda: position_manager.functions.balanceOf(wallet).call(),
+                      lambda: lean.call(pm, rpc_client.BALANCE_OF, wallet),
+                      (pm, rpc_client.BALANCE_OF, wallet)),
+        'positions': (lambda: position_manager.functions.positions(token_id).call(),
+                      lambda: lean.call(pm, rpc_client.POSITIONS, token_id),
+                      (pm, rpc_client.POSITIONS, token_id)),
+        'slot0': (lambda: pool_contract.functions.slot0().call(),
+                  lambda: lean.call(pool, rpc_client.SLOT0),
+                  (pool, rpc_client.SLOT0)),
+        'symbol': (lambda: token_contract.functions.symbol().call(),
+                   lambda: lean.call(position[2], rpc_client.SYMBOL),
+                   (position[2], rpc_client.SYMBOL)),
+        'getPool': (lambda: factory_contract.functions.getPool(position[2], position[3], position[4]).call(),
+                    lambda: lean.call(tracker.factories[999], rpc_client.GET_POOL, position[2], position[3], position[4]),
+                    (tracker.factories[999], rpc_client.GET_POOL, position[2], position[3], position[4])),
+    }
+    return server, lean, calls
+
+
+def bench_call_overhead(args) -> Dict:
+    """
+    CPU per call of web3 contract calls and of rpc_client against the same in-process node, raw
+    totals: the node's cost is measured on its own rather than subtracted, since subtracting two
+    noisy timings gave negative figures for the lean client. rpc_client's encode and decode are
+    also timed directly, without any transport.
+    """
+    server, lean, calls = overhead_calls()
+
+    def _cpu_per_call(func, repeats: int = 5) -> float:
+        # Best of several rounds, like timeit: scheduling and GC noise only ever adds time
+        func()
+        per_round = max(args.micro_iterations // repeats, 1)
+        timings = []
+        for _ in range(repeats):
+            start = time.process_time()
+            for _ in range(per_round):
+                func()
+            timings.append((time.process_time() - start) / per_round * 1e6)
+        return min(timings)
+
+    results = {}
+    for name, (web3_call, lean_call, (to, function, *call_args)) in calls.items():
+        request = {'jsonrpc': '2.0', 'id': 0, 'method': 'eth_call',
+                   'params': [{'to': to, 'data': function.encode(*call_args)}, 'latest']}
+        result = server.dispatch(request)['result']
+        node_us = _cpu_per_call(lambda: server.dispatch(request))
+        codec_us = _cpu_per_call(lambda: (function.encode(*call_args), lean._decode(function, result)))
+        web3_us = _cpu_per_call(web3_call)
+        lean_us = _cpu_per_call(lean_call)
+        results[name] = {'web3_us': round(web3_us, 1), 'rpc_client_us': round(lean_us, 1),
+                         'node_us': round(node_us, 1), 'rpc_client_codec_us': round(codec_us, 1),
+                         'saved_us': round(web3_us - lean_us, 1)}
+
+    return results
+
+
+COLD_START_SCRIPTS = {
+    'import PoolManager': "import PoolManager",
+    'PoolManager tracker': "import PoolManager; PoolManager.LiquidityPoolTracker('http://127.0.0.1:0', 999)",
+    'import telegram_bot': "import telegram_bot",
+    'telegram_bot application': (
+        "import os, tempfile, telegram_bot; "
+        "telegram_bot.TelegramLPBot('0:bench', 'http://127.0.0.1:0', "
+        "db_path=os.path.join(tempfile.mkdtemp(), 'bench.db')).build_application()"
+    ),
+}
+
+
+def bench_cold_start(args) -> Dict:
+    """Best wall time of a fresh interpreter for each startup step, over --cold-start runs"""
+    cwd = os.path.dirname(os.path.abspath(__file__))
+    results = {}
+    for name, script in COLD_START_SCRIPTS.items():
+        timings = []
+        for _ in range(args.cold_start):
+            start = time.perf_counter()
+            subprocess.run([sys.executable, "-c", script], cwd=cwd, check=True, stdout=subprocess.DEVNULL)
+            timings.append(time.perf_counter() - start)
+        results[name] = round(min(timings) * 1000)
+    return results
+
+
+def run(args) -> List[Dict]:
+    results = []
+    replay = rpc_replay.ReplayProvider(args.replay, args.speed) if args.replay else None
+
+    if args.db:
+        result = bench_monitor_replay(RpcSource(replay=replay), args)
+        print(f"\n=== Replay of {args.replay} over {result['wallets']} wallets of {args.db} ===")
+        for n, cycle in enumerate(result['cycles'], start=1):
+            _print_rpc(f"monitor (cycle {n})", cycle)
+        print(f"\nReplay: {replay.hits} recorded responses served, {replay.misses} requests missing from the recording")
+        return [result]
+
+    if args.cold_start:
+        cold_start = bench_cold_start(args)
+        results.append({'cold_start_ms': cold_start})
+        print(f"\n=== Cold start (best of {args.cold_start}) ===")
+        for name, ms in cold_start.items():
+            print(f"{name:<26} {ms:>6} ms")
+
+    if args.micro_iterations:
+        overhead = bench_call_overhead(args)
+        results.append({'call_overhead': overhead})
+        print(f"\n=== Client CPU per call ({args.micro_iterations} calls each) ===")
+        for name, result in overhead.items():
+            print(f"{name:<26} web3 {result['web3_us']:>8.1f} µs  rpc_client {result['rpc_client_us']:>7.1f} µs"
+                  f"  saved {result['saved_us']:>8.1f} µs  (node {result['node_us']:.1f} µs,"
+                  f" rpc_client encode+decode {result['rpc_client_codec_us']:.1f} µs)")
+
+    for wallet_count in [int(n) for n in args.wallets.split(',')]:
+        # The chain is deterministic, so it also rebuilds the wallets and users of a replayed run
+        chain = FakeChain(wallet_count, args.positions_per_wallet, args.pools)
+        server = None if replay else FakeRpcServer(chain, latency=args.latency, error_rate_429=args.error_rate,
+                                                   max_batch_size=args.max_batch).start()
+        recorder = None
+        if args.record and server:
+            recorder = rpc_replay.RecordingProvider(HttpTransport(server.url), args.record)
+        source = RpcSource(server, recorder, replay)
+
+        try:
+            print(f"\n=== {wallet_count} wallets, {args.positions_per_wallet} positions each, {args.pools} pools ===")
+
+            scenario = {'wallets': wallet_count}
+            scenario['get_positions'] = bench_get_positions(source, chain, args)
+            _print_rpc("get_positions", scenario['get_positions'])
+
+            scenario['calculate_token_amounts'] = bench_calculate_token_amounts(chain, args)
+            amounts = scenario['calculate_token_amounts']
+            print(f"{'calculate_token_amounts':<26} {amounts['iterations']} ops in {amounts['wall_time_s']:.3f}s"
+                  f"  {amounts['ops_per_s']} ops/s  {amounts['us_per_op']} µs/op")
+
+            if not args.skip_monitor:
+                scenario['monitor_positions'] = bench_monitor(source, chain, args)
+                _print_rpc("monitor (cold cycle)", scenario['monitor_positions']['cold_cycle'])
+                _print_rpc("monitor (second cycle)", scenario['monitor_positions']['second_cycle'])
+
+            results.append(scenario)
+        finally:
+            if recorder:
+                recorder.close()
+            if server:
+                server.stop()
+
+    if replay:
+        print(f"\nReplay: {replay.hits} recorded responses served, {replay.misses} requests missing from the recording")
+
+    return results
+
+
+def _print_rpc(name: str, result: Dict):
+    line = (f"{name:<26} {result['wall_time_s']:>8.2f}s  {result['wallets_per_s']:>8} wallets/s"
+            f"  {result['rpc_calls_per_wallet']:>6} calls/wallet")
+    if result['http_requests_per_wallet'] is not None:
+        line += f"  {result['http_requests_per_wallet']:>6} HTTP/wallet"
+    line += f"  {result['http_429']} × 429"
+    if 'alert_messages' in result:
+        line += f"  {result['alert_messages']} alerts"
+    print(line)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the tracker and the monitor against a local fake RPC")
+    parser.add_argument('--wallets', default="1,100,10000", help="Comma-separated wallet counts")
+    parser.add_argument('--positions-per-wallet', type=int, default=3)
+    parser.add_argument('--pools', type=int, default=10)
+    parser.add_argument('--latency', type=float, default=0.0, help="Seconds added to every RPC response")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Share of RPC requests answered with HTTP 429")
+    parser.add_argument('--max-batch', type=int, default=0,
+                        help="Largest JSON-RPC batch the fake server accepts, HTTP 413 above (0 = unlimited)")
+    parser.add_argument('--delay', type=float, default=0.0, help="Tracker delay_between_calls (the bot uses 1.0)")
+    parser.add_argument('--min-math-iterations', type=int, default=100_000)
+    parser.add_argument('--micro-iterations', type=int, default=2000,
+                        help="Calls per function in the client CPU microbenchmark (0 to skip it)")
+    parser.add_argument('--skip-monitor', action='store_true')
+    parser.add_argument('--cold-start', type=int, default=0, metavar='RUNS',
+                        help="Measure interpreter cold start over this many runs (0 to skip it)")
+    parser.add_argument('--record', default=None, help="Record the RPC traffic to this file (.gz to compress)")
+    parser.add_argument('--replay', default=None, help="Serve RPC responses from a recording instead of the fake server")
+    parser.add_argument('--speed', type=float, default=0.0,
+                        help="Replay speed: 1 keeps recorded latencies, 10 is 10x faster, 0 answers immediately")
+    parser.add_argument('--db', default=None, help="With --replay, run monitoring cycles over a copy of this bot database")
+    parser.add_argument('--cycles', type=int, default=1, help="Monitoring cycles to run with --db")
+    parser.add_argument('--json', default=None, help="Write results to this file")
+    parser.add_argument('--verbose', action='store_true', help="Keep the tracker and monitor logs")
+    args = parser.parse_args()
+    if args.db and not args.replay:
+        parser.error("--db requires --replay")
+
+    results = run(args)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'args': vars(args), 'results': results}, f, indent=2)
+        print(f"\nResults written to {args.json}")
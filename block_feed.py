@@ -0,0 +1,193 @@
+"""
+New block notifications for the monitor.
+
+Polling the pools on a timer reads them even when no block has landed, and reacts up to a full
+interval late when one has. The BlockFeed instead publishes every new head:
+
+  - over WebSocket when a ws_url is configured, subscribed to newHeads and to the Swap logs of
+    the monitored pools. A Swap log carries the pool's new sqrtPriceX96 and tick, so the pool
+    state is updated from it without any read,
+  - otherwise, or while the WebSocket is down, by polling eth_blockNumber, reconnecting with
+    exponential back-off.
+
+Events go through a CoalescingQueue holding at most one pending event: blocks that land while the
+monitor is still evaluating the previous one are merged, so a burst triggers a single evaluation.
+"""
+
+import asyncio
+import itertools
+import json
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+import metrics
+import rpc_client
+
+try:
+    import websockets
+except ImportError:  # Listed in requirements.txt; without it the feed polls
+    websockets = None
+
+POLL_INTERVAL = 5.0
+RECONNECT_DELAY = 5.0
+MAX_RECONNECT_DELAY = 300.0
+
+
+class CoalescingQueue:
+    """asyncio queue of block events where a pending event absorbs the ones published after it"""
+
+    def __init__(self):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=1)
+
+    def put(self, block: int, pools: Iterable[str] = ()):
+        event = {'block': block, 'pools': set(pools), 'blocks': 1}
+        if self.queue.full():
+            pending = self.queue.get_nowait()
+            event = {
+                'block': max(pending['block'], block),
+                'pools': pending['pools'] | event['pools'],
+                'blocks': pending['blocks'] + 1,
+            }
+            metrics.BLOCK_EVENTS_COALESCED.inc()
+        self.queue.put_nowait(event)
+
+    async def get(self) -> Dict:
+        """Next event: 'block' (latest head), 'pools' (pools updated from Swap logs) and 'blocks' (events merged)"""
+        return await self.queue.get()
+
+
+class BlockFeed:
+    """Publishes new heads of the chain to `queue`, from a WebSocket subscription or by polling"""
+
+    def __init__(self, tracker, ws_url: Optional[str] = None, poll_interval: float = POLL_INTERVAL,
+                 pools: Optional[Callable[[], List[str]]] = None):
+        self.tracker = tracker
+        self.ws_url = ws_url
+        self.poll_interval = poll_interval
+        self.pools = pools or (lambda: [])
+        self.queue = CoalescingQueue()
+        self.last_block = 0
+        self.mode: Optional[str] = None
+        self.task: Optional[asyncio.Task] = None
+
+    def start(self) -> asyncio.Task:
+        self.task = asyncio.create_task(self.run())
+        return self.task
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+    def _publish(self, block: int, pools: Iterable[str] = (), source: str = 'poll'):
+        pools = set(pools)
+        if block <= self.last_block and not pools:
+            return
+        self.last_block = max(self.last_block, block)
+        metrics.BLOCK_EVENTS.inc(source=source)
+        self.queue.put(self.last_block, pools)
+
+    async def run(self):
+        if not self.ws_url or websockets is None:
+            if self.ws_url:
+                print("⚠️ websockets is not installed, polling for new blocks")
+            await self._poll()
+            return
+
+        delay = RECONNECT_DELAY
+        while True:
+            self.mode = None
+            try:
+                await self._listen()
+                error = "connection closed"
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                error = e
+
+            # Back-off only grows while connections keep failing before the subscription is up
+            if self.mode == 'websocket':
+                delay = RECONNECT_DELAY
+            print(f"Block feed WebSocket error: {error}, polling for {delay:.0f}s")
+            await self._poll(until=asyncio.get_running_loop().time() + delay)
+            delay = min(delay * 2, MAX_RECONNECT_DELAY)
+
+    async def _poll(self, until: Optional[float] = None):
+        self.mode = 'poll'
+        loop = asyncio.get_running_loop()
+        while until is None or loop.time() < until:
+            try:
+                self._publish(await asyncio.to_thread(self.tracker.get_block_number))
+            except Exception as e:
+                print(f"Error while polling the block number: {e}")
+            await asyncio.sleep(self.poll_interval)
+
+    async def _listen(self):
+        """Follow newHeads and the Swap logs of the monitored pools until the connection drops"""
+        ids = itertools.count(1)
+        requests: Dict[int, str] = {}
+        subscriptions: Dict[str, str] = {}
+        subscribed_pools: Set[str] = set()
+        logs_subscription: Optional[str] = None
+        logs_request: Optional[int] = None  # Id of the latest logs subscribe, earlier ones are stale
+
+        async with websockets.connect(self.ws_url, max_size=None) as ws:
+            async def _send(method: str, params: List, purpose: str) -> int:
+                request_id = next(ids)
+                requests[request_id] = purpose
+                await ws.send(json.dumps({'jsonrpc': '2.0', 'id': request_id, 'method': method, 'params': params}))
+                return request_id
+
+            async def _sync_pool_subscription():
+                # Subscriptions are per filter: a changed pool set means a new subscription
+                nonlocal subscribed_pools, logs_subscription, logs_request
+                pools = set(self.pools())
+                if pools == subscribed_pools:
+                    return
+                if logs_subscription:
+                    await _send('eth_unsubscribe', [logs_subscription], 'unsubscribe')
+                    subscriptions.pop(logs_subscription, None)
+                    logs_subscription = None
+                subscribed_pools = pools
+                # A subscribe still unanswered cannot be cancelled yet: it is unsubscribed when its id arrives
+                logs_request = None
+                if pools:
+                    logs_request = await _send(
+                        'eth_subscribe', ['logs', {'address': sorted(pools), 'topics': [rpc_client.SWAP_TOPIC]}], 'logs'
+                    )
+
+            await _send('eth_subscribe', ['newHeads'], 'newHeads')
+            await _sync_pool_subscription()
+
+            async for message in ws:
+                data = json.loads(message)
+
+                if 'id' in data:
+                    purpose = requests.pop(data['id'], None)
+                    if 'error' in data:
+                        if purpose == 'newHeads':
+                            raise rpc_client.RpcError(data['error'])
+                        print(f"Block feed {purpose} subscription refused: {data['error']}")
+                    elif purpose == 'logs' and data['id'] != logs_request:
+                        await _send('eth_unsubscribe', [data['result']], 'unsubscribe')
+                    elif purpose in ('newHeads', 'logs'):
+                        subscriptions[data['result']] = purpose
+                        if purpose == 'logs':
+                            logs_subscription = data['result']
+                        else:
+                            self.mode = 'websocket'
+                    continue
+
+                params = data.get('params') or {}
+                purpose = subscriptions.get(params.get('subscription'))
+                result = params.get('result')
+                if purpose == 'newHeads':
+                    self._publish(int(result['number'], 16), source='websocket')
+                    await _sync_pool_subscription()
+                elif purpose == 'logs':
+                    pool = self.tracker.apply_swap_log(result)
+                    if pool:
+                        self._publish(int(result['blockNumber'], 16), [pool], source='websocket')
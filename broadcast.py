@@ -0,0 +1,126 @@
+﻿import asyncio
+import time
+from typing import Dict, List
+
+from telegram.error import Forbidden
+
+from message_scheduler import PRIORITY_BROADCAST
+
+
+class BroadcastEngine:
+    """
+    Runs admin broadcasts as persisted jobs.
+
+    Every recipient has a status row in the database, so a job interrupted by a restart resumes
+    with the users that were not reached yet. Messages go through the MessageScheduler, which
+    sends them concurrently up to Telegram's global limit. Users who blocked the bot are flagged
+    so later broadcasts and the monitor skip them.
+    """
+
+    def __init__(self, bot, db, scheduler, progress_interval: float = 3.0, batch_size: int = 500):
+        self.bot = bot
+        self.db = db
+        self.scheduler = scheduler
+        self.progress_interval = progress_interval
+        self.batch_size = batch_size
+        self.tasks: Dict[int, asyncio.Task] = {}
+
+    def start_job(self, admin_id: int, status_chat_id: int, status_message_id: int,
+                  text: str, user_ids: List[int]) -> int:
+        """Persist a new broadcast job and start sending it in the background"""
+        job_id = self.db.create_broadcast_job(admin_id, status_chat_id, status_message_id, text, user_ids)
+        self._spawn(job_id)
+        return job_id
+
+    def resume_jobs(self):
+        """Restart jobs that were still running when the bot stopped"""
+        for job_id in self.db.get_running_broadcast_job_ids():
+            print(f"📢 Resuming broadcast job #{job_id}")
+            self._spawn(job_id)
+
+    async def stop(self):
+        for task in self.tasks.values():
+            task.cancel()
+        await asyncio.gather(*self.tasks.values(), return_exceptions=True)
+        self.tasks = {}
+
+    def _spawn(self, job_id: int):
+        task = asyncio.create_task(self.run_job(job_id))
+        self.tasks[job_id] = task
+        task.add_done_callback(lambda _: self.tasks.pop(job_id, None))
+
+    async def run_job(self, job_id: int):
+        job = self.db.get_broadcast_job(job_id)
+        if not job:
+            return
+
+        pending = self.db.get_pending_broadcast_recipients(job_id)
+        last_progress = 0
+
+        for start in range(0, len(pending), self.batch_size):
+            batch = pending[start:start + self.batch_size]
+            deliveries = [self._deliver(user_id, job['text']) for user_id in batch]
+
+            results = []
+            try:
+                for delivery in asyncio.as_completed(deliveries):
+                    user_id, error = await delivery
+                    results.append(self._result_row(user_id, error))
+
+                    if time.monotonic() - last_progress >= self.progress_interval:
+                        self.db.update_broadcast_recipients(job_id, results)
+                        results = []
+                        await self._edit_progress(job)
+                        last_progress = time.monotonic()
+            finally:
+                # Record what was delivered even when stopped mid-batch, so a resume does not resend it
+                self.db.update_broadcast_recipients(job_id, results)
+
+        self.db.finish_broadcast_job(job_id)
+        await self._edit_progress(job, finished=True)
+
+    async def _deliver(self, user_id: int, text: str) -> tuple:
+        error = await self.scheduler.send(user_id, text, PRIORITY_BROADCAST, parse_mode='Markdown', persist=False)
+        return user_id, error
+
+    def _result_row(self, user_id: int, error) -> tuple:
+        if error is None:
+            return (user_id, 'sent', None)
+
+        if isinstance(error, Forbidden):
+            self.db.set_user_blocked(user_id, True)
+            return (user_id, 'blocked', str(error))
+
+        return (user_id, 'failed', str(error))
+
+    async def _edit_progress(self, job: Dict, finished: bool = False):
+        counts = self.db.get_broadcast_counts(job['id'])
+        total = sum(counts.values())
+        done = total - counts['pending']
+
+        if finished:
+            text = (
+                f"✅ *Broadcast Complete!*\n\n"
+                f"📊 Results:\n"
+                f"✅ Sent: {counts['sent']}\n"
+                f"❌ Failed: {counts['failed']}\n"
+                f"🚫 Blocked: {counts['blocked']}\n"
+                f"📊 Total: {total}"
+            )
+        else:
+            text = (
+                f"📤 Sending broadcast...\n"
+                f"Progress: {done}/{total}\n"
+                f"✅ Success: {counts['sent']}\n"
+                f"❌ Failed: {counts['failed'] + counts['blocked']}"
+            )
+
+        try:
+            await self.bot.edit_message_text(
+                text,
+                chat_id=job['status_chat_id'],
+                message_id=job['status_message_id'],
+                parse_mode='Markdown' if finished else None
+            )
+        except Exception as e:
+            print(f"Failed to update broadcast #{job['id']} progress: {e}")
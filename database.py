@@ -1,15 +1,32 @@
 ﻿import sqlite3
 from typing import List, Dict, Optional
-from web3 import Web3
+from rpc_client import checksum_address as to_checksum_address
+from alert_triggers import DEFAULT_EDGE_WARNING_PCT
+from escalation import DEFAULT_ESCALATION_STAGES, parse_stages, format_stages
+from protocols import LEGACY_CHAIN_ID, LEGACY_PROTOCOL
 import threading
 
 
 class Database:
+    """
+    SQLite storage of the bot.
+
+    Users and wallets (aliases, active wallet, notification flags, alert settings) are read by
+    every handler and every monitoring cycle, so they are also kept in memory: the registry is
+    loaded at startup and every method changing these tables writes through to it, in the same
+    critical section as the SQL write, so handler reads are dictionary lookups. Reads return copies.
+    """
+
     def __init__(self, db_path: str = "bot_data.db"):
         self.db_path = db_path
         self.local = threading.local()
         self.init_db()
 
+        self.registry_lock = threading.RLock()
+        self.users: Dict[int, Dict] = {}  # user_id -> settings, in registration order
+        self.wallets: Dict[int, List[Dict]] = {}  # user_id -> wallets, newest first
+        self._load_registry()
+
     def get_connection(self):
         """Get thread-local database connection"""
         if not hasattr(self.local, 'conn'):
@@ -44,247 +61,914 @@ class Database:
             )
         """)
 
-        cursor.execute("""
+        # Positions are identified by (chain_id, protocol, position_id), token IDs collide across position managers
+        self._create_or_rekey_table(cursor, 'position_alerts', """
             CREATE TABLE IF NOT EXISTS position_alerts (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 user_id INTEGER NOT NULL,
                 wallet_address TEXT NOT NULL,
+                chain_id INTEGER NOT NULL,
+                protocol TEXT NOT NULL,
                 position_id INTEGER NOT NULL,
                 alert_type TEXT NOT NULL,
                 alerted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 out_of_range_since TIMESTAMP,
                 FOREIGN KEY (user_id) REFERENCES users(user_id),
-                UNIQUE(user_id, wallet_address, position_id, alert_type)
+                UNIQUE(user_id, wallet_address, chain_id, protocol, position_id, alert_type)
+            )
+        """, {'chain_id': LEGACY_CHAIN_ID, 'protocol': LEGACY_PROTOCOL})
+
+        self._add_column_if_missing(cursor, 'users', 'alert_mode', "TEXT DEFAULT 'digest'")
+        self._add_column_if_missing(cursor, 'users', 'is_blocked', "BOOLEAN DEFAULT 0")
+        self._add_column_if_missing(cursor, 'users', 'edge_warning_pct', f"REAL DEFAULT {DEFAULT_EDGE_WARNING_PCT}")
+        self._add_column_if_missing(cursor, 'users', 'escalation_stages', f"TEXT DEFAULT '{format_stages(DEFAULT_ESCALATION_STAGES)}'")
+
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS outbound_messages (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                chat_id INTEGER NOT NULL,
+                text TEXT NOT NULL,
+                parse_mode TEXT,
+                priority INTEGER NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS broadcast_jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                admin_id INTEGER NOT NULL,
+                status_chat_id INTEGER NOT NULL,
+                status_message_id INTEGER NOT NULL,
+                text TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'running',
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                finished_at TIMESTAMP
+            )
+        """)
+
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS broadcast_recipients (
+                job_id INTEGER NOT NULL,
+                user_id INTEGER NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                error TEXT,
+                PRIMARY KEY (job_id, user_id),
+                FOREIGN KEY (job_id) REFERENCES broadcast_jobs(id)
+            )
+        """)
+
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS wallet_sync_state (
+                address TEXT PRIMARY KEY,
+                open_positions INTEGER NOT NULL DEFAULT 0,
+                positions_hash TEXT,
+                balance INTEGER,
+                last_activity_block INTEGER,
+                unchanged_refreshes INTEGER NOT NULL DEFAULT 0,
+                refreshed_at REAL
+            )
+        """)
+
+        self._create_or_rekey_table(cursor, 'position_owners', """
+            CREATE TABLE IF NOT EXISTS position_owners (
+                chain_id INTEGER NOT NULL,
+                protocol TEXT NOT NULL,
+                token_id INTEGER NOT NULL,
+                owner TEXT NOT NULL,
+                closed BOOLEAN NOT NULL DEFAULT 0,
+                updated_block INTEGER NOT NULL,
+                PRIMARY KEY (chain_id, protocol, token_id)
+            )
+        """, {'chain_id': LEGACY_CHAIN_ID, 'protocol': LEGACY_PROTOCOL})
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_position_owners_owner ON position_owners(chain_id, protocol, owner)")
+
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS sync_checkpoints (
+                name TEXT PRIMARY KEY,
+                block_number INTEGER NOT NULL,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             )
         """)
+        self._add_column_if_missing(cursor, 'sync_checkpoints', 'block_hash', "TEXT")
+        # Checkpoints of the position manager events and of the ownership index are per protocol
+        legacy = f"{LEGACY_CHAIN_ID}:{LEGACY_PROTOCOL}"
+        cursor.execute("UPDATE OR IGNORE sync_checkpoints SET name = ? WHERE name = 'wallet_activity'",
+                       (f"wallet_activity:{legacy}",))
+        cursor.execute("""
+            UPDATE OR IGNORE sync_checkpoints SET name = 'owners:' || ? || ':' || substr(name, 8)
+            WHERE name LIKE 'owners:%' AND name NOT LIKE 'owners:%:%'
+        """, (legacy,))
 
         conn.commit()
         conn.close()
 
+    def _load_registry(self):
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        cursor.execute("""
+            SELECT user_id, alert_mode, is_blocked, edge_warning_pct, escalation_stages
+            FROM users
+            ORDER BY created_at, rowid
+        """)
+        users = {
+            row[0]: {
+                'alert_mode': row[1] or 'digest',
+                'is_blocked': bool(row[2]),
+                'edge_warning_pct': row[3] if row[3] is not None else DEFAULT_EDGE_WARNING_PCT,
+                'escalation_stages': parse_stages(row[4]),
+            }
+            for row in cursor.fetchall()
+        }
+
+        cursor.execute("""
+            SELECT id, user_id, address, alias, is_active, notifications_enabled
+            FROM wallets
+            ORDER BY created_at DESC, id DESC
+        """)
+        wallets = {}
+        for row in cursor.fetchall():
+            wallets.setdefault(row[1], []).append({
+                'id': row[0],
+                'address': row[2],
+                'alias': row[3],
+                'is_active': bool(row[4]),
+                'notifications_enabled': bool(row[5])
+            })
+
+        with self.registry_lock:
+            self.users = users
+            self.wallets = wallets
+
+    @staticmethod
+    def _new_user() -> Dict:
+        return {
+            'alert_mode': 'digest',
+            'is_blocked': False,
+            'edge_warning_pct': DEFAULT_EDGE_WARNING_PCT,
+            'escalation_stages': list(DEFAULT_ESCALATION_STAGES),
+        }
+
+    def _find_wallet(self, user_id: int, address: str) -> Optional[Dict]:
+        return next((wallet for wallet in self.wallets.get(user_id, []) if wallet['address'] == address), None)
+
+    def _add_column_if_missing(self, cursor, table: str, column: str, definition: str):
+        """Add a column to an existing table (CREATE TABLE IF NOT EXISTS does not migrate old databases)"""
+        cursor.execute(f"PRAGMA table_info({table})")
+        if column not in [row[1] for row in cursor.fetchall()]:
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+    def _create_or_rekey_table(self, cursor, table: str, create_sql: str, new_columns: Dict[str, object]):
+        """
+        Create a table, or rebuild an existing one whose key gained new_columns (SQLite cannot alter
+        constraints): its rows are copied over with the given values for the new columns.
+        """
+        cursor.execute(f"PRAGMA table_info({table})")
+        columns = [row[1] for row in cursor.fetchall()]
+        if not columns or all(column in columns for column in new_columns):
+            cursor.execute(create_sql)
+            return
+
+        cursor.execute(f"ALTER TABLE {table} RENAME TO {table}_old")
+        cursor.execute(create_sql)
+        kept = ", ".join(column for column in columns if column not in new_columns)
+        cursor.execute(
+            f"INSERT INTO {table} ({kept}, {', '.join(new_columns)}) "
+            f"SELECT {kept}, {', '.join('?' for _ in new_columns)} FROM {table}_old",
+            tuple(new_columns.values())
+        )
+        cursor.execute(f"DROP TABLE {table}_old")
+
     def add_user(self, user_id: int):
         """Add a new user"""
+        with self.registry_lock:
+            if user_id in self.users:
+                return
+
+            conn = self.get_connection()
+            cursor = conn.cursor()
+
+            cursor.execute("INSERT OR IGNORE INTO users (user_id) VALUES (?)", (user_id,))
+            conn.commit()
+
+            self.users[user_id] = self._new_user()
+
+    def add_wallet(self, user_id: int, address: str, alias: Optional[str] = None) -> bool:
+        """Add a wallet for a user"""
+        address = to_checksum_address(address)
+
+        with self.registry_lock:
+            self.add_user(user_id)
+
+            conn = self.get_connection()
+            cursor = conn.cursor()
+
+            try:
+                cursor.execute(
+                    "INSERT INTO wallets (user_id, address, alias) VALUES (?, ?, ?)",
+                    (user_id, address, alias)
+                )
+                conn.commit()
+            except sqlite3.IntegrityError:
+                conn.rollback()
+                return False
+
+            wallets = self.wallets.setdefault(user_id, [])
+            wallets.insert(0, {
+                'id': cursor.lastrowid,
+                'address': address,
+                'alias': alias,
+                'is_active': False,
+                'notifications_enabled': True
+            })
+
+            # Set as active if it's the first wallet
+            if len(wallets) == 1:
+                self.set_active_wallet(user_id, address)
+
+            return True
+
+    def add_wallets(self, user_id: int, wallets: List[tuple]) -> List[str]:
+        """
+        Add several (address, alias) wallets for a user in one transaction. Wallets already
+        registered are left untouched. Returns the addresses that were added.
+        """
+        with self.registry_lock:
+            self.add_user(user_id)
+
+            conn = self.get_connection()
+            cursor = conn.cursor()
+
+            added = []
+            try:
+                for address, alias in wallets:
+                    address = to_checksum_address(address)
+                    cursor.execute(
+                        "INSERT OR IGNORE INTO wallets (user_id, address, alias) VALUES (?, ?, ?)",
+                        (user_id, address, alias)
+                    )
+                    if cursor.rowcount:
+                        added.append({
+                            'id': cursor.lastrowid,
+                            'address': address,
+                            'alias': alias,
+                            'is_active': False,
+                            'notifications_enabled': True
+                        })
+
+                # The first added wallet becomes active if the user had none
+                user_wallets = self.wallets.setdefault(user_id, [])
+                if added and not any(wallet['is_active'] for wallet in user_wallets):
+                    cursor.execute(
+                        "UPDATE wallets SET is_active = 1 WHERE user_id = ? AND address = ?",
+                        (user_id, added[0]['address'])
+                    )
+                    added[0]['is_active'] = True
+
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+            user_wallets[:0] = reversed(added)
+            return [wallet['address'] for wallet in added]
+
+    def get_user_wallets(self, user_id: int) -> List[Dict]:
+        """Get all wallets for a user, newest first"""
+        with self.registry_lock:
+            return [dict(wallet) for wallet in self.wallets.get(user_id, [])]
+
+    def get_active_wallet(self, user_id: int) -> Optional[str]:
+        """Get the active wallet address for a user"""
+        with self.registry_lock:
+            return next((wallet['address'] for wallet in self.wallets.get(user_id, []) if wallet['is_active']), None)
+
+    def set_active_wallet(self, user_id: int, address: str):
+        """Set a wallet as active"""
+        address = to_checksum_address(address)
+
+        with self.registry_lock:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+
+            # Deactivate all wallets for this user
+            cursor.execute("UPDATE wallets SET is_active = 0 WHERE user_id = ?", (user_id,))
+
+            # Activate the selected wallet
+            cursor.execute(
+                "UPDATE wallets SET is_active = 1 WHERE user_id = ? AND address = ?",
+                (user_id, address)
+            )
+
+            conn.commit()
+
+            for wallet in self.wallets.get(user_id, []):
+                wallet['is_active'] = wallet['address'] == address
+
+    def delete_wallet(self, user_id: int, address: str) -> bool:
+        """Delete a wallet"""
+        address = to_checksum_address(address)
+
+        with self.registry_lock:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+
+            cursor.execute(
+                "DELETE FROM wallets WHERE user_id = ? AND address = ?",
+                (user_id, address)
+            )
+
+            deleted = cursor.rowcount > 0
+            cursor.execute(
+                "DELETE FROM position_alerts WHERE user_id = ? AND wallet_address = ?",
+                (user_id, address)
+            )
+            conn.commit()
+
+            if user_id in self.wallets:
+                self.wallets[user_id] = [wallet for wallet in self.wallets[user_id] if wallet['address'] != address]
+
+            return deleted
+
+    def update_alias(self, user_id: int, address: str, alias: str):
+        """Update wallet alias"""
+        address = to_checksum_address(address)
+
+        with self.registry_lock:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+
+            cursor.execute(
+                "UPDATE wallets SET alias = ? WHERE user_id = ? AND address = ?",
+                (alias, user_id, address)
+            )
+
+            conn.commit()
+
+            wallet = self._find_wallet(user_id, address)
+            if wallet:
+                wallet['alias'] = alias
+
+    def get_wallet_display_name(self, address: str, alias: Optional[str] = None) -> str:
+        """Get display name for a wallet"""
+        if alias:
+            return f"{alias} ({address[:6]}...{address[-4:]})"
+        return f"{address[:6]}...{address[-4:]}"
+
+    def get_all_user_ids(self) -> List[int]:
+        """Get all user IDs that have registered with the bot"""
+        with self.registry_lock:
+            return [user_id for user_id, user in self.users.items() if not user['is_blocked']]
+
+    def get_alert_mode(self, user_id: int) -> str:
+        """Get how alerts are delivered to a user: 'instant' (one message per alert) or 'digest'"""
+        with self.registry_lock:
+            return self.users.get(user_id, {}).get('alert_mode', 'digest')
+
+    def set_alert_mode(self, user_id: int, mode: str):
+        """Set alert delivery mode ('instant' or 'digest')"""
+        if mode not in ('instant', 'digest'):
+            raise ValueError(f"Unknown alert mode: {mode}")
+
+        with self.registry_lock:
+            self.add_user(user_id)
+
+            conn = self.get_connection()
+            cursor = conn.cursor()
+
+            cursor.execute("UPDATE users SET alert_mode = ? WHERE user_id = ?", (mode, user_id))
+
+            conn.commit()
+
+            self.users[user_id]['alert_mode'] = mode
+
+    def get_edge_warning_pct(self, user_id: int) -> float:
+        """Get how close to a range edge (in % of price) a position gets before an early warning, 0 = off"""
+        with self.registry_lock:
+            return self.users.get(user_id, {}).get('edge_warning_pct', DEFAULT_EDGE_WARNING_PCT)
+
+    def set_edge_warning_pct(self, user_id: int, pct: float):
+        """Set the early-warning threshold in % of price (0 disables near-edge alerts)"""
+        if not 0 <= pct < 100:
+            raise ValueError(f"Edge warning threshold out of range: {pct}")
+
+        with self.registry_lock:
+            self.add_user(user_id)
+
+            conn = self.get_connection()
+            cursor = conn.cursor()
+
+            cursor.execute("UPDATE users SET edge_warning_pct = ? WHERE user_id = ?", (pct, user_id))
+
+            conn.commit()
+
+            self.users[user_id]['edge_warning_pct'] = pct
+
+    def get_escalation_stages(self, user_id: int) -> List[int]:
+        """Get the minutes after which an out-of-range position is reminded again"""
+        with self.registry_lock:
+            user = self.users.get(user_id)
+            return list(user['escalation_stages']) if user else parse_stages(None)
+
+    def get_all_escalation_stages(self) -> Dict[int, List[int]]:
+        """Escalation stages of every user, used to rebuild the escalation schedule at startup"""
+        with self.registry_lock:
+            return {user_id: list(user['escalation_stages']) for user_id, user in self.users.items()}
+
+    def set_escalation_stages(self, user_id: int, stages: List[int]):
+        """Set the escalation stages in minutes (an empty list disables reminders)"""
+        if any(minutes <= 0 for minutes in stages):
+            raise ValueError(f"Invalid escalation stages: {stages}")
+
+        with self.registry_lock:
+            self.add_user(user_id)
+
+            conn = self.get_connection()
+            cursor = conn.cursor()
+
+            cursor.execute("UPDATE users SET escalation_stages = ? WHERE user_id = ?", (format_stages(stages), user_id))
+
+            conn.commit()
+
+            self.users[user_id]['escalation_stages'] = list(stages)
+
+    def set_user_blocked(self, user_id: int, blocked: bool):
+        """Flag a user who blocked the bot, blocked users are skipped by broadcasts and monitoring"""
+        with self.registry_lock:
+            user = self.users.get(user_id)
+            if user is None or user['is_blocked'] == blocked:
+                return
+
+            conn = self.get_connection()
+            cursor = conn.cursor()
+
+            cursor.execute(
+                "UPDATE users SET is_blocked = ? WHERE user_id = ? AND is_blocked != ?",
+                (1 if blocked else 0, user_id, 1 if blocked else 0)
+            )
+
+            conn.commit()
+
+            user['is_blocked'] = blocked
+
+    def get_user_wallets_for_monitoring(self, user_id: int) -> List[Dict]:
+        """Get wallets with notifications enabled for monitoring"""
+        with self.registry_lock:
+            return [
+                {
+                    'address': wallet['address'],
+                    'alias': wallet['alias'],
+                    'notifications_enabled': True,
+                    'is_active': wallet['is_active']
+                }
+                for wallet in self.wallets.get(user_id, []) if wallet['notifications_enabled']
+            ]
+
+    def has_been_alerted(self, user_id: int, wallet_address: str, position: tuple, alert_type: str = 'out_of_range') -> bool:
+        """Check if user has already been alerted for this position, a (chain_id, protocol, token_id) key"""
         conn = self.get_connection()
         cursor = conn.cursor()
 
-        cursor.execute("INSERT OR IGNORE INTO users (user_id) VALUES (?)", (user_id,))
+        cursor.execute("""
+            SELECT COUNT(*) FROM position_alerts 
+            WHERE user_id = ? AND wallet_address = ? AND chain_id = ? AND protocol = ? AND position_id = ? AND alert_type = ?
+        """, (user_id, wallet_address, *position, alert_type))
+
+        return cursor.fetchone()[0] > 0
+
+    def mark_as_alerted(self, user_id: int, wallet_address: str, position: tuple, alert_type: str = 'out_of_range', out_of_range_since: str = None):
+        """Mark that user has been alerted for this position"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        cursor.execute("""
+            INSERT OR REPLACE INTO position_alerts (user_id, wallet_address, chain_id, protocol, position_id, alert_type, out_of_range_since, alerted_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+        """, (user_id, wallet_address, *position, alert_type, out_of_range_since))
+
         conn.commit()
 
-    def add_wallet(self, user_id: int, address: str, alias: Optional[str] = None) -> bool:
-        """Add a wallet for a user"""
-        self.add_user(user_id)
+    def clear_position_alert(self, user_id: int, wallet_address: str, position: tuple, alert_type: str = None):
+        """Clear alert for position (when it comes back in range)"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        if alert_type:
+            cursor.execute("""
+                DELETE FROM position_alerts 
+                WHERE user_id = ? AND wallet_address = ? AND chain_id = ? AND protocol = ? AND position_id = ? AND alert_type = ?
+            """, (user_id, wallet_address, *position, alert_type))
+        else:
+            cursor.execute("""
+                DELETE FROM position_alerts 
+                WHERE user_id = ? AND wallet_address = ? AND chain_id = ? AND protocol = ? AND position_id = ?
+            """, (user_id, wallet_address, *position))
+
+        conn.commit()
+
+    def clear_out_of_range_alerts(self, user_id: int, wallet_address: str, position: tuple):
+        """Clear the out-of-range alerts of a position back in range, its near-edge alert state is kept"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
 
-        address = Web3.to_checksum_address(address)
+        cursor.execute("""
+            DELETE FROM position_alerts 
+            WHERE user_id = ? AND wallet_address = ? AND chain_id = ? AND protocol = ? AND position_id = ? AND alert_type != 'near_edge'
+        """, (user_id, wallet_address, *position))
 
+        conn.commit()
+
+    def get_out_of_range_since(self, user_id: int, wallet_address: str, position: tuple) -> Optional[str]:
+        """Get timestamp when position went out of range"""
         conn = self.get_connection()
         cursor = conn.cursor()
 
-        try:
+        cursor.execute("""
+            SELECT out_of_range_since FROM position_alerts 
+            WHERE user_id = ? AND wallet_address = ? AND chain_id = ? AND protocol = ? AND position_id = ? AND alert_type = 'out_of_range'
+        """, (user_id, wallet_address, *position))
+
+        result = cursor.fetchone()
+        return result[0] if result else None
+
+    def get_out_of_range_alerts(self) -> List[Dict]:
+        """
+        Every position currently alerted as out of range, with its (chain_id, protocol, token_id)
+        key, its out_of_range_since and the reminder types already sent
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        cursor.execute("""
+            SELECT user_id, wallet_address, chain_id, protocol, position_id, alert_type, out_of_range_since
+            FROM position_alerts
+            WHERE alert_type LIKE 'out%'
+        """)
+
+        alerts: Dict[tuple, Dict] = {}
+        sent: Dict[tuple, set] = {}
+        for user_id, wallet_address, chain_id, protocol, position_id, alert_type, out_of_range_since in cursor.fetchall():
+            key = (user_id, wallet_address, (chain_id, protocol, position_id))
+            if alert_type == 'out_of_range':
+                alerts[key] = {
+                    'user_id': user_id,
+                    'wallet_address': wallet_address,
+                    'position': (chain_id, protocol, position_id),
+                    'out_of_range_since': out_of_range_since
+                }
+            else:
+                sent.setdefault(key, set()).add(alert_type)
+
+        for key, alert in alerts.items():
+            alert['sent'] = sent.get(key, set())
+
+        return list(alerts.values())
+
+    def toggle_notifications(self, user_id: int, address: str, enabled: bool):
+        """Enable/disable notifications for a wallet"""
+        address = to_checksum_address(address)
+
+        with self.registry_lock:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+
             cursor.execute(
-                "INSERT INTO wallets (user_id, address, alias) VALUES (?, ?, ?)",
-                (user_id, address, alias)
+                "UPDATE wallets SET notifications_enabled = ? WHERE user_id = ? AND address = ?",
+                (1 if enabled else 0, user_id, address)
             )
-            conn.commit()
 
-            # Set as active if it's the first wallet
-            cursor.execute("SELECT COUNT(*) FROM wallets WHERE user_id = ?", (user_id,))
-            if cursor.fetchone()[0] == 1:
-                self.set_active_wallet(user_id, address)
+            conn.commit()
 
-            return True
-        except sqlite3.IntegrityError:
-            conn.rollback()
-            return False
+            wallet = self._find_wallet(user_id, address)
+            if wallet:
+                wallet['notifications_enabled'] = enabled
 
-    def get_user_wallets(self, user_id: int) -> List[Dict]:
-        """Get all wallets for a user"""
+    def get_wallet_sync_states(self) -> Dict[str, Dict]:
+        """Refresh state of every wallet seen by the monitor, keyed by address"""
         conn = self.get_connection()
         cursor = conn.cursor()
 
         cursor.execute("""
-            SELECT id, address, alias, is_active 
-            FROM wallets 
-            WHERE user_id = ?
-            ORDER BY created_at DESC
-        """, (user_id,))
+            SELECT address, open_positions, positions_hash, balance, last_activity_block, unchanged_refreshes, refreshed_at
+            FROM wallet_sync_state
+        """)
 
-        wallets = []
+        states = {}
         for row in cursor.fetchall():
-            wallets.append({
-                'id': row[0],
-                'address': row[1],
-                'alias': row[2],
-                'is_active': bool(row[3])
-            })
+            states[row[0]] = {
+                'address': row[0],
+                'open_positions': row[1],
+                'positions_hash': row[2],
+                'balance': row[3],
+                'last_activity_block': row[4],
+                'unchanged_refreshes': row[5],
+                'refreshed_at': row[6]
+            }
 
-        return wallets
+        return states
 
-    def get_active_wallet(self, user_id: int) -> Optional[str]:
-        """Get the active wallet address for a user"""
+    def save_wallet_sync_state(self, state: Dict):
         conn = self.get_connection()
         cursor = conn.cursor()
 
         cursor.execute("""
-            SELECT address 
-            FROM wallets 
-            WHERE user_id = ? AND is_active = 1
-        """, (user_id,))
+            INSERT OR REPLACE INTO wallet_sync_state
+                (address, open_positions, positions_hash, balance, last_activity_block, unchanged_refreshes, refreshed_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, (state['address'], state['open_positions'], state['positions_hash'], state['balance'],
+              state['last_activity_block'], state['unchanged_refreshes'], state['refreshed_at']))
+
+        conn.commit()
+
+    def get_sync_checkpoint(self, name: str) -> Optional[int]:
+        """Last block processed by a log consumer, None if it never ran"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        cursor.execute("SELECT block_number FROM sync_checkpoints WHERE name = ?", (name,))
 
         result = cursor.fetchone()
         return result[0] if result else None
 
-    def set_active_wallet(self, user_id: int, address: str):
-        """Set a wallet as active"""
-        address = Web3.to_checksum_address(address)
+    def get_sync_checkpoint_hash(self, name: str) -> Optional[str]:
+        """Hash of the checkpoint block when it was processed, None if it was not recorded"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
 
+        cursor.execute("SELECT block_hash FROM sync_checkpoints WHERE name = ?", (name,))
+
+        result = cursor.fetchone()
+        return result[0] if result else None
+
+    def set_sync_checkpoint(self, name: str, block_number: int, block_hash: Optional[str] = None):
         conn = self.get_connection()
         cursor = conn.cursor()
 
-        # Deactivate all wallets for this user
-        cursor.execute("UPDATE wallets SET is_active = 0 WHERE user_id = ?", (user_id,))
+        cursor.execute("""
+            INSERT OR REPLACE INTO sync_checkpoints (name, block_number, block_hash, updated_at)
+            VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+        """, (name, block_number, block_hash))
+
+        conn.commit()
 
-        # Activate the selected wallet
-        cursor.execute(
-            "UPDATE wallets SET is_active = 1 WHERE user_id = ? AND address = ?",
-            (user_id, address)
+    def get_owned_token_ids(self, chain_id: int, protocol: str, owner: str, include_closed: bool = False) -> List[int]:
+        """Token IDs of a protocol's ownership index held by a wallet, tombstoned (closed) ones excluded by default"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        query = "SELECT token_id FROM position_owners WHERE chain_id = ? AND protocol = ? AND owner = ?"
+        if not include_closed:
+            query += " AND closed = 0"
+        cursor.execute(query + " ORDER BY token_id", (chain_id, protocol, owner))
+
+        return [row[0] for row in cursor.fetchall()]
+
+    def get_indexed_owners(self) -> List[tuple]:
+        """(chain_id, protocol, wallet) of the wallets whose token IDs are kept in the ownership index"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        cursor.execute("SELECT name FROM sync_checkpoints WHERE name LIKE 'owners:%'")
+
+        owners = []
+        for (name,) in cursor.fetchall():
+            _, chain_id, protocol, owner = name.split(':', 3)
+            owners.append((int(chain_id), protocol, owner))
+        return owners
+
+    def replace_owned_tokens(self, chain_id: int, protocol: str, owner: str, token_ids: List[int], block_number: int):
+        """Seed a wallet's entries of a protocol's ownership index with the token IDs it held at block_number"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        cursor.execute("DELETE FROM position_owners WHERE chain_id = ? AND protocol = ? AND owner = ?", (chain_id, protocol, owner))
+        cursor.executemany(
+            "INSERT OR REPLACE INTO position_owners (chain_id, protocol, token_id, owner, closed, updated_block) VALUES (?, ?, ?, ?, 0, ?)",
+            [(chain_id, protocol, token_id, owner, block_number) for token_id in token_ids]
         )
+        cursor.execute("""
+            INSERT OR REPLACE INTO sync_checkpoints (name, block_number, updated_at)
+            VALUES (?, ?, CURRENT_TIMESTAMP)
+        """, (f"owners:{chain_id}:{protocol}:{owner}", block_number))
 
         conn.commit()
 
-    def delete_wallet(self, user_id: int, address: str) -> bool:
-        """Delete a wallet"""
-        address = Web3.to_checksum_address(address)
+    def apply_token_transfers(self, chain_id: int, protocol: str, transfers: List[tuple]):
+        """
+        Apply (token_id, new_owner, block_number) transfers to a protocol's ownership index, new_owner
+        None for tokens leaving the indexed wallets. Transfers older than a token's entry are ignored.
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        for token_id, new_owner, block_number in transfers:
+            cursor.execute(
+                "SELECT updated_block FROM position_owners WHERE chain_id = ? AND protocol = ? AND token_id = ?",
+                (chain_id, protocol, token_id)
+            )
+            row = cursor.fetchone()
+            if row and row[0] >= block_number:
+                continue
+
+            if new_owner is None:
+                cursor.execute(
+                    "DELETE FROM position_owners WHERE chain_id = ? AND protocol = ? AND token_id = ?",
+                    (chain_id, protocol, token_id)
+                )
+            else:
+                cursor.execute(
+                    "INSERT OR REPLACE INTO position_owners (chain_id, protocol, token_id, owner, closed, updated_block) VALUES (?, ?, ?, ?, 0, ?)",
+                    (chain_id, protocol, token_id, new_owner, block_number)
+                )
 
+        conn.commit()
+
+    def get_token_owners(self, chain_id: int, protocol: str, token_ids: List[int]) -> Dict[int, str]:
+        """Indexed owner of each token ID of a protocol, tokens outside the index are left out"""
         conn = self.get_connection()
         cursor = conn.cursor()
 
-        cursor.execute(
-            "DELETE FROM wallets WHERE user_id = ? AND address = ?",
-            (user_id, address)
+        owners = {}
+        for token_id in token_ids:
+            cursor.execute(
+                "SELECT owner FROM position_owners WHERE chain_id = ? AND protocol = ? AND token_id = ?",
+                (chain_id, protocol, token_id)
+            )
+            row = cursor.fetchone()
+            if row:
+                owners[token_id] = row[0]
+
+        return owners
+
+    def set_tokens_closed(self, chain_id: int, protocol: str, token_ids: List[int], closed: bool):
+        """Tombstone positions whose liquidity reached zero, or revive them when liquidity is added again"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        cursor.executemany(
+            "UPDATE position_owners SET closed = ? WHERE chain_id = ? AND protocol = ? AND token_id = ?",
+            [(1 if closed else 0, chain_id, protocol, token_id) for token_id in token_ids]
         )
 
-        deleted = cursor.rowcount > 0
         conn.commit()
 
-        return deleted
+    def clear_ownership_index(self, chain_id: int, protocol: str):
+        """Drop a protocol's ownership index"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
 
-    def update_alias(self, user_id: int, address: str, alias: str):
-        """Update wallet alias"""
-        address = Web3.to_checksum_address(address)
+        cursor.execute("DELETE FROM position_owners WHERE chain_id = ? AND protocol = ?", (chain_id, protocol))
+        cursor.execute("DELETE FROM sync_checkpoints WHERE name LIKE ?", (f"owners:{chain_id}:{protocol}:%",))
+
+        conn.commit()
 
+    def add_outbound_message(self, chat_id: int, text: str, parse_mode: Optional[str], priority: int) -> int:
+        """Persist a message waiting to be sent, returns its id"""
         conn = self.get_connection()
         cursor = conn.cursor()
 
         cursor.execute(
-            "UPDATE wallets SET alias = ? WHERE user_id = ? AND address = ?",
-            (alias, user_id, address)
+            "INSERT INTO outbound_messages (chat_id, text, parse_mode, priority) VALUES (?, ?, ?, ?)",
+            (chat_id, text, parse_mode, priority)
         )
 
         conn.commit()
+        return cursor.lastrowid
 
-    def get_wallet_display_name(self, address: str, alias: Optional[str] = None) -> str:
-        """Get display name for a wallet"""
-        if alias:
-            return f"{alias} ({address[:6]}...{address[-4:]})"
-        return f"{address[:6]}...{address[-4:]}"
-
-    def get_all_user_ids(self) -> List[int]:
-        """Get all user IDs that have registered with the bot"""
+    def delete_outbound_message(self, message_id: int):
+        """Remove a message once it has been sent or given up on"""
         conn = self.get_connection()
         cursor = conn.cursor()
 
-        cursor.execute("SELECT DISTINCT user_id FROM users ORDER BY created_at")
+        cursor.execute("DELETE FROM outbound_messages WHERE id = ?", (message_id,))
 
-        user_ids = [row[0] for row in cursor.fetchall()]
-        return user_ids
+        conn.commit()
 
-    def get_user_wallets_for_monitoring(self, user_id: int) -> List[Dict]:
-        """Get wallets with notifications enabled for monitoring"""
+    def get_pending_outbound_messages(self) -> List[Dict]:
+        """Get messages that were queued but not sent, oldest first"""
         conn = self.get_connection()
         cursor = conn.cursor()
 
         cursor.execute("""
-            SELECT address, alias, notifications_enabled, is_active
-            FROM wallets 
-            WHERE user_id = ? AND notifications_enabled = 1
-            ORDER BY created_at DESC
-        """, (user_id,))
+            SELECT id, chat_id, text, parse_mode, priority
+            FROM outbound_messages
+            ORDER BY id
+        """)
 
-        wallets = []
+        messages = []
         for row in cursor.fetchall():
-            wallets.append({
-                'address': row[0],
-                'alias': row[1],
-                'notifications_enabled': bool(row[2]),
-                'is_active': bool(row[3])
+            messages.append({
+                'id': row[0],
+                'chat_id': row[1],
+                'text': row[2],
+                'parse_mode': row[3],
+                'priority': row[4]
             })
 
-        return wallets
+        return messages
 
-    def has_been_alerted(self, user_id: int, wallet_address: str, position_id: int, alert_type: str = 'out_of_range') -> bool:
-        """Check if user has already been alerted for this position"""
+    def create_broadcast_job(self, admin_id: int, status_chat_id: int, status_message_id: int,
+                             text: str, user_ids: List[int]) -> int:
+        """Create a broadcast job with one pending recipient row per user, returns the job id"""
         conn = self.get_connection()
         cursor = conn.cursor()
 
-        cursor.execute("""
-            SELECT COUNT(*) FROM position_alerts 
-            WHERE user_id = ? AND wallet_address = ? AND position_id = ? AND alert_type = ?
-        """, (user_id, wallet_address, position_id, alert_type))
+        cursor.execute(
+            "INSERT INTO broadcast_jobs (admin_id, status_chat_id, status_message_id, text) VALUES (?, ?, ?, ?)",
+            (admin_id, status_chat_id, status_message_id, text)
+        )
+        job_id = cursor.lastrowid
 
-        return cursor.fetchone()[0] > 0
+        cursor.executemany(
+            "INSERT OR IGNORE INTO broadcast_recipients (job_id, user_id) VALUES (?, ?)",
+            [(job_id, user_id) for user_id in user_ids]
+        )
 
-    def mark_as_alerted(self, user_id: int, wallet_address: str, position_id: int, alert_type: str = 'out_of_range', out_of_range_since: str = None):
-        """Mark that user has been alerted for this position"""
+        conn.commit()
+        return job_id
+
+    def get_broadcast_job(self, job_id: int) -> Optional[Dict]:
+        """Get a broadcast job"""
         conn = self.get_connection()
         cursor = conn.cursor()
 
         cursor.execute("""
-            INSERT OR REPLACE INTO position_alerts (user_id, wallet_address, position_id, alert_type, out_of_range_since, alerted_at)
-            VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
-        """, (user_id, wallet_address, position_id, alert_type, out_of_range_since))
+            SELECT id, admin_id, status_chat_id, status_message_id, text, status
+            FROM broadcast_jobs
+            WHERE id = ?
+        """, (job_id,))
+
+        row = cursor.fetchone()
+        if not row:
+            return None
+
+        return {
+            'id': row[0],
+            'admin_id': row[1],
+            'status_chat_id': row[2],
+            'status_message_id': row[3],
+            'text': row[4],
+            'status': row[5]
+        }
+
+    def get_running_broadcast_job_ids(self) -> List[int]:
+        """Get broadcast jobs that were interrupted before completion"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
 
-        conn.commit()
+        cursor.execute("SELECT id FROM broadcast_jobs WHERE status = 'running' ORDER BY id")
 
-    def clear_position_alert(self, user_id: int, wallet_address: str, position_id: int, alert_type: str = None):
-        """Clear alert for position (when it comes back in range)"""
+        return [row[0] for row in cursor.fetchall()]
+
+    def get_pending_broadcast_recipients(self, job_id: int) -> List[int]:
+        """Get users of a broadcast job who have not been sent the message yet"""
         conn = self.get_connection()
         cursor = conn.cursor()
 
-        if alert_type:
-            cursor.execute("""
-                DELETE FROM position_alerts 
-                WHERE user_id = ? AND wallet_address = ? AND position_id = ? AND alert_type = ?
-            """, (user_id, wallet_address, position_id, alert_type))
-        else:
-            cursor.execute("""
-                DELETE FROM position_alerts 
-                WHERE user_id = ? AND wallet_address = ? AND position_id = ?
-            """, (user_id, wallet_address, position_id))
+        cursor.execute(
+            "SELECT user_id FROM broadcast_recipients WHERE job_id = ? AND status = 'pending'",
+            (job_id,)
+        )
+
+        return [row[0] for row in cursor.fetchall()]
+
+    def update_broadcast_recipients(self, job_id: int, results: List[tuple]):
+        """Record delivery results as (user_id, status, error) tuples in one transaction"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        cursor.executemany(
+            "UPDATE broadcast_recipients SET status = ?, error = ? WHERE job_id = ? AND user_id = ?",
+            [(status, error, job_id, user_id) for user_id, status, error in results]
+        )
 
         conn.commit()
 
-    def get_out_of_range_since(self, user_id: int, wallet_address: str, position_id: int) -> Optional[str]:
-        """Get timestamp when position went out of range"""
+    def get_broadcast_counts(self, job_id: int) -> Dict[str, int]:
+        """Count recipients of a broadcast job per status"""
         conn = self.get_connection()
         cursor = conn.cursor()
 
-        cursor.execute("""
-            SELECT out_of_range_since FROM position_alerts 
-            WHERE user_id = ? AND wallet_address = ? AND position_id = ? AND alert_type = 'out_of_range'
-        """, (user_id, wallet_address, position_id))
+        cursor.execute(
+            "SELECT status, COUNT(*) FROM broadcast_recipients WHERE job_id = ? GROUP BY status",
+            (job_id,)
+        )
 
-        result = cursor.fetchone()
-        return result[0] if result else None
+        counts = {'pending': 0, 'sent': 0, 'failed': 0, 'blocked': 0}
+        for status, count in cursor.fetchall():
+            counts[status] = count
 
-    def toggle_notifications(self, user_id: int, address: str, enabled: bool):
-        """Enable/disable notifications for a wallet"""
-        address = Web3.to_checksum_address(address)
+        return counts
 
+    def finish_broadcast_job(self, job_id: int):
+        """Mark a broadcast job as done"""
         conn = self.get_connection()
         cursor = conn.cursor()
 
         cursor.execute(
-            "UPDATE wallets SET notifications_enabled = ? WHERE user_id = ? AND address = ?",
-            (1 if enabled else 0, user_id, address)
+            "UPDATE broadcast_jobs SET status = 'done', finished_at = CURRENT_TIMESTAMP WHERE id = ?",
+            (job_id,)
         )
 
-        conn.commit()
\ No newline at end of file
+        conn.commit()
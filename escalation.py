@@ -0,0 +1,173 @@
+"""
+Escalation of out-of-range alerts.
+
+A position that leaves its range gets an immediate alert, then one reminder per escalation stage
+of its user (for example 15m, 1h, 4h and 24h after it went out). Stages are minutes stored per
+user; each reminder sent is recorded in position_alerts as 'out_<label>' ('out_4h', ...).
+
+The scheduler keeps every out-of-range position in memory with the due time of its next stage,
+in a heap, so a monitoring cycle only pops the positions that are actually due instead of
+re-reading and parsing out_of_range_since for every out-of-range position.
+"""
+
+import heapq
+import itertools
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+DEFAULT_ESCALATION_STAGES = [240]
+RETRY_DELAY = 60  # Seconds before a due reminder that could not be sent is tried again
+ESCALATION_PRESETS = [[240], [60, 240, 1440], [15, 60, 240, 1440], []]  # Offered in the notification settings
+
+
+def stage_label(minutes: int) -> str:
+    if minutes % 60:
+        return f"{minutes}m"
+    return f"{minutes // 60}h"
+
+
+def stage_alert_type(minutes: int) -> str:
+    """position_alerts type of a stage, 'out_4h' for the historical 4 hour reminder"""
+    return f"out_{stage_label(minutes)}"
+
+
+def parse_stages(text: Optional[str]) -> List[int]:
+    """Stages as stored in the database: minutes separated by commas, empty for no reminders"""
+    if text is None:
+        return list(DEFAULT_ESCALATION_STAGES)
+    return sorted(int(value) for value in text.split(',') if value.strip())
+
+
+def format_stages(stages: List[int]) -> str:
+    return ",".join(str(minutes) for minutes in sorted(stages))
+
+
+def format_duration(seconds: float) -> str:
+    if seconds < 3600:
+        return f"{int(seconds // 60)} minutes"
+    return f"{seconds / 3600:.1f} hours"
+
+
+class EscalationScheduler:
+    """
+    Out-of-range positions keyed (user_id, wallet address, position_key), each with the index of
+    its next stage and a heap entry at that stage's due time.
+
+    Heap entries are invalidated lazily: a position back in range or rescheduled gets a new
+    generation, and popped entries whose generation no longer matches are dropped.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self.lock = threading.Lock()
+        self.heap: List[Tuple[float, int, Tuple]] = []
+        self.tracked: Dict[Tuple, Dict] = {}
+        self.user_stages: Dict[int, List[int]] = {}
+        self.generations = itertools.count()
+
+    def load(self):
+        """Rebuild the schedule from position_alerts, e.g. after a restart"""
+        user_stages = self.db.get_all_escalation_stages()
+        alerts = self.db.get_out_of_range_alerts()
+
+        with self.lock:
+            self.heap = []
+            self.tracked = {}
+            self.user_stages = user_stages
+
+            for alert in alerts:
+                key = (alert['user_id'], alert['wallet_address'], alert['position'])
+                since = alert['out_of_range_since']
+                since = datetime.fromisoformat(since).timestamp() if since else time.time()
+
+                # Resume after the last stage already sent
+                stages = self.stages_for(alert['user_id'])
+                sent = [i for i, minutes in enumerate(stages) if stage_alert_type(minutes) in alert['sent']]
+                self._track(key, since, sent[-1] + 1 if sent else 0)
+
+    def stages_for(self, user_id: int) -> List[int]:
+        return self.user_stages.get(user_id, DEFAULT_ESCALATION_STAGES)
+
+    def is_out_of_range(self, key: Tuple) -> bool:
+        return key in self.tracked
+
+    def start(self, key: Tuple, since: Optional[float] = None):
+        """Track a position that just went out of range"""
+        with self.lock:
+            self._track(key, since if since is not None else time.time(), 0)
+
+    def stop(self, key: Tuple):
+        """Forget a position that is back in range (its heap entry is dropped when popped)"""
+        with self.lock:
+            self.tracked.pop(key, None)
+
+    def stop_wallet(self, user_id: int, address: str):
+        """Forget every position of a wallet, e.g. a deleted one"""
+        with self.lock:
+            for key in [key for key in self.tracked if key[:2] == (user_id, address)]:
+                del self.tracked[key]
+
+    def set_user_stages(self, user_id: int, stages: List[int]):
+        """Apply new stages to a user's out-of-range positions, stages already behind them are not sent"""
+        now = time.time()
+        with self.lock:
+            self.user_stages[user_id] = sorted(stages)
+            for key, entry in list(self.tracked.items()):
+                if key[0] == user_id:
+                    elapsed = now - entry['since']
+                    next_stage = next((i for i, minutes in enumerate(self.user_stages[user_id]) if minutes * 60 > elapsed),
+                                      len(self.user_stages[user_id]))
+                    self._track(key, entry['since'], next_stage)
+
+    def _track(self, key: Tuple, since: float, stage: int):
+        entry = {'since': since, 'stage': stage, 'generation': next(self.generations)}
+        self.tracked[key] = entry
+
+        stages = self.stages_for(key[0])
+        if stage < len(stages):
+            heapq.heappush(self.heap, (since + stages[stage] * 60, entry['generation'], key))
+
+    def pop_due(self, now: Optional[float] = None) -> List[Tuple[Tuple, int, int, float]]:
+        """
+        Pop the positions whose next stage is due.
+
+        Returns (key, stage index, stage minutes, seconds out of range). When several stages are
+        overdue (the bot was down), only the latest one is returned. The following stage is only
+        scheduled by sent(): a reminder that could not be built is put back with retry().
+        """
+        now = now if now is not None else time.time()
+        due = []
+
+        with self.lock:
+            while self.heap and self.heap[0][0] <= now:
+                _, generation, key = heapq.heappop(self.heap)
+                entry = self.tracked.get(key)
+                if not entry or entry['generation'] != generation:
+                    continue
+
+                stages = self.stages_for(key[0])
+                elapsed = now - entry['since']
+                stage = entry['stage']
+                while stage + 1 < len(stages) and stages[stage + 1] * 60 <= elapsed:
+                    stage += 1
+
+                due.append((key, stage, stages[stage], elapsed))
+
+        return due
+
+    def sent(self, key: Tuple, stage: int):
+        """Record the reminder of a popped stage as sent and schedule the next stage"""
+        with self.lock:
+            entry = self.tracked.get(key)
+            if entry:
+                self._track(key, entry['since'], stage + 1)
+
+    def retry(self, key: Tuple, delay: float = RETRY_DELAY, now: Optional[float] = None):
+        """Put a popped position back, at the same stage, to be due again in `delay` seconds"""
+        now = now if now is not None else time.time()
+        with self.lock:
+            entry = self.tracked.get(key)
+            if entry:
+                heapq.heappush(self.heap, (now + delay, entry['generation'], key))
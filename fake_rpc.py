@@ -0,0 +1,458 @@
+"""
+Local stand-in for the Hyperliquid EVM JSON-RPC endpoint, used by benchmark.py.
+
+Serves synthetic but internally consistent data for the contracts the tracker reads:
+NonfungiblePositionManager (balanceOf, tokenOfOwnerByIndex, positions, collect), the factory
+(getPool), pools (slot0) and ERC-20 tokens (symbol, decimals). Latency and HTTP 429 responses
+can be injected to reproduce the conditions of the public endpoint. FakeWebSocketServer serves
+eth_subscribe (newHeads, logs) over the same chain.
+"""
+
+import itertools
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+from eth_abi import decode, encode
+from eth_utils import function_signature_to_4byte_selector, keccak, to_checksum_address
+from web3.providers.base import JSONBaseProvider
+
+POSITION_MANAGER = "0xeaD19AE861c29bBb2101E834922B2FEee69B9091"
+FACTORY = "0xFf7B3e8C00e57ea31477c32A5B52a58Eea47b072"
+CHAIN_ID = 999
+
+SELECTORS = {
+    function_signature_to_4byte_selector(signature).hex(): name
+    for name, signature in {
+        'balanceOf': 'balanceOf(address)',
+        'tokenOfOwnerByIndex': 'tokenOfOwnerByIndex(address,uint256)',
+        'positions': 'positions(uint256)',
+        'collect': 'collect((uint256,address,uint128,uint128))',
+        'getPool': 'getPool(address,address,uint24)',
+        'slot0': 'slot0()',
+        'liquidity': 'liquidity()',
+        'symbol': 'symbol()',
+        'decimals': 'decimals()',
+    }.items()
+}
+
+
+TRANSFER_TOPIC = "0x" + keccak(text='Transfer(address,address,uint256)').hex()
+INCREASE_LIQUIDITY_TOPIC = "0x" + keccak(text='IncreaseLiquidity(uint256,uint128,uint256,uint256)').hex()
+DECREASE_LIQUIDITY_TOPIC = "0x" + keccak(text='DecreaseLiquidity(uint256,uint128,uint256,uint256)').hex()
+SWAP_TOPIC = "0x" + keccak(text='Swap(address,address,int256,int256,uint160,uint128,int24)').hex()
+ZERO_ADDRESS = "0x0000000000000000000000000000000000000000"
+
+
+def _topic(value) -> str:
+    if isinstance(value, str):
+        return "0x" + value[2:].lower().rjust(64, '0')
+    return "0x" + format(value, '064x')
+
+
+def _address(prefix: int, index: int) -> str:
+    return to_checksum_address(f"0x{prefix:08x}{index:032x}")
+
+
+class FakeChain:
+    """
+    Deterministic synthetic state: `wallet_count` wallets holding `positions_per_wallet` NFTs each
+    (a `closed_ratio` share with zero liquidity), spread over `pool_count` pools.
+    """
+
+    def __init__(self, wallet_count: int = 100, positions_per_wallet: int = 3, pool_count: int = 10,
+                 closed_ratio: float = 0.25, seed: int = 1):
+        rng = random.Random(seed)
+        self.block_number = 1_000_000
+        self.logs: List[Dict] = []
+        self.forks: List[int] = []  # First block of every reorganized segment, block hashes change from there
+
+        self.tokens = {}
+        self.pools = {}
+        self.pool_by_key = {}
+        for p in range(pool_count):
+            token0 = _address(0x70000000, 2 * p)
+            token1 = _address(0x70000000, 2 * p + 1)
+            if token0.lower() > token1.lower():
+                token0, token1 = token1, token0
+            self.tokens[token0.lower()] = (f"TKA{p}", 18)
+            self.tokens[token1.lower()] = (f"TKB{p}", 6)
+
+            pool = _address(0x900000, p)
+            tick = rng.randint(-300000, -250000)
+            self.pools[pool.lower()] = {'token0': token0, 'token1': token1, 'fee': 3000, 'tick': tick,
+                                        'liquidity': 10 ** 18}
+            self.pool_by_key[(token0.lower(), token1.lower(), 3000)] = pool
+
+        pool_addresses = list(self.pools)
+        self.wallets = []
+        self.owned: Dict[str, List[int]] = {}
+        self.positions: Dict[int, tuple] = {}
+        token_id = 1
+        for w in range(wallet_count):
+            wallet = _address(0xa11ce000, w)
+            self.wallets.append(wallet)
+            self.owned[wallet.lower()] = []
+
+            for _ in range(positions_per_wallet):
+                pool = self.pools[rng.choice(pool_addresses)]
+                width = rng.choice([60, 600, 6000])
+                center = pool['tick'] + rng.randint(-2 * width, 2 * width)
+                tick_lower = (center - width) // 60 * 60
+                tick_upper = (center + width) // 60 * 60
+                liquidity = 0 if rng.random() < closed_ratio else rng.randint(10 ** 15, 10 ** 20)
+
+                self.positions[token_id] = (
+                    0, "0x0000000000000000000000000000000000000000", pool['token0'], pool['token1'], pool['fee'],
+                    tick_lower, tick_upper, liquidity, 0, 0, rng.randint(0, 10 ** 16), rng.randint(0, 10 ** 6)
+                )
+                self.owned[wallet.lower()].append(token_id)
+                token_id += 1
+
+    def sqrt_price_x96(self, tick: int) -> int:
+        return int((1.0001 ** (tick / 2)) * 2 ** 96)
+
+    def eth_call(self, to: str, data: str) -> str:
+        to = to.lower()
+        data = data[2:] if data.startswith("0x") else data
+        name = SELECTORS.get(data[:8])
+        args = bytes.fromhex(data[8:])
+
+        if to == POSITION_MANAGER.lower():
+            if name == 'balanceOf':
+                (owner,) = decode(['address'], args)
+                return encode(['uint256'], [len(self.owned.get(owner.lower(), []))]).hex()
+            if name == 'tokenOfOwnerByIndex':
+                owner, index = decode(['address', 'uint256'], args)
+                return encode(['uint256'], [self.owned[owner.lower()][index]]).hex()
+            if name == 'positions':
+                (token_id,) = decode(['uint256'], args)
+                return encode(
+                    ['uint96', 'address', 'address', 'address', 'uint24', 'int24', 'int24', 'uint128',
+                     'uint256', 'uint256', 'uint128', 'uint128'],
+                    list(self.positions[token_id])
+                ).hex()
+            if name == 'collect':
+                ((token_id, _, _, _),) = decode(['(uint256,address,uint128,uint128)'], args)
+                position = self.positions[token_id]
+                return encode(['uint256', 'uint256'], [position[10], position[11]]).hex()
+
+        if to == FACTORY.lower() and name == 'getPool':
+            token0, token1, fee = decode(['address', 'address', 'uint24'], args)
+            key = tuple(sorted([token0.lower(), token1.lower()])) + (fee,)
+            pool = self.pool_by_key.get(key, "0x0000000000000000000000000000000000000000")
+            return encode(['address'], [pool]).hex()
+
+        if to in self.pools and name == 'slot0':
+            tick = self.pools[to]['tick']
+            return encode(
+                ['uint160', 'int24', 'uint16', 'uint16', 'uint16', 'uint8', 'bool'],
+                [self.sqrt_price_x96(tick), tick, 0, 1, 1, 0, True]
+            ).hex()
+        if to in self.pools and name == 'liquidity':
+            return encode(['uint128'], [self.pools[to]['liquidity']]).hex()
+
+        if to in self.tokens:
+            symbol, decimals = self.tokens[to]
+            if name == 'symbol':
+                return encode(['string'], [symbol]).hex()
+            if name == 'decimals':
+                return encode(['uint8'], [decimals]).hex()
+
+        raise ValueError("execution reverted")
+
+    def _emit(self, topics: List[str], address: str = POSITION_MANAGER, data: str = "0x" + "00" * 96):
+        self.block_number += 1
+        self.logs.append({
+            'address': address, 'topics': topics, 'data': data,
+            'blockNumber': hex(self.block_number), 'blockHash': self.block_hash(self.block_number), 'logIndex': "0x0",
+        })
+
+    def block_hash(self, number: int) -> str:
+        fork = sum(1 for start in self.forks if start <= number)
+        return "0x" + keccak(text=f"{fork}:{number}").hex()
+
+    def get_block(self, tag: str) -> Optional[Dict]:
+        number = self.block_number if tag == 'latest' else int(tag, 16)
+        if number > self.block_number:
+            return None
+        return {'number': hex(number), 'hash': self.block_hash(number), 'parentHash': self.block_hash(number - 1)}
+
+    def reorg(self, depth: int):
+        """Replace the last `depth` blocks: their hashes change and their logs are dropped (the state is kept)"""
+        start = self.block_number - depth + 1
+        self.forks.append(start)
+        self.logs = [log for log in self.logs if int(log['blockNumber'], 16) < start]
+
+    def transfer(self, token_id: int, to: str):
+        """Move a position NFT to another wallet, with its Transfer log"""
+        owner = next(wallet for wallet, token_ids in self.owned.items() if token_id in token_ids)
+        self.owned[owner].remove(token_id)
+        self.owned.setdefault(to.lower(), []).append(token_id)
+        self._emit([TRANSFER_TOPIC, _topic(owner), _topic(to), _topic(token_id)])
+
+    def set_liquidity(self, token_id: int, liquidity: int):
+        """Change a position's liquidity, with its IncreaseLiquidity or DecreaseLiquidity log"""
+        position = list(self.positions[token_id])
+        topic = INCREASE_LIQUIDITY_TOPIC if liquidity > position[7] else DECREASE_LIQUIDITY_TOPIC
+        position[7] = liquidity
+        self.positions[token_id] = tuple(position)
+        self._emit([topic, _topic(token_id)])
+
+    def get_logs(self, log_filter: Dict) -> List[Dict]:
+        from_block = int(log_filter.get('fromBlock', hex(self.block_number)), 16)
+        to_block = int(log_filter.get('toBlock', hex(self.block_number)), 16)
+        address = log_filter.get('address')
+        addresses = {a.lower() for a in ([address] if isinstance(address, str) else address or [])}
+        topics = log_filter.get('topics') or []
+
+        def _matches(log):
+            if addresses and log['address'].lower() not in addresses:
+                return False
+            for wanted, actual in zip(topics, log['topics']):
+                if wanted is not None and actual not in (wanted if isinstance(wanted, list) else [wanted]):
+                    return False
+            return True
+
+        return [log for log in self.logs if from_block <= int(log['blockNumber'], 16) <= to_block and _matches(log)]
+
+    def move_pool(self, pool: str, ticks: int):
+        """Shift a pool's price, e.g. to push positions out of range between two monitor cycles"""
+        state = self.pools[pool.lower()]
+        state['tick'] += ticks
+        data = encode(['int256', 'int256', 'uint160', 'uint128', 'int24'],
+                      [0, 0, self.sqrt_price_x96(state['tick']), state['liquidity'], state['tick']])
+        self._emit([SWAP_TOPIC, _topic(ZERO_ADDRESS), _topic(ZERO_ADDRESS)], to_checksum_address(pool), "0x" + data.hex())
+
+
+class FakeRpcServer:
+    """
+    Threaded HTTP JSON-RPC server over a FakeChain, with latency and 429 injection.
+    Batch arrays are accepted up to max_batch_size items (HTTP 413 above, 0 = unlimited), and
+    eth_getLogs up to max_log_range blocks (0 = unlimited) like public endpoints.
+    """
+
+    def __init__(self, chain: FakeChain, latency: float = 0.0, error_rate_429: float = 0.0,
+                 host: str = "127.0.0.1", port: int = 0, max_batch_size: int = 0, max_log_range: int = 0):
+        self.chain = chain
+        self.max_log_range = max_log_range
+        self.latency = latency
+        self.error_rate_429 = error_rate_429
+        self.max_batch_size = max_batch_size
+        self.calls: Dict[str, int] = {}
+        self.http_requests = 0
+        self.rate_limited = 0
+        self.lock = threading.Lock()
+        self.rng = random.Random(0)
+
+        server = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                status, payload = server.handle(json.loads(body))
+                data = json.dumps(payload).encode() if payload is not None else self.responses[status][0].encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        self.httpd = ThreadingHTTPServer((host, port), _Handler)
+        self.httpd.daemon_threads = True
+        self.thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> 'FakeRpcServer':
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def reset_counters(self):
+        with self.lock:
+            self.calls = {}
+            self.http_requests = 0
+            self.rate_limited = 0
+
+    @property
+    def total_calls(self) -> int:
+        return sum(self.calls.values())
+
+    def handle(self, request):
+        if self.latency:
+            time.sleep(self.latency)
+
+        with self.lock:
+            self.http_requests += 1
+            if self.error_rate_429 and self.rng.random() < self.error_rate_429:
+                self.rate_limited += 1
+                return 429, None
+
+        if isinstance(request, list) and self.max_batch_size and len(request) > self.max_batch_size:
+            return 413, None
+
+        if isinstance(request, list):
+            return 200, [self.dispatch(item) for item in request]
+        return 200, self.dispatch(request)
+
+    def dispatch(self, request: Dict) -> Dict:
+        method = request.get('method')
+        params = request.get('params', [])
+        label = method
+
+        try:
+            if method == 'eth_chainId':
+                result = hex(CHAIN_ID)
+            elif method == 'net_version':
+                result = str(CHAIN_ID)
+            elif method == 'eth_blockNumber':
+                result = hex(self.chain.block_number)
+            elif method == 'eth_getBlockByNumber':
+                result = self.chain.get_block(params[0])
+            elif method == 'eth_getLogs':
+                log_filter = params[0]
+                block_range = int(log_filter['toBlock'], 16) - int(log_filter['fromBlock'], 16) + 1
+                if self.max_log_range and block_range > self.max_log_range:
+                    return {'jsonrpc': '2.0', 'id': request.get('id'),
+                            'error': {'code': -32005, 'message': f"block range too large, max {self.max_log_range}"}}
+                result = self.chain.get_logs(log_filter)
+            elif method == 'eth_call':
+                call = params[0]
+                data = call.get('data') or call.get('input')
+                label = f"eth_call:{SELECTORS.get(data[2:10], data[:10])}"
+                result = "0x" + self.chain.eth_call(call['to'], data)
+            else:
+                return {'jsonrpc': '2.0', 'id': request.get('id'),
+                        'error': {'code': -32601, 'message': f"Method {method} not supported"}}
+        except Exception as e:
+            return {'jsonrpc': '2.0', 'id': request.get('id'), 'error': {'code': 3, 'message': str(e)}}
+        finally:
+            with self.lock:
+                self.calls[label] = self.calls.get(label, 0) + 1
+
+        return {'jsonrpc': '2.0', 'id': request.get('id'), 'result': result}
+
+
+class FakeWebSocketServer:
+    """
+    eth_subscribe endpoint over a FakeChain, the WebSocket counterpart of FakeRpcServer. Runs in
+    the caller's event loop and pushes newHeads and matching logs as the chain advances, checked
+    every `interval` seconds. close_connections() drops the clients to exercise reconnection.
+    Answers to logs subscriptions can be delayed by `subscribe_delay` seconds (the subscription is
+    live meanwhile), and `subscriptions` holds the filter of every live subscription.
+    """
+
+    def __init__(self, chain: FakeChain, host: str = "127.0.0.1", port: int = 0, interval: float = 0.02,
+                 subscribe_delay: float = 0.0):
+        self.chain = chain
+        self.host = host
+        self.port = port
+        self.interval = interval
+        self.subscribe_delay = subscribe_delay
+        self.server = None
+        self.connections = set()
+        self.subscriptions: Dict[str, Optional[Dict]] = {}
+        self.ids = itertools.count(1)
+        self.notifications = 0
+
+    @property
+    def url(self) -> str:
+        host, port = list(self.server.sockets)[0].getsockname()[:2]
+        return f"ws://{host}:{port}"
+
+    async def start(self) -> 'FakeWebSocketServer':
+        import websockets
+        self.server = await websockets.serve(self._serve, self.host, self.port)
+        return self
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def close_connections(self):
+        for connection in list(self.connections):
+            await connection.close()
+
+    async def _serve(self, connection):
+        import asyncio
+
+        self.connections.add(connection)
+        subscriptions: Dict[str, Optional[Dict]] = {}
+        last_block = self.chain.block_number
+
+        async def _push():
+            nonlocal last_block
+            while True:
+                await asyncio.sleep(self.interval)
+                head = self.chain.block_number
+                if head == last_block:
+                    continue
+                for subscription, log_filter in list(subscriptions.items()):
+                    if log_filter is None:
+                        results = [self.chain.get_block(hex(head))]
+                    else:
+                        results = self.chain.get_logs({**log_filter, 'fromBlock': hex(last_block + 1), 'toBlock': hex(head)})
+                    for result in results:
+                        self.notifications += 1
+                        await connection.send(json.dumps({'jsonrpc': '2.0', 'method': 'eth_subscription',
+                                                          'params': {'subscription': subscription, 'result': result}}))
+                last_block = head
+
+        pusher = asyncio.create_task(_push())
+        try:
+            async for message in connection:
+                request = json.loads(message)
+                params = request.get('params', [])
+                if request.get('method') == 'eth_subscribe' and params and params[0] in ('newHeads', 'logs'):
+                    subscription = hex(next(self.ids))
+                    subscriptions[subscription] = self.subscriptions[subscription] = params[1] if params[0] == 'logs' else None
+                    response = {'result': subscription}
+                    if params[0] == 'logs':
+                        await asyncio.sleep(self.subscribe_delay)
+                elif request.get('method') == 'eth_unsubscribe':
+                    self.subscriptions.pop(params[0], None)
+                    response = {'result': subscriptions.pop(params[0], False) is not False}
+                else:
+                    response = {'error': {'code': -32601, 'message': f"Method {request.get('method')} not supported"}}
+                await connection.send(json.dumps({'jsonrpc': '2.0', 'id': request.get('id'), **response}))
+        except Exception:
+            pass
+        finally:
+            pusher.cancel()
+            for subscription in subscriptions:
+                self.subscriptions.pop(subscription, None)
+            self.connections.discard(connection)
+
+
+class InProcessProvider(JSONBaseProvider):
+    """
+    Answers from a FakeRpcServer without HTTP, as a web3 provider or an RpcClient transport.
+    Used to measure client-side CPU per call without network noise.
+    """
+
+    def __init__(self, server: FakeRpcServer):
+        super().__init__()
+        self.server = server
+
+    def make_request(self, method, params):
+        return self.server.dispatch({'jsonrpc': '2.0', 'id': 0, 'method': method, 'params': params})
+
+    def is_connected(self, show_traceback: bool = False) -> bool:
+        return True
@@ -0,0 +1,198 @@
+"""
+Resumable eth_getLogs scanning.
+
+RPC endpoints cap eth_getLogs by block range and by result size, with limits that differ between
+providers and are rarely documented. A LogScanner walks a block range in chunks whose size adapts
+to what the endpoint accepts:
+
+  - a request refused for exceeding a range or result limit halves the window and, when it was a
+    full-size chunk, the refused size becomes a ceiling the window does not grow back to until
+    CEILING_RESET_CHUNKS full-size chunks have gone through,
+  - other errors (rate limiting, a head block the node has not seen yet...) are retried with the
+    same window, up to TRANSIENT_RETRIES times in a row,
+  - a full-size chunk with few results doubles it, one with many results halves it,
+  - `concurrency` consecutive chunks are sent as one JSON-RPC batch, so catching up after a
+    restart takes a fraction of the round trips.
+
+With a checkpoint store (the Database), scan() resumes from the last block delivered. The hash
+of the checkpoint block is stored with it and checked on the next scan: when it changed, the chain
+reorganized and the last `confirmations` blocks are delivered again after an on_rollback call.
+"""
+
+import time
+from typing import Callable, Dict, List, Optional
+
+from rpc_client import RpcError
+
+INITIAL_CHUNK_BLOCKS = 1000
+MAX_CHUNK_BLOCKS = 50_000
+GROW_BELOW = 1000  # Results under which a full-size chunk doubles the window
+SHRINK_ABOVE = 5000  # Results over which the window is halved, before the endpoint's result cap is hit
+CONCURRENCY = 4
+CEILING_RESET_CHUNKS = 50  # Full-size chunks read under a ceiling before it is lifted again
+TRANSIENT_RETRIES = 3
+RETRY_DELAY = 1.0  # Seconds, multiplied by the number of consecutive failures
+# Error messages of the providers' eth_getLogs block range and result size limits
+LIMIT_ERROR_MARKERS = (
+    'block range', 'range limit', 'range is too large', 'range too large', 'exceed maximum',
+    'is limited to', 'more than', 'too many results', 'response size', 'result size', 'query timeout',
+)
+REORG_CONFIRMATIONS = 10
+
+
+def is_limit_error(error: RpcError) -> bool:
+    """Whether an eth_getLogs error means the request exceeded a range or result limit, rather than a transient failure"""
+    message = str(error).lower()
+    if 'rate limit' in message:
+        return False
+    return any(marker in message for marker in LIMIT_ERROR_MARKERS)
+
+
+class LogScanner:
+    """Adaptive, checkpointed eth_getLogs scanner of one (address, topics) filter"""
+
+    def __init__(self, tracker, address: str, topics: List, parse: Optional[Callable[[Dict], Dict]] = None,
+                 checkpoints=None, name: Optional[str] = None, confirmations: int = REORG_CONFIRMATIONS,
+                 concurrency: int = CONCURRENCY, max_lag: Optional[int] = None):
+        self.tracker = tracker
+        self.address = address
+        self.topics = topics
+        self.parse = parse or (lambda log: log)
+        self.checkpoints = checkpoints
+        self.name = name
+        self.confirmations = confirmations
+        self.concurrency = concurrency
+        self.max_lag = max_lag
+        self.chunk_blocks = INITIAL_CHUNK_BLOCKS
+        self.chunk_ceiling = MAX_CHUNK_BLOCKS
+        self.chunks_under_ceiling = 0
+
+    def _request(self, from_block: int, to_block: int) -> tuple:
+        return 'eth_getLogs', [{
+            'address': self.address, 'topics': self.topics, 'fromBlock': hex(from_block), 'toBlock': hex(to_block)
+        }]
+
+    def _adapt(self, blocks: int, results: int):
+        # Only a full-size chunk says something about the limit, not the tail of the range
+        if results > SHRINK_ABOVE:
+            self.chunk_blocks = max(1, self.chunk_blocks // 2)
+        elif results < GROW_BELOW and blocks == self.chunk_blocks:
+            self.chunk_blocks = min(self.chunk_ceiling, self.chunk_blocks * 2)
+
+        # The limit may have been a result cap hit by a busy stretch of blocks, probe past it again later
+        if blocks == self.chunk_blocks and self.chunk_ceiling < MAX_CHUNK_BLOCKS:
+            self.chunks_under_ceiling += 1
+            if self.chunks_under_ceiling >= CEILING_RESET_CHUNKS:
+                self.chunk_ceiling = MAX_CHUNK_BLOCKS
+                self.chunks_under_ceiling = 0
+
+    def _refused(self, blocks: int, window: int):
+        """Shrink the window after a chunk of `blocks` blocks exceeded the endpoint's limits"""
+        if blocks == window:
+            # Growing back to a refused size would only be refused again
+            self.chunk_ceiling = blocks - 1
+            self.chunks_under_ceiling = 0
+        self.chunk_blocks = max(1, min(self.chunk_blocks, blocks // 2))
+
+    def fetch(self, from_block: int, to_block: int, handler: Optional[Callable[[List[Dict], int], None]] = None) -> List[Dict]:
+        """
+        Parsed logs between two blocks (inclusive), oldest first. With a handler, each batch of
+        logs is passed to handler(events, last_block) as soon as it is read, and nothing is returned.
+        """
+        events = []
+        start = from_block
+        failures = 0
+        while start <= to_block:
+            window = self.chunk_blocks
+            ranges = []
+            chunk_start = start
+            while len(ranges) < self.concurrency and chunk_start <= to_block:
+                chunk_end = min(to_block, chunk_start + self.chunk_blocks - 1)
+                ranges.append((chunk_start, chunk_end))
+                chunk_start = chunk_end + 1
+
+            responses = self.tracker.request_batch([self._request(*r) for r in ranges], method='getLogs')
+
+            # Chunks are used in order up to the first failed one, which is retried in the next round
+            round_events = []
+            for (chunk_start, chunk_end), logs in zip(ranges, responses):
+                if isinstance(logs, RpcError):
+                    if not is_limit_error(logs):
+                        failures += 1
+                        if failures > TRANSIENT_RETRIES:
+                            raise logs
+                        time.sleep(RETRY_DELAY * failures)
+                    elif chunk_end == chunk_start:
+                        raise logs
+                    else:
+                        self._refused(chunk_end - chunk_start + 1, window)
+                    break
+                if isinstance(logs, Exception):
+                    raise logs
+
+                failures = 0
+                round_events.extend(self.parse(log) for log in logs if not log.get('removed'))
+                self._adapt(chunk_end - chunk_start + 1, len(logs))
+                start = chunk_end + 1
+
+            if handler is None:
+                events.extend(round_events)
+            elif start > ranges[0][0]:
+                handler(round_events, start - 1)
+
+        return events
+
+    def scan(self, handler: Callable[[List[Dict]], None],
+             on_rollback: Optional[Callable[[Optional[int]], None]] = None) -> int:
+        """
+        Pass the logs from the checkpoint to the chain head to handler(events), oldest first, and
+        return the head block. The checkpoint is saved after every batch, so an interrupted scan
+        resumes where it stopped (events may be delivered twice, never skipped).
+
+        on_rollback(block) is called before logs from `block` on are delivered again after a
+        reorg, and with None when the checkpoint is more than max_lag blocks behind: the scan then
+        jumps to the head and the events in between are never delivered.
+
+        The first scan only records the head: there is no history to deliver.
+        """
+        checkpoint = self.checkpoints.get_sync_checkpoint(self.name)
+
+        requests = [('eth_getBlockByNumber', ['latest', False])]
+        if checkpoint is not None:
+            requests.append(('eth_getBlockByNumber', [hex(checkpoint), False]))
+        blocks = self.tracker.request_batch(requests, method='getBlockByNumber')
+        for block in blocks:
+            if isinstance(block, Exception):
+                raise block
+
+        head = int(blocks[0]['number'], 16)
+        head_hash = blocks[0]['hash']
+
+        start = head + 1
+        if checkpoint is not None:
+            stored_hash = self.checkpoints.get_sync_checkpoint_hash(self.name)
+            start = checkpoint + 1
+            if checkpoint > head:
+                # Load-balanced endpoints can lag behind the node that served the previous scan
+                return head
+            if stored_hash is None or blocks[1] is None or blocks[1]['hash'] != stored_hash:
+                # Reorg, or a checkpoint saved mid-scan without a hash: replay the blocks that could have changed
+                start = max(0, checkpoint + 1 - self.confirmations)
+                if stored_hash is not None:
+                    print(f"Reorg detected at block {checkpoint} for {self.name}, rescanning from {start}")
+                    if on_rollback:
+                        on_rollback(start)
+
+            if self.max_lag is not None and head - start > self.max_lag:
+                if on_rollback:
+                    on_rollback(None)
+                start = head + 1
+
+        def _deliver(events: List[Dict], last_block: int):
+            handler(events)
+            self.checkpoints.set_sync_checkpoint(self.name, last_block, head_hash if last_block == head else None)
+
+        self.fetch(start, head, _deliver)
+        if start > head:
+            self.checkpoints.set_sync_checkpoint(self.name, head, head_hash)
+        return head
@@ -0,0 +1,268 @@
+﻿import asyncio
+import heapq
+import time
+from datetime import timedelta
+from typing import Dict, List, Optional
+
+from telegram.error import BadRequest, RetryAfter, TimedOut, NetworkError
+
+PRIORITY_ALERT = 0
+PRIORITY_NORMAL = 1
+PRIORITY_BROADCAST = 2
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at `rate` tokens per second, holding at most `capacity`"""
+
+    def __init__(self, rate: float, capacity: float = 1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self.paused_until = 0
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def delay(self) -> float:
+        """Seconds to wait before a token is available (0 if one is available now)"""
+        self._refill()
+        pause = max(0, self.paused_until - time.monotonic())
+        if self.tokens >= 1:
+            return pause
+        return max(pause, (1 - self.tokens) / self.rate)
+
+    def consume(self):
+        self._refill()
+        self.tokens -= 1
+
+    def pause(self, seconds: float):
+        """Refuse tokens for the next `seconds` (used when Telegram asks us to back off)"""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        self.tokens = 0
+
+    def is_idle(self) -> bool:
+        self._refill()
+        return self.tokens >= self.capacity and self.paused_until <= time.monotonic()
+
+
+class MessageScheduler:
+    """
+    Central outbound queue for bot-initiated messages (alerts, broadcasts).
+
+    Messages are sent in priority order while respecting Telegram's global (~30 msg/s) and
+    per-chat (1 msg/s) limits. Messages for a chat that is out of tokens wait in that chat's own
+    queue, which releases one message (with its token reserved) each time the chat bucket refills.
+    RetryAfter errors pause the chat and the global bucket and re-queue the message, transient
+    network errors are retried, and persisted messages survive restarts.
+    """
+
+    def __init__(self, bot, db, global_rate: float = 30, per_chat_rate: float = 1,
+                 per_chat_burst: float = 1, max_retries: int = 5):
+        self.bot = bot
+        self.db = db
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.per_chat_rate = per_chat_rate
+        self.per_chat_burst = per_chat_burst
+        self.chat_buckets: Dict[int, TokenBucket] = {}
+        # Messages waiting for their chat bucket, per chat, and the timer releasing the next one
+        self.parked: Dict[int, List] = {}
+        self.release_timers: Dict[int, asyncio.TimerHandle] = {}
+        self.max_retries = max_retries
+        self.queue = asyncio.PriorityQueue()
+        self.seq = 0
+        self.dispatcher = None
+        self.in_flight = set()
+
+    async def start(self):
+        """Reload messages left over from a previous run and start dispatching"""
+        for message in self.db.get_pending_outbound_messages():
+            self._enqueue({
+                'id': message['id'],
+                'chat_id': message['chat_id'],
+                'text': message['text'],
+                'parse_mode': message['parse_mode'],
+                'priority': message['priority'],
+                'attempts': 0,
+                'future': None
+            })
+
+        if self.queue.qsize():
+            print(f"📬 Restored {self.queue.qsize()} pending outbound message(s)")
+
+        self.dispatcher = asyncio.create_task(self._dispatch())
+
+    async def stop(self):
+        """Stop dispatching, persisted messages still queued will be sent on next start"""
+        if self.dispatcher:
+            self.dispatcher.cancel()
+            try:
+                await self.dispatcher
+            except asyncio.CancelledError:
+                pass
+            self.dispatcher = None
+
+        # Parked messages are persisted too, they are restored on next start
+        for timer in self.release_timers.values():
+            timer.cancel()
+        self.release_timers.clear()
+        self.parked.clear()
+
+        if self.in_flight:
+            await asyncio.gather(*self.in_flight, return_exceptions=True)
+
+    def send(self, chat_id: int, text: str, priority: int = PRIORITY_NORMAL,
+             parse_mode: Optional[str] = None, persist: bool = True) -> asyncio.Future:
+        """
+        Queue a message for delivery.
+
+        Args:
+            chat_id: Recipient chat
+            text: Message text
+            priority: PRIORITY_ALERT, PRIORITY_NORMAL or PRIORITY_BROADCAST (lower is sent first)
+            parse_mode: Telegram parse mode
+            persist: If True, the message is stored in the database until it is sent
+
+        Returns:
+            Future resolving to None once delivered, or to the exception that made delivery fail
+        """
+        message_id = self.db.add_outbound_message(chat_id, text, parse_mode, priority) if persist else None
+        future = asyncio.get_running_loop().create_future()
+
+        self._enqueue({
+            'id': message_id,
+            'chat_id': chat_id,
+            'text': text,
+            'parse_mode': parse_mode,
+            'priority': priority,
+            'attempts': 0,
+            'future': future
+        })
+
+        return future
+
+    def _enqueue(self, item: Dict):
+        # Retried messages keep their original sequence number so they stay ahead of later ones
+        if 'seq' not in item:
+            self.seq += 1
+            item['seq'] = self.seq
+        self.queue.put_nowait((item['priority'], item['seq'], item))
+
+    def _chat_bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self.chat_buckets.get(chat_id)
+        if bucket is None:
+            if len(self.chat_buckets) > 10000:
+                self.chat_buckets = {k: b for k, b in self.chat_buckets.items() if not b.is_idle()}
+            bucket = TokenBucket(self.per_chat_rate, self.per_chat_burst)
+            self.chat_buckets[chat_id] = bucket
+        return bucket
+
+    def _park(self, entry):
+        """Hold a message in its chat's queue until the chat bucket has a token for it"""
+        chat_id = entry[2]['chat_id']
+        waiting = self.parked.setdefault(chat_id, [])
+        heapq.heappush(waiting, entry)
+        if chat_id not in self.release_timers:
+            self._schedule_release(chat_id)
+
+    def _schedule_release(self, chat_id: int):
+        delay = self._chat_bucket(chat_id).delay()
+        self.release_timers[chat_id] = asyncio.get_running_loop().call_later(delay, self._release, chat_id)
+
+    def _release(self, chat_id: int):
+        """Move the chat's next parked message back to the main queue, with its chat token reserved"""
+        del self.release_timers[chat_id]
+        waiting = self.parked.get(chat_id)
+        if not waiting:
+            self.parked.pop(chat_id, None)
+            return
+
+        bucket = self._chat_bucket(chat_id)
+        if bucket.delay() > 0:
+            # The chat was paused (RetryAfter) since the timer was set
+            self._schedule_release(chat_id)
+            return
+
+        bucket.consume()
+        entry = heapq.heappop(waiting)
+        entry[2]['chat_reserved'] = True
+        self.queue.put_nowait(entry)
+
+        if waiting:
+            self._schedule_release(chat_id)
+        else:
+            del self.parked[chat_id]
+
+    async def _dispatch(self):
+        while True:
+            entry = await self.queue.get()
+            item = entry[2]
+
+            if not item.get('chat_reserved'):
+                # Park the message without blocking other chats, behind the chat's earlier messages
+                if item['chat_id'] in self.parked or self._chat_bucket(item['chat_id']).delay() > 0:
+                    self._park(entry)
+                    continue
+
+            global_wait = self.global_bucket.delay()
+            if global_wait > 0:
+                # Put it back so a higher priority message queued meanwhile goes first
+                self.queue.put_nowait(entry)
+                await asyncio.sleep(global_wait)
+                continue
+
+            self.global_bucket.consume()
+            if not item.pop('chat_reserved', False):
+                self._chat_bucket(item['chat_id']).consume()
+
+            task = asyncio.create_task(self._deliver(item))
+            self.in_flight.add(task)
+            task.add_done_callback(self.in_flight.discard)
+
+    async def _deliver(self, item: Dict):
+        try:
+            await self.bot.send_message(
+                chat_id=item['chat_id'],
+                text=item['text'],
+                parse_mode=item['parse_mode']
+            )
+            self._finish(item, None)
+
+        except RetryAfter as e:
+            retry_after = e.retry_after
+            if isinstance(retry_after, timedelta):
+                retry_after = retry_after.total_seconds()
+
+            print(f"Flood control for {item['chat_id']}, retrying in {retry_after}s")
+            self._chat_bucket(item['chat_id']).pause(retry_after)
+            # Flood control may apply to the whole bot, stop sending to every chat for as long
+            self.global_bucket.pause(retry_after)
+            self._enqueue(item)
+
+        except BadRequest as e:
+            # BadRequest subclasses NetworkError but retrying it would never succeed
+            print(f"Failed to send message to {item['chat_id']}: {e}")
+            self._finish(item, e)
+
+        except (TimedOut, NetworkError) as e:
+            item['attempts'] += 1
+            if item['attempts'] >= self.max_retries:
+                print(f"Failed to send message to {item['chat_id']} after {item['attempts']} attempts: {e}")
+                self._finish(item, e)
+            else:
+                self._chat_bucket(item['chat_id']).pause(2 ** item['attempts'])
+                self._enqueue(item)
+
+        except Exception as e:
+            print(f"Failed to send message to {item['chat_id']}: {e}")
+            self._finish(item, e)
+
+    def _finish(self, item: Dict, error: Optional[Exception]):
+        if item['id'] is not None:
+            self.db.delete_outbound_message(item['id'])
+
+        future = item['future']
+        if future is not None and not future.done():
+            future.set_result(error)
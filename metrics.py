@@ -0,0 +1,186 @@
+﻿"""
+Minimal Prometheus instrumentation for the tracker and the bot.
+
+Metrics are module-level singletons updated from the event loop and from worker threads
+(tracker calls run through asyncio.to_thread), so every update takes the metric's lock.
+render() produces the Prometheus text exposition format served on /metrics.
+"""
+
+import asyncio
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 900, 1800, 3600)
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labels: Optional[List[str]] = None):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels or [])
+        self.lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Optional[List[str]] = None):
+        super().__init__(name, documentation, labels)
+        self.values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def get(self, **labels) -> float:
+        return self.values.get(self._key(labels), 0)
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self.lock:
+            for key, value in sorted(self.values.items()):
+                lines.append(f"{self.name}{_format_labels(self.label_names, key)} {value}")
+        return lines
+
+
+class Gauge(Counter):
+    type_name = "gauge"
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = value
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: Optional[List[str]] = None,
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+        self.series: Dict[Tuple[str, ...], List] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self.lock:
+            series = self.series.get(key)
+            if series is None:
+                series = [[0] * len(self.buckets), 0.0, 0]
+                self.series[key] = series
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self.lock:
+            for key, (counts, total, count) in sorted(self.series.items()):
+                for bound, bucket_count in zip(self.buckets, counts):
+                    labels = _format_labels(self.label_names, key, f'le="{bound}"')
+                    lines.append(f"{self.name}_bucket{labels} {bucket_count}")
+                inf_labels = _format_labels(self.label_names, key, 'le="+Inf"')
+                lines.append(f"{self.name}_bucket{inf_labels} {count}")
+                lines.append(f"{self.name}_sum{_format_labels(self.label_names, key)} {total}")
+                lines.append(f"{self.name}_count{_format_labels(self.label_names, key)} {count}")
+        return lines
+
+
+class PhaseTimer:
+    """Accumulates wall time per phase when work of several phases is interleaved in one loop"""
+
+    def __init__(self):
+        self.durations: Dict[str, float] = {}
+
+    @contextmanager
+    def time(self, phase: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.durations[phase] = self.durations.get(phase, 0) + time.perf_counter() - start
+
+
+REGISTRY: List[_Metric] = []
+
+RPC_CALLS = Counter('lp_rpc_calls_total', 'JSON-RPC calls made by the tracker', ['method'])
+RPC_LATENCY = Histogram('lp_rpc_latency_seconds', 'JSON-RPC call latency, excluding client-side throttling', ['method'],
+                        buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10))
+RPC_RATE_LIMITED = Counter('lp_rpc_rate_limited_total', 'JSON-RPC calls answered with HTTP 429', ['method'])
+RPC_ERRORS = Counter('lp_rpc_errors_total', 'JSON-RPC calls that failed for another reason', ['method'])
+RPC_BATCH_SIZE = Histogram('lp_rpc_batch_size', 'Reads sent together in one JSON-RPC batch request',
+                           buckets=(1, 2, 5, 10, 20, 50, 100))
+RPC_THROTTLE_SECONDS = Counter('lp_rpc_throttle_seconds_total', 'Time spent sleeping in the tracker rate limiter')
+
+MONITOR_CYCLES = Counter('lp_monitor_cycles_total', 'Completed monitoring cycles')
+MONITOR_CYCLE_SECONDS = Histogram('lp_monitor_cycle_seconds', 'Duration of a monitoring cycle')
+MONITOR_PHASE_SECONDS = Histogram('lp_monitor_phase_seconds', 'Time spent per monitoring phase in a cycle', ['phase'])
+MONITOR_LAST_PHASE_SECONDS = Gauge('lp_monitor_last_phase_seconds', 'Time spent per phase in the last monitoring cycle', ['phase'])
+MONITOR_LAST_PROCESSED = Gauge('lp_monitor_last_processed', 'Items processed in the last monitoring cycle', ['kind'])
+ALERTS_QUEUED = Counter('lp_alerts_total', 'Alert messages queued for delivery', ['type'])
+BLOCK_EVENTS = Counter('lp_block_events_total', 'New blocks and pool updates published by the block feed', ['source'])
+BLOCK_EVENTS_COALESCED = Counter('lp_block_events_coalesced_total', 'Block events merged into a pending one before evaluation')
+
+
+def render() -> str:
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+async def start_metrics_server(host: str, port: int) -> asyncio.AbstractServer:
+    """Serve GET /metrics over plain HTTP without extra dependencies (used in polling mode)"""
+
+    async def _handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request_line = await reader.readline()
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass
+
+            parts = request_line.decode('latin-1').split()
+            if len(parts) >= 2 and parts[0] == "GET" and parts[1].split('?')[0] == "/metrics":
+                status, body = "200 OK", render().encode()
+            else:
+                status, body = "404 Not Found", b"not found\n"
+
+            writer.write(
+                f"HTTP/1.1 {status}\r\n"
+                f"Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: close\r\n\r\n".encode() + body
+            )
+            await writer.drain()
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(_handle, host, port)
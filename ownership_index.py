@@ -0,0 +1,128 @@
+"""
+Local index of the position NFTs held by the monitored wallets.
+
+Enumerating a wallet with balanceOf + tokenOfOwnerByIndex and reading positions() for every NFT
+costs one call per NFT, closed ones included, and long-time LPs hold hundreds of burned-out
+positions. The index stores token_id -> owner in position_owners instead:
+
+  - a wallet is seeded once by enumeration, at a known block (replaying its whole Transfer
+    history is not an option on endpoints that cap eth_getLogs block ranges),
+  - afterwards it is kept current from the position manager events the monitor scans every
+    cycle (see wallet_tiers): Transfer moves tokens, IncreaseLiquidity revives closed ones,
+  - positions read with zero liquidity are tombstoned and no longer read.
+
+A refresh then only reads positions() for the live token IDs of the wallet. Every protocol has its
+own index, token IDs being only unique within one position manager.
+"""
+
+import threading
+from typing import Dict, List, Optional, Set
+
+
+class OwnershipIndex:
+    """Ownership index persisted in the database, fed with the monitor's position manager events"""
+
+    def __init__(self, db):
+        self.db = db
+        self.lock = threading.Lock()
+        self.indexed = set(db.get_indexed_owners())  # (chain_id, protocol name, wallet)
+
+    def live_token_ids(self, protocol: Dict, address: str) -> Optional[List[int]]:
+        """Token IDs of a wallet on a protocol not tombstoned, None if the wallet is not indexed yet"""
+        with self.lock:
+            if (protocol['chain_id'], protocol['name'], address) not in self.indexed:
+                return None
+        return self.db.get_owned_token_ids(protocol['chain_id'], protocol['name'], address)
+
+    def seed(self, tracker, protocol: Dict, address: str, block_number: Optional[int] = None) -> List[int]:
+        """
+        Index a wallet from an enumeration of its NFTs. block_number must not be later than the
+        enumeration: events after it are applied by the next scans, older ones are ignored for these tokens.
+        """
+        if block_number is None:
+            block_number = tracker.get_block_number()
+        token_ids = tracker.get_token_ids(address, position_manager_address=protocol['position_manager'])
+
+        self.db.replace_owned_tokens(protocol['chain_id'], protocol['name'], address, token_ids, block_number)
+        with self.lock:
+            self.indexed.add((protocol['chain_id'], protocol['name'], address))
+        return token_ids
+
+    def apply_events(self, events: List[Dict]) -> Set[str]:
+        """
+        Apply position manager events (see LiquidityPoolTracker.get_position_events), each to the
+        index of its protocol. Returns the owners of revived positions, whose wallets need a refresh.
+        """
+        with self.lock:
+            indexed = set(self.indexed)
+
+        transfers: Dict[tuple, List[tuple]] = {}
+        revived: Dict[tuple, List[int]] = {}
+        for event in events:
+            protocol = (event['chain_id'], event['protocol'])
+            if event['event'] == 'Transfer':
+                sender, receiver = protocol + (event['from'],) in indexed, protocol + (event['to'],) in indexed
+                if sender or receiver:
+                    new_owner = event['to'] if receiver else None
+                    transfers.setdefault(protocol, []).append((event['token_id'], new_owner, event['block']))
+            elif event['event'] == 'IncreaseLiquidity':
+                revived.setdefault(protocol, []).append(event['token_id'])
+
+        for (chain_id, name), protocol_transfers in transfers.items():
+            self.db.apply_token_transfers(chain_id, name, protocol_transfers)
+
+        owners = set()
+        for (chain_id, name), token_ids in revived.items():
+            self.db.set_tokens_closed(chain_id, name, token_ids, False)
+            owners.update(self.db.get_token_owners(chain_id, name, token_ids).values())
+        return owners
+
+    def reset(self, protocol: Dict):
+        """Drop a protocol's index after its events were missed, wallets are seeded again on their next refresh"""
+        self.db.clear_ownership_index(protocol['chain_id'], protocol['name'])
+        with self.lock:
+            self.indexed = {entry for entry in self.indexed if entry[:2] != (protocol['chain_id'], protocol['name'])}
+
+    def fetch_protocol_positions(self, tracker, protocol: Dict, address: str, block_number: Optional[int] = None) -> List[Dict]:
+        """
+        Open positions of a wallet on one protocol, with pool info, read from its live token IDs in
+        one batch. Positions found closed are tombstoned. Blocking, like the tracker calls it makes.
+        """
+        token_ids = self.live_token_ids(protocol, address)
+        if token_ids is None:
+            token_ids = self.seed(tracker, protocol, address, block_number)
+        if not token_ids:
+            return []
+
+        open_positions = []
+        closed = []
+        positions = tracker.get_positions_by_ids(token_ids, position_manager_address=protocol['position_manager'])
+        for token_id, position in zip(token_ids, positions):
+            if isinstance(position, Exception):
+                print(f"  Error on position #{token_id}: {position}")
+            elif position['liquidity'] == 0:
+                closed.append(token_id)
+            else:
+                open_positions.append(position)
+
+        if closed:
+            self.db.set_tokens_closed(protocol['chain_id'], protocol['name'], closed, True)
+        return open_positions
+
+    def fetch_positions(self, trackers, address: str, head_blocks: Optional[Dict[str, int]] = None) -> List[Dict]:
+        """
+        Open positions of a wallet on every protocol of a TrackerManager, read in parallel.
+        head_blocks are the last scanned blocks per protocol name (see WalletTiers). Raises the
+        error of a protocol that could not be read: a partial wallet must not replace a full one.
+        """
+        head_blocks = head_blocks or {}
+        results = trackers.map_protocols(
+            lambda tracker, protocol: self.fetch_protocol_positions(tracker, protocol, address, head_blocks.get(protocol['name']))
+        )
+
+        positions = []
+        for result in results.values():
+            if isinstance(result, Exception):
+                raise result
+            positions.extend(result)
+        return positions
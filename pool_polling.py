@@ -0,0 +1,103 @@
+"""
+Adaptive polling of pool prices.
+
+Each pool gets its own next check time, from the tick distance between its current tick and the
+nearest trigger tick of the positions tracked in it (see alert_triggers) and from how fast its
+tick has been moving. Modelling the tick as a random walk with variance `variance` ticks² per
+second, reaching a boundary `distance` ticks away takes about (distance / (safety · σ))² seconds,
+so a pool 2 ticks from an edge is read every few seconds and one 20,000 ticks away rarely.
+
+Reads are also capped by a budget of reads per minute shared by all pools, the most urgent pools
+being served first, so the total RPC volume stays bounded whatever the market does.
+"""
+
+import math
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+MIN_POLL_INTERVAL = 5.0
+DEFAULT_TICK_VARIANCE = 4.0  # ticks² per second, about a 5% daily move, until a pool has been observed
+VARIANCE_SMOOTHING = 0.3
+SAFETY = 3.0
+
+
+class PoolPollScheduler:
+    """Next check time, last tick and tick variance of every polled pool"""
+
+    def __init__(self, reads_per_minute: float, max_interval: float, min_interval: float = MIN_POLL_INTERVAL,
+                 safety: float = SAFETY):
+        self.reads_per_minute = reads_per_minute
+        self.max_interval = max_interval
+        self.min_interval = min_interval
+        self.safety = safety
+        self.lock = threading.Lock()
+        self.pools: Dict[Tuple, Dict] = {}  # keyed (chain_id, pool address)
+        self.budget = reads_per_minute
+        self.budget_updated_at = time.monotonic()
+
+    def interval(self, distance: Optional[int], variance: float) -> float:
+        """Seconds until a pool `distance` ticks from its nearest boundary should be read again"""
+        if distance is None:
+            return self.max_interval
+        seconds = (distance / (self.safety * math.sqrt(variance))) ** 2
+        return min(self.max_interval, max(self.min_interval, seconds))
+
+    def observe(self, pool: Tuple, tick: int, read_at: float, distance: Optional[int]):
+        """
+        Record a pool read at `read_at` (a time.time() timestamp) and schedule its next check.
+        distance is the tick distance to the nearest tracked boundary, None if no position is tracked in the pool.
+        """
+        with self.lock:
+            state = self.pools.get(pool)
+            if state and read_at <= state['read_at']:
+                return
+
+            if state is None:
+                variance = DEFAULT_TICK_VARIANCE
+            else:
+                elapsed = read_at - state['read_at']
+                observed = (tick - state['tick']) ** 2 / elapsed
+                variance = (1 - VARIANCE_SMOOTHING) * state['variance'] + VARIANCE_SMOOTHING * observed
+                variance = max(variance, DEFAULT_TICK_VARIANCE / 100)
+
+            self.pools[pool] = {
+                'tick': tick,
+                'read_at': read_at,
+                'variance': variance,
+                'next_check': read_at + self.interval(distance, variance),
+            }
+
+    def due(self, pools: List[Tuple], now: Optional[float] = None) -> List[Tuple]:
+        """
+        Known pools whose next check has passed, most overdue first, within the read budget.
+        Pools never observed are not returned: they are read on first use anyway.
+        """
+        now = now if now is not None else time.time()
+
+        with self.lock:
+            monotonic = time.monotonic()
+            self.budget = min(self.reads_per_minute,
+                              self.budget + (monotonic - self.budget_updated_at) * self.reads_per_minute / 60)
+            self.budget_updated_at = monotonic
+
+            overdue = sorted(
+                (self.pools[pool]['next_check'], pool)
+                for pool in pools
+                if pool in self.pools and self.pools[pool]['next_check'] <= now
+            )
+            count = len(overdue) if self.budget >= len(overdue) else int(self.budget)
+            self.budget -= count
+            return [pool for _, pool in overdue[:count]]
+
+    def retain(self, pools: List[Tuple]):
+        """Forget pools no tracked position uses anymore"""
+        keep = set(pools)
+        with self.lock:
+            for pool in [p for p in self.pools if p not in keep]:
+                del self.pools[pool]
+
+    def next_check(self, pool: Tuple) -> Optional[float]:
+        with self.lock:
+            state = self.pools.get(pool)
+            return state['next_check'] if state else None
@@ -0,0 +1,128 @@
+"""
+USD prices derived from the pools the tracker already reads.
+
+Every pool whose tokens and slot0 are known to the tracker is an exchange rate between its two
+tokens. Starting from the configured stablecoins of the chain (valued at $1, see protocols.py),
+every token gets its price from the deepest route to a stablecoin, e.g. UBTC -> HYPE -> USDT0:
+the route whose shallowest pool holds the most USD of in-range liquidity, so a thin pool quoting
+a token at an odd price is not used when a deep one exists. Tokens are only ever trusted as
+stablecoins by address, anyone can deploy a token named USDC.
+
+No call is made while pricing: only cached slot0 snapshots and in-range liquidities are used, and
+a token with no route through a known pool has no price. Liquidities come from the Swap logs of the
+block feed and from refresh_depths, which /portfolio calls: one liquidity() batch per chain for the
+pools not read within DEPTH_MAX_AGE. That batch is a deliberate exception to pricing without extra
+calls, a slot0 snapshot cannot tell a thin pool from a deep one. The price table is
+rebuilt only when a pool state or liquidity was stored since the previous build (the pool state
+version of the tracker), so all the positions valued after a round of pool reads share one
+computation.
+"""
+
+import heapq
+import math
+import threading
+from typing import Dict, Iterable, Optional
+
+DEPTH_MAX_AGE = 3600  # Seconds a pool liquidity read is reused for route ranking
+
+
+class PriceOracle:
+    """USD price of the tokens reachable from a stablecoin through the pools cached by a tracker"""
+
+    def __init__(self, tracker, stablecoins: Iterable[str] = ()):
+        self.tracker = tracker
+        self.stablecoins = {address.lower() for address in stablecoins}
+        self.lock = threading.Lock()
+        self.prices: Dict[str, float] = {}
+        self.built_at: Optional[tuple] = None
+
+    def is_stablecoin(self, token: str) -> bool:
+        return token.lower() in self.stablecoins
+
+    def refresh_depths(self, max_age: float = DEPTH_MAX_AGE):
+        """Read the in-range liquidity of the known pools not read within max_age, one batch. Blocking."""
+        if self.tracker.pool_tokens:
+            self.tracker.get_pool_liquidities(list(self.tracker.pool_tokens), max_age)
+
+    def usd_prices(self) -> Dict[str, float]:
+        """Token address -> USD price, for every token with a route to a stablecoin"""
+        version = (self.tracker.pool_state_version, len(self.tracker.pool_tokens))
+
+        with self.lock:
+            if self.built_at == version:
+                return self.prices
+
+            # token -> [(other token, price of other in token units, token reserve in whole tokens)]
+            # for every pool with a known state. Reserves are the in-range virtual reserves, zero
+            # when the pool's liquidity was not read yet: such pools are only used as a last resort.
+            edges: Dict[str, list] = {}
+            for pool_address, (token0, token1) in list(self.tracker.pool_tokens.items()):
+                cached = self.tracker.pool_state_cache.get(pool_address)
+                info0 = self.tracker.token_info_cache.get(token0)
+                info1 = self.tracker.token_info_cache.get(token1)
+                if not cached or not info0 or not info1:
+                    continue
+
+                sqrt_price = cached[1]['sqrt_price_x96'] / 2 ** 96
+                if sqrt_price <= 0:
+                    continue
+                # token1 per token0, in whole tokens
+                price = sqrt_price ** 2 * 10 ** (info0['decimals'] - info1['decimals'])
+                liquidity = self.tracker.pool_liquidity.get(pool_address, (0, 0))[1]
+                reserve0 = liquidity / sqrt_price / 10 ** info0['decimals']
+                reserve1 = liquidity * sqrt_price / 10 ** info1['decimals']
+                edges.setdefault(token1, []).append((token0, price, reserve1))
+                edges.setdefault(token0, []).append((token1, 1 / price, reserve0))
+
+            # Widest path: tokens are settled in order of the USD depth of their best route, the
+            # depth of a route being that of its shallowest pool
+            prices: Dict[str, float] = {}
+            depths = {token: math.inf for token in edges if self.is_stablecoin(token)}
+            candidates = {token: 1.0 for token in depths}
+            heap = [(-math.inf, token) for token in depths]
+            while heap:
+                depth, token = heapq.heappop(heap)
+                depth = -depth
+                if token in prices or depth < depths[token]:
+                    continue
+                prices[token] = candidates[token]
+
+                for other, rate, reserve in edges[token]:
+                    if other in prices:
+                        continue
+                    route_depth = min(depth, reserve * prices[token])
+                    if other not in depths or route_depth > depths[other]:
+                        depths[other] = route_depth
+                        candidates[other] = prices[token] * rate
+                        heapq.heappush(heap, (-route_depth, other))
+
+            self.prices = prices
+            self.built_at = version
+            return prices
+
+    def usd_price(self, token: str) -> Optional[float]:
+        return self.usd_prices().get(token)
+
+    def position_value(self, position: Dict, pool_info: Optional[Dict]) -> Optional[float]:
+        """USD value of the liquidity of a position at its pool state, None if a held token has no price"""
+        if not pool_info or not position.get('liquidity') or 'token0_decimals' not in position:
+            return None
+
+        amounts = self.tracker.calculate_token_amounts(
+            position['liquidity'],
+            pool_info['sqrt_price_x96'],
+            position['tick_lower'],
+            position['tick_upper'],
+            pool_info['current_tick'],
+            position['token0_decimals'],
+            position['token1_decimals']
+        )
+
+        prices = self.usd_prices()
+        value = 0.0
+        for amount, token in ((amounts['amount0'], position['token0']), (amounts['amount1'], position['token1'])):
+            if amount:
+                if token not in prices:
+                    return None
+                value += amount * prices[token]
+        return value
@@ -0,0 +1,115 @@
+"""
+Registry of the chains and Uniswap-V3-style protocols the tracker knows about.
+
+A protocol is a NonfungiblePositionManager with its factory on one chain:
+
+  - name: short identifier, also used in callback data (keep it short and without spaces)
+  - label: display name
+  - chain_id, position_manager, factory
+  - init_code_hash: pool init code hash of the factory. When known, pool addresses are derived
+    locally with CREATE2 instead of being read with getPool
+  - multicall: Multicall3 address of the chain, for reference (the tracker batches plain JSON-RPC)
+
+A chain has a name, an RPC pool (the first URL is used, the others on connection errors), the
+delay between calls of its tracker, so every chain is throttled on its own, and optionally the
+addresses of its USD stablecoins for price routing (see price_oracle, tokens of a chain without
+them have no USD price) and a 'ws_url' for the block feed of the monitor.
+
+Token IDs are only unique within one position manager: state kept per position (alerts, ownership
+index, triggers) is keyed by position_key, (chain_id, protocol name, token_id).
+
+More chains and protocols can be added from a JSON file ({"chains": [...], "protocols": [...]},
+entries with the fields above) named by the PROTOCOLS_FILE environment variable.
+"""
+
+import json
+import os
+from typing import Dict, List, Optional, Tuple
+
+from rpc_client import checksum_address, keccak
+
+MULTICALL3 = "0xcA11bde05977b3631167028862bE2a173976CA11"
+
+# Chain and protocol of the positions tracked before positions were keyed by protocol: stored
+# alerts and ownership entries without them belong to these
+LEGACY_CHAIN_ID = 999
+LEGACY_PROTOCOL = "projectx"
+
+CHAINS: Dict[int, Dict] = {
+    999: {
+        'chain_id': 999,
+        'name': "Hyperliquid EVM",
+        'rpc_urls': ["https://rpc.hyperliquid.xyz/evm"],
+        'delay': 1.0,
+        'stablecoins': [
+            "0xB8CE59FC3717ada4C02eaDF9682A9e934F625ebb",  # USD₮0
+            "0xb88339CB7199b77E23DB6E890353E22632Ba630f",  # USDC
+            "0x5d3a1Ff2b6BAb83b63cd9AD0787074081a52ef34",  # USDe
+            "0x02c6a2fA58cC01A18B8D9E00eA48d65E4dF26c70",  # feUSD
+        ],
+    },
+}
+
+PROTOCOLS: List[Dict] = [
+    {
+        'name': "projectx",
+        'label': "Project X",
+        'chain_id': 999,
+        'position_manager': "0xeaD19AE861c29bBb2101E834922B2FEee69B9091",
+        'factory': "0xFf7B3e8C00e57ea31477c32A5B52a58Eea47b072",
+        'init_code_hash': None,
+        'multicall': MULTICALL3,
+    },
+]
+
+
+def register_chain(chain: Dict):
+    CHAINS[chain['chain_id']] = {'rpc_urls': [], 'delay': 1.0, **CHAINS.get(chain['chain_id'], {}), **chain}
+
+
+def register_protocol(protocol: Dict):
+    """Add a protocol, or replace the one with the same name"""
+    protocol = {'label': protocol['name'], 'init_code_hash': None, 'multicall': None, **protocol}
+    for i, existing in enumerate(PROTOCOLS):
+        if existing['name'] == protocol['name']:
+            PROTOCOLS[i] = protocol
+            return
+    PROTOCOLS.append(protocol)
+
+
+def load_registry(path: str):
+    """Register the chains and protocols of a JSON file"""
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    for chain in data.get('chains', []):
+        register_chain(chain)
+    for protocol in data.get('protocols', []):
+        register_protocol(protocol)
+
+
+def get_protocol(name: str) -> Optional[Dict]:
+    return next((protocol for protocol in PROTOCOLS if protocol['name'] == name), None)
+
+
+def protocols_for_chain(chain_id: int) -> List[Dict]:
+    return [protocol for protocol in PROTOCOLS if protocol['chain_id'] == chain_id]
+
+
+def position_key(position: Dict) -> Tuple[int, str, int]:
+    """(chain_id, protocol name, token_id) of a position or position manager event"""
+    return position.get('chain_id', LEGACY_CHAIN_ID), position.get('protocol', LEGACY_PROTOCOL), position['token_id']
+
+
+def compute_pool_address(factory: str, init_code_hash: str, token0: str, token1: str, fee: int) -> str:
+    """CREATE2 address of a pool, as computed by PoolAddress.computeAddress in the V3 periphery"""
+    salt = keccak(
+        bytes.fromhex(token0[2:]).rjust(32, b'\0')
+        + bytes.fromhex(token1[2:]).rjust(32, b'\0')
+        + fee.to_bytes(32, 'big')
+    )
+    digest = keccak(b'\xff' + bytes.fromhex(factory[2:]) + salt + bytes.fromhex(init_code_hash[2:]))
+    return checksum_address("0x" + digest[12:].hex())
+
+
+if os.getenv('PROTOCOLS_FILE'):
+    load_registry(os.environ['PROTOCOLS_FILE'])
@@ -0,0 +1,382 @@
+"""
+Lean JSON-RPC read path for the tracker.
+
+web3 contract calls rebuild the function ABI, run the request through the middleware stack and
+checksum every address on each call. The tracker only reads a handful of functions, so their
+selectors and ABI coders are prepared once at import time and eth_call requests are sent
+directly over a pooled HTTP session. Static words are packed and unpacked by hand; eth_abi is
+only used for dynamic types (strings, tuples) and imported on first use, like the rest of the
+web3 stack it is slow to import. Checksumming and selectors only need keccak from eth_hash.
+
+Reads can also share HTTP round trips as JSON-RPC batch arrays, either grouped explicitly with
+RpcClient.call_batch or coalesced across threads by BatchingTransport.
+"""
+
+import itertools
+import json
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+import requests
+from eth_hash.auto import keccak
+
+
+class BatchRejected(Exception):
+    """The endpoint refused a batch, usually because it is too large"""
+
+
+class RpcError(Exception):
+    """JSON-RPC error object returned by the node (reverts included)"""
+
+    def __init__(self, error: Dict):
+        self.code = error.get('code')
+        self.data = error.get('data')
+        super().__init__(error.get('message', str(error)))
+
+
+HEX_DIGITS = frozenset("0123456789abcdef")
+
+
+@lru_cache(maxsize=65536)
+def checksum_address(address: str) -> str:
+    """
+    EIP-55 checksummed form of a hex address, cached since the same few addresses come back in
+    every response. Raises ValueError for anything that is not a 20-byte hex address.
+    """
+    hex_address = address[2:] if address[:2] in ('0x', '0X') else address
+    hex_address = hex_address.lower()
+    if len(hex_address) != 40 or not HEX_DIGITS.issuperset(hex_address):
+        raise ValueError(f"Invalid address: {address!r}")
+
+    digest = keccak(hex_address.encode()).hex()
+    return "0x" + "".join(c.upper() if int(d, 16) >= 8 else c for c, d in zip(hex_address, digest))
+
+
+def is_address(value) -> bool:
+    """Same rules as web3's is_address: 40 hex digits, optionally 0x-prefixed, in any case"""
+    if not isinstance(value, str):
+        return False
+    try:
+        checksum_address(value)
+        return True
+    except ValueError:
+        return False
+
+
+def has_valid_checksum(address: str) -> bool:
+    """
+    EIP-55 check of a hex address: mixed-case addresses must match their checksum, all-lowercase
+    or all-uppercase ones carry none and pass. False for anything that is not an address.
+    """
+    if not is_address(address):
+        return False
+    hex_address = address[2:] if address[:2] in ('0x', '0X') else address
+    if hex_address == hex_address.lower() or hex_address == hex_address.upper():
+        return True
+    return checksum_address(address)[2:] == hex_address
+
+
+def _selector(signature: str) -> str:
+    return "0x" + keccak(signature.encode())[:4].hex()
+
+
+def event_topic(signature: str) -> str:
+    """topics[0] of the logs of an event"""
+    return "0x" + keccak(signature.encode()).hex()
+
+
+def _is_word(abi_type: str) -> bool:
+    return abi_type in ('address', 'bool') or abi_type.startswith(('uint', 'int'))
+
+
+def _word_encoder(abi_type: str):
+    if abi_type == 'address':
+        return lambda value: bytes.fromhex(value[2:]).rjust(32, b'\0')
+    if abi_type.startswith('int'):
+        return lambda value: int(value).to_bytes(32, 'big', signed=True)
+    return lambda value: int(value).to_bytes(32, 'big')
+
+
+def _word_decoder(abi_type: str):
+    if abi_type == 'address':
+        return lambda word: checksum_address("0x" + word[12:].hex())
+    if abi_type == 'bool':
+        return lambda word: word[31] == 1
+    if abi_type.startswith('int'):
+        return lambda word: int.from_bytes(word, 'big', signed=True)
+    return lambda word: int.from_bytes(word, 'big')
+
+
+class AbiFunction:
+    """A contract function with its selector and argument/result coders prepared once"""
+
+    def __init__(self, name: str, inputs: List[str], outputs: List[str]):
+        self.name = name
+        self.inputs = inputs
+        self.outputs = outputs
+        self.selector = _selector(f"{name}({','.join(inputs)})")
+
+        self._word_encoders = [_word_encoder(t) for t in inputs] if all(_is_word(t) for t in inputs) else None
+        self._word_decoders = [_word_decoder(t) for t in outputs] if all(_is_word(t) for t in outputs) else None
+        self._encoder = None
+        self._decoder = None
+
+    def encode(self, *args) -> str:
+        """Calldata as a hex string"""
+        if self._word_encoders is not None:
+            return self.selector + b"".join(enc(arg) for enc, arg in zip(self._word_encoders, args)).hex()
+
+        if self._encoder is None:
+            from eth_abi.registry import registry
+            self._encoder = registry.get_tuple_encoder(*self.inputs)
+        return self.selector + self._encoder(args).hex()
+
+    def decode(self, data: bytes) -> tuple:
+        if not data and self.outputs:
+            raise ValueError(f"Empty result for {self.name}(), the address is probably not a contract")
+
+        if self._word_decoders is not None:
+            if len(data) < 32 * len(self._word_decoders):
+                raise ValueError(f"Result of {self.name}() is too short: {len(data)} bytes")
+            return tuple(dec(data[32 * i:32 * (i + 1)]) for i, dec in enumerate(self._word_decoders))
+
+        from eth_abi.decoding import ContextFramesBytesIO
+        if self._decoder is None:
+            from eth_abi.registry import registry
+            self._decoder = registry.get_tuple_decoder(*self.outputs)
+        return self._decoder(ContextFramesBytesIO(data))
+
+
+BALANCE_OF = AbiFunction('balanceOf', ['address'], ['uint256'])
+TOKEN_OF_OWNER_BY_INDEX = AbiFunction('tokenOfOwnerByIndex', ['address', 'uint256'], ['uint256'])
+POSITIONS = AbiFunction('positions', ['uint256'], [
+    'uint96', 'address', 'address', 'address', 'uint24', 'int24', 'int24', 'uint128',
+    'uint256', 'uint256', 'uint128', 'uint128'
+])
+COLLECT = AbiFunction('collect', ['(uint256,address,uint128,uint128)'], ['uint256', 'uint256'])
+GET_POOL = AbiFunction('getPool', ['address', 'address', 'uint24'], ['address'])
+SLOT0 = AbiFunction('slot0', [], ['uint160', 'int24', 'uint16', 'uint16', 'uint16', 'uint8', 'bool'])
+LIQUIDITY = AbiFunction('liquidity', [], ['uint128'])
+SYMBOL = AbiFunction('symbol', [], ['string'])
+DECIMALS = AbiFunction('decimals', [], ['uint8'])
+
+TRANSFER_TOPIC = event_topic('Transfer(address,address,uint256)')
+INCREASE_LIQUIDITY_TOPIC = event_topic('IncreaseLiquidity(uint256,uint128,uint256,uint256)')
+DECREASE_LIQUIDITY_TOPIC = event_topic('DecreaseLiquidity(uint256,uint128,uint256,uint256)')
+SWAP_TOPIC = event_topic('Swap(address,address,int256,int256,uint160,uint128,int24)')
+# Non-indexed fields of a pool's Swap log, decoded like call results
+SWAP_DATA = AbiFunction('Swap', [], ['int256', 'int256', 'uint160', 'uint128', 'int24'])
+
+
+class HttpTransport:
+    """
+    JSON-RPC over a keep-alive requests session.
+
+    Batches larger than max_batch_size are sent in chunks. When the endpoint rejects a batch
+    (HTTP 413 or a single error object instead of an array), it is split in halves and
+    max_batch_size is lowered so later batches fit directly.
+
+    fallback_urls form an RPC pool with rpc_url: on a connection error or timeout the request is
+    sent to the next URL, which is then used until it fails in turn.
+    """
+
+    def __init__(self, rpc_url: str, timeout: float = 30, pool_size: int = 16, max_batch_size: int = 100,
+                 fallback_urls: Tuple[str, ...] = ()):
+        self.rpc_url = rpc_url
+        self.rpc_urls = [rpc_url, *fallback_urls]
+        self.timeout = timeout
+        self.max_batch_size = max_batch_size
+        self.ids = itertools.count(1)
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def _post(self, payload: Any) -> Any:
+        data = json.dumps(payload, separators=(',', ':'))
+        for attempt in range(len(self.rpc_urls)):
+            rpc_url = self.rpc_url
+            try:
+                response = self.session.post(rpc_url, data=data, headers={'Content-Type': 'application/json'},
+                                             timeout=self.timeout)
+                break
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt == len(self.rpc_urls) - 1:
+                    raise
+                self.rpc_url = self.rpc_urls[(self.rpc_urls.index(rpc_url) + 1) % len(self.rpc_urls)]
+                print(f"RPC endpoint {rpc_url} unreachable ({type(e).__name__}), switching to {self.rpc_url}")
+
+        if response.status_code == 413 and isinstance(payload, list):
+            raise BatchRejected(f"HTTP 413 for a batch of {len(payload)}")
+        # HTTP 429 surfaces as "429 Client Error: Too Many Requests", which the tracker retries
+        response.raise_for_status()
+        return response.json()
+
+    def make_request(self, method: str, params: Any) -> Dict:
+        return self._post({'jsonrpc': '2.0', 'id': next(self.ids), 'method': method, 'params': params})
+
+    def make_batch_request(self, requests: List[Tuple[str, Any]]) -> List[Dict]:
+        """Send several requests as JSON-RPC batches, responses are returned in request order"""
+        if not requests:
+            return []
+
+        if len(requests) > self.max_batch_size:
+            responses = []
+            for start in range(0, len(requests), self.max_batch_size):
+                responses.extend(self.make_batch_request(requests[start:start + self.max_batch_size]))
+            return responses
+
+        if len(requests) == 1:
+            return [self.make_request(*requests[0])]
+
+        payload = [{'jsonrpc': '2.0', 'id': next(self.ids), 'method': method, 'params': params}
+                   for method, params in requests]
+        try:
+            response = self._post(payload)
+            if not isinstance(response, list):
+                raise BatchRejected(str(response.get('error', response)))
+        except BatchRejected as e:
+            half = len(requests) // 2
+            self.max_batch_size = max(1, min(self.max_batch_size, half))
+            print(f"RPC batch of {len(requests)} rejected ({e}), splitting to {self.max_batch_size}")
+            return self.make_batch_request(requests[:half]) + self.make_batch_request(requests[half:])
+
+        by_id = {item.get('id'): item for item in response}
+        missing = {'code': -32603, 'message': "No response for this request in the batch"}
+        return [by_id.get(item['id'], {'jsonrpc': '2.0', 'id': item['id'], 'error': missing}) for item in payload]
+
+
+class BatchingTransport:
+    """
+    Coalesces single requests issued by concurrent threads into JSON-RPC batches.
+
+    Requests are queued and sent `window` seconds after the first one of a batch (or as soon as
+    max_batch_size are queued), so reads issued at the same time by bot handlers running in
+    worker threads share one HTTP round trip. Explicit batches go straight to the transport.
+    """
+
+    def __init__(self, transport, window: float = 0.01, max_batch_size: int = 100, max_in_flight: int = 4):
+        self.transport = transport
+        self.window = window
+        self.max_batch_size = max_batch_size
+        self.pending: List[Tuple[str, Any, Future]] = []
+        self.condition = threading.Condition()
+        self.executor = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="rpc-batch")
+        threading.Thread(target=self._run, name="rpc-batcher", daemon=True).start()
+
+    def submit(self, method: str, params: Any) -> Future:
+        future = Future()
+        with self.condition:
+            self.pending.append((method, params, future))
+            self.condition.notify()
+        return future
+
+    def make_request(self, method: str, params: Any) -> Dict:
+        return self.submit(method, params).result()
+
+    def make_batch_request(self, requests: List[Tuple[str, Any]]) -> List[Dict]:
+        return self.transport.make_batch_request(requests)
+
+    def _run(self):
+        while True:
+            with self.condition:
+                while not self.pending:
+                    self.condition.wait()
+
+                deadline = time.monotonic() + self.window
+                while len(self.pending) < self.max_batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.condition.wait(remaining)
+
+                batch = self.pending[:self.max_batch_size]
+                del self.pending[:self.max_batch_size]
+
+            self.executor.submit(self._send, batch)
+
+    def _send(self, batch: List[Tuple[str, Any, Future]]):
+        try:
+            responses = self.transport.make_batch_request([(method, params) for method, params, _ in batch])
+        except Exception as e:
+            for _, _, future in batch:
+                future.set_exception(e)
+            return
+
+        for (_, _, future), response in zip(batch, responses):
+            future.set_result(response)
+
+
+class RpcClient:
+    """
+    eth_call client for the functions above.
+
+    `transport` is anything with make_request(method, params) returning a JSON-RPC response
+    dict, which is where rpc_replay.py plugs in its recording and replay providers.
+    """
+
+    def __init__(self, rpc_url: str, timeout: float = 30, batch_window: float = 0, fallback_urls: Tuple[str, ...] = ()):
+        self.transport = HttpTransport(rpc_url, timeout, fallback_urls=tuple(fallback_urls))
+        if batch_window > 0:
+            self.transport = BatchingTransport(self.transport, batch_window)
+
+    @staticmethod
+    def _result(response: Dict) -> Any:
+        if 'error' in response:
+            raise RpcError(response['error'])
+        return response['result']
+
+    @staticmethod
+    def _decode(function: AbiFunction, result: str):
+        values = function.decode(bytes.fromhex(result[2:]))
+        return values[0] if len(values) == 1 else values
+
+    def request(self, method: str, params: Any) -> Any:
+        return self._result(self.transport.make_request(method, params))
+
+    def block_number(self) -> int:
+        return int(self.request('eth_blockNumber', []), 16)
+
+    def request_batch(self, requests: List[Tuple[str, Any]]) -> List[Any]:
+        """Raw (method, params) requests in one batch; each result in order, or the RpcError of that request"""
+        results = []
+        for response in self.transport.make_batch_request(requests):
+            try:
+                results.append(self._result(response))
+            except RpcError as e:
+                results.append(e)
+        return results
+
+    def get_logs(self, address: str, topics: List, from_block: int, to_block: int) -> List[Dict]:
+        """Raw eth_getLogs entries of `address` between two blocks (inclusive)"""
+        return self.request('eth_getLogs', [{
+            'address': address, 'topics': topics, 'fromBlock': hex(from_block), 'toBlock': hex(to_block)
+        }])
+
+    def call(self, to: str, function: AbiFunction, *args, sender: Optional[str] = None, block: str = 'latest'):
+        """eth_call `function` on `to`; returns the value for single-output functions, a tuple otherwise"""
+        transaction = {'to': to, 'data': function.encode(*args)}
+        if sender:
+            transaction['from'] = sender
+
+        return self._decode(function, self.request('eth_call', [transaction, block]))
+
+    def call_batch(self, calls: List[tuple], block: str = 'latest') -> List[Any]:
+        """
+        Several eth_calls in one batch request. Each call is a (to, function, *args) tuple; the
+        result list holds, in order, the decoded value or the exception raised for that call.
+        Transport errors (HTTP 429 included) are raised for the whole batch.
+        """
+        requests = [('eth_call', [{'to': to, 'data': function.encode(*args)}, block]) for to, function, *args in calls]
+        responses = self.transport.make_batch_request(requests)
+
+        results = []
+        for (_, function, *_), response in zip(calls, responses):
+            try:
+                results.append(self._decode(function, self._result(response)))
+            except Exception as e:
+                results.append(e)
+        return results
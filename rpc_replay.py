@@ -0,0 +1,202 @@
+"""
+Record and replay JSON-RPC traffic of the tracker.
+
+Recording wraps the transport of the tracker's RpcClient and appends every request with its response (or error)
+and timing to a JSON lines file, gzip-compressed when the name ends in .gz:
+
+    {"t": 12.031, "d": 0.184, "m": "eth_call", "p": [{"to": "0x…", "data": "0x…"}, "latest"], "r": "0x…"}
+
+t is the offset since recording started and d the call duration. Replay serves the recorded
+responses locally, matched on method and params, sleeping d / speed per call (speed 0 answers
+immediately), so monitor_positions changes can be compared on identical traffic offline.
+"""
+
+import gzip
+import json
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+
+from rpc_client import BatchingTransport
+
+FLUSH_EVERY = 256
+
+
+class RecordedRpcError(Exception):
+    """Replays an exception raised by the provider while recording (HTTP 429 included)"""
+
+
+def _open(path: str, mode: str):
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+
+def _request_key(method: str, params: Any) -> str:
+    return json.dumps([method, params], sort_keys=True, separators=(',', ':'))
+
+
+class RecordingProvider:
+    """Forwards requests to `provider` and records them to `path`"""
+
+    def __init__(self, provider, path: str):
+        self.provider = provider
+        self.path = path
+        self.file = _open(path, 'a')
+        self.lock = threading.Lock()
+        self.started = time.monotonic()
+        self.pending_flush = 0
+
+    def make_request(self, method, params):
+        start = time.monotonic()
+        try:
+            response = self.provider.make_request(method, params)
+        except Exception as e:
+            self._write(method, params, start, {'e': str(e)})
+            raise
+
+        self._write_response(method, params, start, response)
+        return response
+
+    def make_batch_request(self, requests):
+        """Batches are recorded as their individual requests, sharing the batch duration"""
+        start = time.monotonic()
+        try:
+            responses = self.provider.make_batch_request(requests)
+        except Exception as e:
+            for method, params in requests:
+                self._write(method, params, start, {'e': str(e)})
+            raise
+
+        for (method, params), response in zip(requests, responses):
+            self._write_response(method, params, start, response)
+        return responses
+
+    def _write_response(self, method, params, start: float, response: Dict):
+        if 'error' in response:
+            self._write(method, params, start, {'x': response['error']})
+        else:
+            self._write(method, params, start, {'r': response.get('result')})
+
+    def _write(self, method, params, start: float, outcome: Dict):
+        entry = {'t': round(start - self.started, 4), 'd': round(time.monotonic() - start, 4), 'm': method, 'p': params}
+        entry.update(outcome)
+        line = json.dumps(entry, separators=(',', ':'))
+
+        with self.lock:
+            self.file.write(line + "\n")
+            self.pending_flush += 1
+            if self.pending_flush >= FLUSH_EVERY:
+                self.file.flush()
+                self.pending_flush = 0
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+
+class ReplayProvider:
+    """
+    Serves responses from a recording.
+
+    Identical requests get their recorded responses in order; once a request has been answered
+    as many times as it was recorded, its last response is reused. Requests that were never
+    recorded are answered with a JSON-RPC error and counted in `misses`.
+    """
+
+    def __init__(self, path: str, speed: float = 0.0):
+        self.speed = speed
+        self.entries: Dict[str, List[Dict]] = defaultdict(list)
+        self.cursors: Dict[str, int] = defaultdict(int)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.calls: Dict[str, int] = {}
+        self.rate_limited = 0
+
+        with _open(path, 'r') as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    self.entries[_request_key(entry['m'], entry['p'])].append(entry)
+
+    def make_request(self, method, params):
+        entry = self._lookup(method, params)
+        if entry and self.speed:
+            time.sleep(entry['d'] / self.speed)
+        return self._response(method, entry)
+
+    def make_batch_request(self, requests):
+        entries = [self._lookup(method, params) for method, params in requests]
+        # Items of a recorded batch share its duration, so the batch waits once
+        durations = [entry['d'] for entry in entries if entry]
+        if durations and self.speed:
+            time.sleep(max(durations) / self.speed)
+        return [self._response(method, entry) for (method, _), entry in zip(requests, entries)]
+
+    def _lookup(self, method, params) -> Optional[Dict]:
+        key = _request_key(method, params)
+
+        with self.lock:
+            recorded = self.entries.get(key)
+            if not recorded:
+                self.misses += 1
+                entry = None
+            else:
+                self.hits += 1
+                index = self.cursors[key]
+                self.cursors[key] = index + 1
+                entry = recorded[min(index, len(recorded) - 1)]
+
+            # Like the fake server, requests rejected at the HTTP level are not counted as calls
+            if entry is None or 'e' not in entry:
+                self.calls[method] = self.calls.get(method, 0) + 1
+
+        return entry
+
+    def _response(self, method, entry: Optional[Dict]) -> Dict:
+        if entry is None:
+            return {'jsonrpc': '2.0', 'id': 0, 'error': {'code': -32000, 'message': f"No recorded response for {method}"}}
+
+        if 'e' in entry:
+            if "429" in entry['e']:
+                with self.lock:
+                    self.rate_limited += 1
+            raise RecordedRpcError(entry['e'])
+        if 'x' in entry:
+            return {'jsonrpc': '2.0', 'id': 0, 'error': entry['x']}
+        return {'jsonrpc': '2.0', 'id': 0, 'result': entry['r']}
+
+    def reset_counters(self):
+        with self.lock:
+            self.calls = {}
+            self.rate_limited = 0
+
+    @property
+    def total_calls(self) -> int:
+        return sum(self.calls.values())
+
+
+def _transport_owner(tracker):
+    # Providers go below the batching layer, so coalesced batches are recorded and replayed too
+    owner = tracker.rpc
+    if isinstance(owner.transport, BatchingTransport):
+        owner = owner.transport
+    return owner
+
+
+def record(tracker, path: str) -> RecordingProvider:
+    """Start recording the RPC traffic of a LiquidityPoolTracker"""
+    owner = _transport_owner(tracker)
+    provider = RecordingProvider(owner.transport, path)
+    owner.transport = provider
+    return provider
+
+
+def replay(tracker, path: str, speed: float = 0.0) -> ReplayProvider:
+    """Make a LiquidityPoolTracker read from a recording instead of the network"""
+    owner = _transport_owner(tracker)
+    provider = ReplayProvider(path, speed)
+    owner.transport = provider
+    return provider
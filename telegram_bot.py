@@ -2,29 +2,84 @@
 from dotenv import load_dotenv
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, ReplyKeyboardMarkup, KeyboardButton
 from telegram.ext import Application, CommandHandler, CallbackQueryHandler, MessageHandler, filters, ContextTypes, ConversationHandler
-from web3 import Web3
+from rpc_client import is_address, checksum_address as to_checksum_address
 import asyncio
-from typing import List, Dict, Optional
+import math
+import threading
+import time
+from typing import List, Dict, Optional, AsyncIterator
 from datetime import datetime
 
 load_dotenv()
 
-from PoolManager import LiquidityPoolTracker
+from tracker_manager import TrackerManager
+from protocols import CHAINS, position_key
 from database import Database
-
-WAITING_ADDRESS, WAITING_ALIAS, WAITING_BROADCAST_MESSAGE = range(3)
+import metrics
+from message_scheduler import MessageScheduler, PRIORITY_ALERT
+from broadcast import BroadcastEngine
+from alert_triggers import TriggerIndex, EDGE_WARNING_OPTIONS, NEAR_ZONES, OUT_ZONES, is_in_range
+from escalation import EscalationScheduler, ESCALATION_PRESETS, stage_label, stage_alert_type, format_duration
+from pool_polling import PoolPollScheduler, MIN_POLL_INTERVAL
+from wallet_tiers import WalletTiers
+from ownership_index import OwnershipIndex
+from block_feed import BlockFeed
+from wallet_import import parse_wallet_list, MAX_IMPORT_WALLETS, MAX_IMPORT_FILE_SIZE
+
+WAITING_ADDRESS, WAITING_ALIAS, WAITING_BROADCAST_MESSAGE, WAITING_IMPORT = range(4)
+
+POSITIONS_PER_PAGE = 5
+MAX_MESSAGE_LENGTH = 4000  # Telegram caps messages at 4096 characters
+PROGRESS_EDIT_INTERVAL = 1.0  # Minimum seconds between two live edits of a loading message
+MONITOR_WALLET_PAUSE = 2  # Seconds between two wallets in a monitoring cycle, spreads the RPC load
+POOL_READS_PER_MINUTE = 60  # Budget of slot0 reads of the adaptive pool polling
+PORTFOLIO_POOLS_SHOWN = 8  # Pools listed in the /portfolio exposure, the others are summed up
+PORTFOLIO_POOL_MAX_AGE = 15  # Seconds a pool state read by the monitor is reused by /portfolio
+IMPORT_WARM_CONCURRENCY = 4  # Imported wallets whose positions are loaded at the same time
+IMPORT_ERRORS_SHOWN = 10
+WEBHOOK_CONNECTIONS_RANGE = (1, 100)  # Simultaneous webhook connections Telegram accepts in set_webhook
+POSITIONS_VIEWS_KEPT = 20  # Positions messages per user whose view is kept for paging and details
 
 
 class TelegramLPBot:
-    def __init__(self, token: str, rpc_url: str, chain_id: int = 999, admin_ids: List[int] = None, monitor_interval: int = 60):
+    def __init__(self, token: str, rpc_url: str, chain_id: int = 999, admin_ids: List[int] = None, monitor_interval: int = 60,
+                 concurrent_updates: int = 1, api_base_url: Optional[str] = None, metrics_port: Optional[int] = None,
+                 db_path: str = "bot_data.db", rpc_batch_window: float = 0.01,
+                 pool_reads_per_minute: float = POOL_READS_PER_MINUTE, ws_url: Optional[str] = None):
         self.token = token
         self.rpc_url = rpc_url
         self.chain_id = chain_id
-        self.tracker = LiquidityPoolTracker(rpc_url, chain_id, delay_between_calls=1.0)
-        self.db = Database()
+        # One tracker per registered chain, the monitor follows every protocol
+        self.trackers = TrackerManager(chain_id, {chain_id: rpc_url}, batch_window=rpc_batch_window)
+        self.tracker = self.trackers.primary
+        self.db = Database(db_path)
         self.admin_ids = admin_ids or []
         self.monitor_interval = monitor_interval
+        self.monitor_wallet_pause = MONITOR_WALLET_PAUSE
+        self.concurrent_updates = concurrent_updates
+        self.api_base_url = api_base_url
+        self.metrics_port = metrics_port
+        self.metrics_server = None
+        self.rpc_recorder = None
+        self.triggers = TriggerIndex()
+        self.escalations = EscalationScheduler(self.db)
+        self.escalations.load()
+        self.pool_polls = PoolPollScheduler(pool_reads_per_minute, max_interval=monitor_interval * 60)
+        self.wallet_tiers = WalletTiers(self.db, cycle_seconds=monitor_interval * 60)
+        self.ownership = OwnershipIndex(self.db)
+        self.wallet_tiers.listeners.append(self.ownership)
+        # One block feed per chain, the WebSocket of other chains than the primary one comes from the registry
+        self.block_feeds = {
+            chain: BlockFeed(tracker, ws_url if chain == chain_id else CHAINS.get(chain, {}).get('ws_url'),
+                             poll_interval=MIN_POLL_INTERVAL, pools=lambda chain=chain: self._chain_pools(chain))
+            for chain, tracker in self.trackers.trackers.items()
+        }
+        self.block_consumers = []
+        self.evaluation_lock = asyncio.Lock()  # Serializes the pool evaluations of the monitor and the block feed
+        self.import_tasks = set()
         self.application = None
+        self.scheduler = None
+        self.broadcasts = None
 
     def get_main_keyboard(self):
         keyboard = [
@@ -43,8 +98,11 @@ class TelegramLPBot:
             f"📊 Monitor your liquidity pool positions and receive alerts when they go out of range.\n\n"
             f"━━━━━━━━━━━━━━━━━━━━\n\n"
             f"🔗 *Supported Protocols:*\n"
-            f"• Project X (Hyperliquid EVM)\n\n"
         )
+        for protocol in self.trackers.protocols:
+            chain_name = CHAINS.get(protocol['chain_id'], {}).get('name', f"chain {protocol['chain_id']}")
+            menu_msg += f"• {protocol['label']} ({chain_name})\n"
+        menu_msg += "\n"
 
         if wallets:
             menu_msg += f"💼 *Your Registered Wallets:* ({len(wallets)})\n"
@@ -73,6 +131,7 @@ class TelegramLPBot:
 
     async def start(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         user_id = update.effective_user.id
+        self.db.set_user_blocked(user_id, False)
         wallets = self.db.get_user_wallets(user_id)
 
         if wallets:
@@ -91,13 +150,13 @@ class TelegramLPBot:
         user_id = update.effective_user.id
         address = update.message.text.strip()
 
-        if not Web3.is_address(address):
+        if not is_address(address):
             await update.message.reply_text(
                 "❌ Invalid address. Please send a valid Ethereum address starting with 0x"
             )
             return WAITING_ADDRESS
 
-        address = Web3.to_checksum_address(address)
+        address = to_checksum_address(address)
         context.user_data['pending_address'] = address
         context.user_data['adding_wallet'] = False
         context.user_data['adding_alias'] = True
@@ -248,32 +307,164 @@ class TelegramLPBot:
         loading_msg = await message.reply_text("⏳ Fetching positions...")
 
         try:
-            positions = await asyncio.to_thread(
-                self.tracker.get_positions,
-                wallet_address,
-                include_pool_info=True
-            )
+            view = await self._load_positions_view(user_id, wallet_address)
 
-            if not positions:
-                await loading_msg.edit_text("❌ No active positions found.")
+            if view['balance'] == 0:
+                await loading_msg.edit_text("❌ No positions found.")
                 return
 
-            for position in positions:
-                msg = self._format_position(position)
-                keyboard = [[
-                    InlineKeyboardButton("🔍 Details", callback_data=f'details_{position["token_id"]}')
-                ]]
-                reply_markup = InlineKeyboardMarkup(keyboard)
+            self._remember_view(context, loading_msg.message_id, view)
+            await self._render_positions_page(loading_msg, view, 0)
 
-                await message.reply_text(msg, parse_mode='Markdown', reply_markup=reply_markup)
+        except Exception as e:
+            await loading_msg.edit_text(f"❌ Error: {str(e)}")
 
-            await loading_msg.delete()
+    async def _stream(self, generator_func, *args, **kwargs) -> AsyncIterator:
+        """Run a blocking generator in a worker thread and yield its items as they are produced"""
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+        done = object()
+        stop = threading.Event()
+
+        def _produce():
+            try:
+                for item in generator_func(*args, **kwargs):
+                    if stop.is_set():
+                        break
+                    loop.call_soon_threadsafe(queue.put_nowait, item)
+            except Exception as e:
+                loop.call_soon_threadsafe(queue.put_nowait, e)
+            finally:
+                loop.call_soon_threadsafe(queue.put_nowait, done)
+
+        producer = asyncio.create_task(asyncio.to_thread(_produce))
 
-            summary = f"✅ *{len(positions)} active position(s) found*"
-            await message.reply_text(summary, parse_mode='Markdown')
+        try:
+            while True:
+                item = await queue.get()
+                if item is done:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            stop.set()
+            await producer
+
+    async def _load_positions_view(self, user_id: int, wallet_address: str) -> Dict:
+        """Position NFT counts of a wallet on every protocol, read in parallel"""
+        counts = await asyncio.to_thread(self.trackers.get_position_counts, wallet_address)
+        if all(count is None for count in counts.values()):
+            raise Exception("Could not read the positions of this wallet")
+
+        counts = [(name, count) for name, count in counts.items() if count]
+        return {'user_id': user_id, 'wallet': wallet_address, 'counts': counts, 'balance': sum(count for _, count in counts)}
+
+    @staticmethod
+    def _remember_view(context: ContextTypes.DEFAULT_TYPE, message_id: int, view: Dict):
+        """Attach a positions view to the message showing it, so several positions messages page independently"""
+        views = context.user_data.setdefault('positions_views', {})
+        views.pop(message_id, None)
+        views[message_id] = view
+        while len(views) > POSITIONS_VIEWS_KEPT:
+            del views[next(iter(views))]
+
+    @staticmethod
+    def _position_windows(counts: List[tuple], start: int = 0, count: Optional[int] = None) -> List[tuple]:
+        """(protocol, start, count, balance) owner index windows covering [start, start + count) of the concatenated protocols"""
+        end = sum(n for _, n in counts) if count is None else start + count
+        windows = []
+        offset = 0
+        for name, balance in counts:
+            window_start, window_end = max(start, offset), min(end, offset + balance)
+            if window_start < window_end:
+                windows.append((name, window_start - offset, window_end - window_start, balance))
+            offset += balance
+        return windows
+
+    def _iter_positions_with_pool(self, wallet_address: str, windows: List[tuple], include_closed: bool = False):
+        """Stream positions together with the state of their pool, reading each pool once"""
+        pool_infos = {}
+        for tracker, position in self.trackers.iter_positions(wallet_address, windows, include_closed):
+            pool_key = (tracker.chain_id, position.get('pool_address'))
+            if pool_key[1] and pool_key not in pool_infos:
+                pool_infos[pool_key] = tracker.get_pool_current_tick(pool_key[1])
+            yield position, pool_infos.get(pool_key)
+
+    def _details_callback(self, position: Dict, prefix: str = 'details_') -> str:
+        """Callback data of a position's details button, tagged with its protocol unless it is the default one"""
+        protocol = position.get('protocol')
+        if protocol and protocol != self.trackers.protocol()['name']:
+            return f"{prefix}{position['token_id']}@{protocol}"
+        return f"{prefix}{position['token_id']}"
+
+    async def _render_positions_page(self, message, view: Dict, page: int):
+        """Render one page of the positions view into an existing message, updating it as positions arrive"""
+        wallet_address = view['wallet']
+        balance = view['balance']
+        total_pages = (balance + POSITIONS_PER_PAGE - 1) // POSITIONS_PER_PAGE
+        page = max(0, min(page, total_pages - 1))
+        page_size = min(POSITIONS_PER_PAGE, balance - page * POSITIONS_PER_PAGE)
+
+        header = (
+            f"💼 *{self.db.get_wallet_display_name(wallet_address)}*\n"
+            f"📊 {balance} position NFT(s) - page {page + 1}/{total_pages}\n"
+        )
+        portfolio = self._portfolio_values(view['user_id'])
+        if portfolio.get(wallet_address) is not None:
+            header += f"💰 Wallet value: {self._format_usd(portfolio[wallet_address])}"
+            priced = [value for value in portfolio.values() if value is not None]
+            if len(portfolio) > 1:
+                header += f" | All wallets: {self._format_usd(sum(priced))}"
+                if len(priced) < len(portfolio):
+                    header += f" ({len(priced)}/{len(portfolio)} priced)"
+            header += "\n"
+        header += "\n"
+
+        body = ""
+        details_buttons = []
+        loaded = 0
+        page_value = 0.0
+        last_edit = time.monotonic()
+
+        async for position, pool_info in self._stream(
+            self._iter_positions_with_pool,
+            wallet_address,
+            self._position_windows(view['counts'], page * POSITIONS_PER_PAGE, POSITIONS_PER_PAGE),
+            include_closed=True
+        ):
+            loaded += 1
+
+            if position['liquidity'] == 0:
+                body += f"⚪ *Position #{position['token_id']}* - closed (no liquidity)\n\n"
+            else:
+                body += self._format_position(position, pool_info=pool_info) + "\n"
+                page_value += self._position_value(position, pool_info) or 0.0
+                details_buttons.append(
+                    InlineKeyboardButton(f"🔍 #{position['token_id']}", callback_data=self._details_callback(position))
+                )
 
-        except Exception as e:
-            await loading_msg.edit_text(f"❌ Error: {str(e)}")
+            if loaded < page_size and time.monotonic() - last_edit >= PROGRESS_EDIT_INTERVAL:
+                await message.edit_text(
+                    header + body + f"⏳ Loading {loaded}/{page_size}...",
+                    parse_mode='Markdown'
+                )
+                last_edit = time.monotonic()
+
+        keyboard = [details_buttons[k:k + 3] for k in range(0, len(details_buttons), 3)]
+
+        if total_pages > 1:
+            keyboard.append([
+                # The wallet is part of the callback data so the view can be reloaded if it is lost
+                InlineKeyboardButton("◀", callback_data=f"positions_page_{(page - 1) % total_pages}_{wallet_address}"),
+                InlineKeyboardButton(f"{page + 1}/{total_pages}", callback_data="noop"),
+                InlineKeyboardButton("▶", callback_data=f"positions_page_{(page + 1) % total_pages}_{wallet_address}")
+            ])
+
+        if page_value:
+            body += f"💵 Value on this page: {self._format_usd(page_value)}\n"
+
+        await message.edit_text(header + body, parse_mode='Markdown', reply_markup=InlineKeyboardMarkup(keyboard))
 
     async def out_of_range_positions(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         user_id = update.effective_user.id
@@ -295,20 +486,31 @@ class TelegramLPBot:
         loading_msg = await message.reply_text("⏳ Checking positions...")
 
         try:
-            positions = await asyncio.to_thread(
-                self.tracker.get_positions,
-                wallet_address,
-                include_pool_info=True
-            )
+            view = await self._load_positions_view(user_id, wallet_address)
+            balance = view['balance']
 
             out_of_range = []
-            for position in positions:
-                if position.get('pool_address'):
-                    pool_info = self.tracker.get_pool_current_tick(position['pool_address'])
-                    if pool_info:
-                        current_tick = pool_info['current_tick']
-                        if not (position['tick_lower'] <= current_tick <= position['tick_upper']):
-                            out_of_range.append(position)
+            checked = 0
+            last_edit = time.monotonic()
+
+            async for position, pool_info in self._stream(
+                self._iter_positions_with_pool,
+                wallet_address,
+                self._position_windows(view['counts']),
+                include_closed=True
+            ):
+                checked += 1
+
+                if pool_info and position['liquidity'] > 0:
+                    if not is_in_range(position, pool_info['current_tick']):
+                        out_of_range.append((position, pool_info))
+
+                if time.monotonic() - last_edit >= PROGRESS_EDIT_INTERVAL:
+                    await loading_msg.edit_text(
+                        f"⏳ Checking positions... {checked}/{balance}\n"
+                        f"⚠️ Out of range so far: {len(out_of_range)}"
+                    )
+                    last_edit = time.monotonic()
 
             await loading_msg.delete()
 
@@ -319,14 +521,128 @@ class TelegramLPBot:
             alert_msg = f"⚠️ *ALERT: {len(out_of_range)} position(s) OUT OF RANGE*\n\n"
             await message.reply_text(alert_msg, parse_mode='Markdown')
 
-            for position in out_of_range:
-                msg = self._format_position(position, alert_mode=True)
+            for position, pool_info in out_of_range:
+                msg = self._format_position(position, alert_mode=True, pool_info=pool_info)
                 await message.reply_text(msg, parse_mode='Markdown')
 
         except Exception as e:
             await loading_msg.edit_text(f"❌ Error: {str(e)}")
 
-    def _format_position(self, position: Dict, alert_mode: bool = False) -> str:
+    async def portfolio(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Aggregate value, in-range ratio and pool exposure of every wallet of the user, in one message"""
+        user_id = update.effective_user.id
+        wallets = self.db.get_user_wallets(user_id)
+
+        if not wallets:
+            await update.message.reply_text("❌ No wallets registered. Use /add to add a wallet.")
+            return
+
+        loading_msg = await update.message.reply_text(f"⏳ Fetching {len(wallets)} wallet(s)...")
+
+        try:
+            # All wallets at once: every read is batched across them, see get_wallets_positions
+            wallet_positions = await asyncio.to_thread(
+                self.trackers.get_wallets_positions, [wallet['address'] for wallet in wallets]
+            )
+
+            # Pools of every chain read in parallel, one batch per chain
+            pools = {
+                (position_key(position)[0], position['pool_address'])
+                for positions in wallet_positions.values() for position in positions or []
+                if position.get('pool_address')
+            }
+            pool_infos = await self._read_pool_states(list(pools), PORTFOLIO_POOL_MAX_AGE)
+            # Liquidity of the pools, to price every token through its deepest route: the only extra
+            # calls of the valuation, at most one batch per chain and hour (see price_oracle)
+            await asyncio.gather(*(
+                asyncio.to_thread(tracker.prices.refresh_depths) for tracker in self.trackers.trackers.values()
+            ))
+
+            await loading_msg.edit_text(
+                self._format_portfolio(wallets, wallet_positions, pool_infos),
+                parse_mode='Markdown'
+            )
+
+        except Exception as e:
+            await loading_msg.edit_text(f"❌ Error: {str(e)}")
+
+    def _format_portfolio(self, wallets: List[Dict], wallet_positions: Dict[str, Optional[List[Dict]]],
+                          pool_infos: Dict[tuple, Optional[Dict]]) -> str:
+        total_value = 0.0
+        positions_count = in_range_count = unpriced = 0
+        wallet_lines = []
+        pools: Dict[tuple, Dict] = {}
+
+        for wallet in wallets:
+            display_name = self.db.get_wallet_display_name(wallet['address'], wallet['alias'])
+            positions = wallet_positions.get(wallet['address'])
+            if positions is None:
+                wallet_lines.append(f"⚠️ {display_name}: could not be read")
+                continue
+
+            wallet_value = 0.0
+            wallet_in_range = wallet_unpriced = 0
+            for position in positions:
+                pool_key = (position_key(position)[0], position.get('pool_address'))
+                pool_info = pool_infos.get(pool_key)
+                in_range = bool(pool_info) and is_in_range(position, pool_info['current_tick'])
+                value = self._position_value(position, pool_info)
+                if value is None:
+                    wallet_unpriced += 1
+
+                wallet_value += value or 0.0
+                wallet_in_range += in_range
+
+                pool = pools.setdefault(pool_key, {
+                    'label': f"{position.get('token0_symbol', 'Token0')}/{position.get('token1_symbol', 'Token1')} "
+                             f"{position['fee'] / 10000:g}%",
+                    'value': 0.0, 'positions': 0, 'in_range': 0, 'priced': False
+                })
+                pool['value'] += value or 0.0
+                pool['priced'] |= value is not None
+                pool['positions'] += 1
+                pool['in_range'] += in_range
+
+            total_value += wallet_value
+            positions_count += len(positions)
+            in_range_count += wallet_in_range
+            unpriced += wallet_unpriced
+            priced = self._format_usd(wallet_value) if wallet_unpriced < len(positions) or not positions else "no USD price"
+            wallet_lines.append(
+                f"{'✅' if wallet_in_range == len(positions) else '⚠️'} {display_name}: "
+                f"{priced} - {wallet_in_range}/{len(positions)} in range"
+            )
+
+        msg = f"💼 *Portfolio* - {len(wallets)} wallet(s)\n\n"
+        msg += f"💰 Total value: {self._format_usd(total_value)}\n"
+        if unpriced:
+            msg += f"  ({unpriced} position(s) without a USD price are not counted)\n"
+        if positions_count:
+            msg += f"🎯 In range: {in_range_count}/{positions_count} ({in_range_count / positions_count * 100:.0f}%)\n"
+        else:
+            msg += "🎯 No open position\n"
+
+        msg += "\n👛 *Wallets:*\n" + "\n".join(wallet_lines) + "\n"
+
+        if pools:
+            ranked = sorted(pools.values(), key=lambda pool: (pool['value'], pool['positions']), reverse=True)
+            msg += "\n🏊 *Exposure by pool:*\n"
+            for pool in ranked[:PORTFOLIO_POOLS_SHOWN]:
+                share = f" ({pool['value'] / total_value * 100:.0f}%)" if total_value else ""
+                priced = self._format_usd(pool['value']) + share if pool['priced'] else "no USD price"
+                msg += (
+                    f"• {pool['label']}: {priced} - "
+                    f"{pool['in_range']}/{pool['positions']} in range\n"
+                )
+            others = ranked[PORTFOLIO_POOLS_SHOWN:]
+            if others:
+                msg += f"• {len(others)} other pool(s): {self._format_usd(sum(pool['value'] for pool in others))}\n"
+
+        if len(msg) > MAX_MESSAGE_LENGTH:
+            msg = msg[:MAX_MESSAGE_LENGTH - 2] + "\n…"
+        return msg
+
+    def _format_position(self, position: Dict, alert_mode: bool = False, pool_info: Optional[Dict] = None) -> str:
         token0_sym = position.get('token0_symbol', 'Token0')
         token1_sym = position.get('token1_symbol', 'Token1')
 
@@ -334,21 +650,27 @@ class TelegramLPBot:
 
         msg = header
         msg += f"━━━━━━━━━━━━━━━━━━━━\n"
-        msg += f"📌 Pair: *{token0_sym}/{token1_sym}*\n\n"
+        msg += f"📌 Pair: *{token0_sym}/{token1_sym}*\n"
+        if len(self.trackers.protocols) > 1 and position.get('protocol'):
+            msg += f"🔗 {self.trackers.protocol(position['protocol'])['label']}\n"
+        msg += "\n"
 
-        msg += f"📊 *Liquidity Range:*\n"
-        msg += f"  Lower: {position['tick_lower']} (${position['price_lower']:.6f})\n"
-        msg += f"  Upper: {position['tick_upper']} (${position['price_upper']:.6f})\n\n"
+        decimals0 = position.get('token0_decimals', 18)
+        decimals1 = position.get('token1_decimals', 18)
+        msg += f"📊 *Liquidity Range* ({token1_sym} per {token0_sym}):\n"
+        msg += f"  Lower: {position['tick_lower']} ({self.tracker.tick_to_price(position['tick_lower'], decimals0, decimals1):.6g})\n"
+        msg += f"  Upper: {position['tick_upper']} ({self.tracker.tick_to_price(position['tick_upper'], decimals0, decimals1):.6g})\n\n"
 
         if position.get('pool_address'):
-            pool_info = self.tracker.get_pool_current_tick(position['pool_address'])
+            if pool_info is None:
+                pool_info = self.trackers.trackers[position_key(position)[0]].get_pool_current_tick(position['pool_address'])
             if pool_info:
                 current_tick = pool_info['current_tick']
-                in_range = position['tick_lower'] <= current_tick <= position['tick_upper']
+                in_range = is_in_range(position, current_tick)
 
                 msg += f"🎯 *Current State:*\n"
                 msg += f"  Tick: {current_tick}\n"
-                msg += f"  Price: ${pool_info['price']:.6f}\n"
+                msg += f"  Price: {self._format_pool_price(position, pool_info)}\n"
 
                 if in_range:
                     msg += f"  Status: ✅ IN RANGE\n\n"
@@ -372,7 +694,11 @@ class TelegramLPBot:
 
                     msg += f"💵 *Composition:*\n"
                     msg += f"  {token0_sym}: {amounts['amount0']:.6f} ({amounts['percentage0']:.1f}%)\n"
-                    msg += f"  {token1_sym}: {amounts['amount1']:.6f} ({amounts['percentage1']:.1f}%)\n\n"
+                    msg += f"  {token1_sym}: {amounts['amount1']:.6f} ({amounts['percentage1']:.1f}%)\n"
+                    value = self._position_value(position, pool_info)
+                    if value is not None:
+                        msg += f"  Value: {self._format_usd(value)}\n"
+                    msg += "\n"
 
                     tokens_owed0 = position.get('tokens_owed0', 0)
                     tokens_owed1 = position.get('tokens_owed1', 0)
@@ -389,12 +715,181 @@ class TelegramLPBot:
 
         return msg
 
+    @staticmethod
+    def _format_pool_price(position: Dict, pool_info: Dict) -> str:
+        """Pool price as token1 per token0, adjusted for the token decimals"""
+        decimals0 = position.get('token0_decimals', 18)
+        decimals1 = position.get('token1_decimals', 18)
+        price = (pool_info['sqrt_price_x96'] / 2 ** 96) ** 2 * 10 ** (decimals0 - decimals1)
+        return f"{price:.6g} {position.get('token1_symbol', 'Token1')} per {position.get('token0_symbol', 'Token0')}"
+
+    @staticmethod
+    def _format_usd(value: float) -> str:
+        return f"${value:,.2f}"
+
+    def _position_value(self, position: Dict, pool_info: Optional[Dict]) -> Optional[float]:
+        """USD value of a position from the cached pool states of its chain, see price_oracle"""
+        tracker = self.trackers.trackers.get(position_key(position)[0])
+        if tracker is None:
+            return None
+        return tracker.prices.position_value(position, pool_info)
+
+    def _portfolio_values(self, user_id: int) -> Dict[str, Optional[float]]:
+        """
+        USD value of each monitored wallet of a user over every protocol, from the positions and
+        pool states of the last monitoring cycle (no call). None for wallets not monitored or with
+        an unpriced token.
+        """
+        values = {}
+        for wallet in self.db.get_user_wallets(user_id):
+            positions = self.triggers.wallet_positions(user_id, wallet['address'])
+            if positions is None:
+                values[wallet['address']] = None
+                continue
+
+            total = 0.0
+            for position in positions:
+                tracker = self.trackers.trackers.get(position_key(position)[0])
+                cached = tracker.pool_state_cache.get(position.get('pool_address')) if tracker else None
+                value = self._position_value(position, cached[1] if cached else None)
+                if value is None:
+                    total = None
+                    break
+                total += value
+            values[wallet['address']] = total
+        return values
+
+    def _format_range_bar(self, tick_lower: int, tick_upper: int, current_tick: int, width: int = 16) -> str:
+        """Text bar showing where the current tick sits relative to the position range"""
+        if current_tick < tick_lower:
+            return "● [" + "─" * width + "]"
+        if current_tick > tick_upper:
+            return "[" + "─" * width + "] ●"
+
+        slot = int((current_tick - tick_lower) / (tick_upper - tick_lower) * width)
+        slot = min(slot, width - 1)
+        return "[" + "─" * slot + "●" + "─" * (width - slot - 1) + "]"
+
+    def _format_position_details(self, details: Dict) -> str:
+        position = details['position']
+        pool_info = details['pool_info']
+        fees = details['fees']
+
+        token0_sym = position.get('token0_symbol', 'Token0')
+        token1_sym = position.get('token1_symbol', 'Token1')
+        decimals0 = position.get('token0_decimals', 18)
+        decimals1 = position.get('token1_decimals', 18)
+        tick_lower = position['tick_lower']
+        tick_upper = position['tick_upper']
+
+        price_lower = self.tracker.tick_to_price(tick_lower, decimals0, decimals1)
+        price_upper = self.tracker.tick_to_price(tick_upper, decimals0, decimals1)
+
+        msg = f"🔍 *Position #{position['token_id']}* - Details\n"
+        msg += f"━━━━━━━━━━━━━━━━━━━━\n"
+        msg += f"📌 Pair: *{token0_sym}/{token1_sym}* ({position['fee'] / 10000}% fee)\n\n"
+
+        msg += f"📊 *Range* ({token1_sym} per {token0_sym}):\n"
+        msg += f"  Lower: {price_lower:.6g} (tick {tick_lower})\n"
+        msg += f"  Upper: {price_upper:.6g} (tick {tick_upper})\n\n"
+
+        if position['liquidity'] == 0:
+            msg += "⚪ Position closed (no liquidity)\n\n"
+        elif pool_info:
+            current_tick = pool_info['current_tick']
+            current_price = self.tracker.tick_to_price(current_tick, decimals0, decimals1)
+            in_range = is_in_range(position, current_tick)
+
+            msg += f"🎯 *Current:* {current_price:.6g} (tick {current_tick})\n"
+            msg += f"`{self._format_range_bar(tick_lower, tick_upper, current_tick)}`\n"
+            msg += f"  Status: {'✅ IN RANGE' if in_range else '⚠️ OUT OF RANGE'}\n\n"
+
+            to_lower = tick_lower - current_tick
+            to_upper = tick_upper - current_tick
+            msg += f"📏 *Distance to edges:*\n"
+            msg += f"  Lower: {to_lower:+d} ticks ({(1.0001 ** to_lower - 1) * 100:+.2f}%)\n"
+            msg += f"  Upper: {to_upper:+d} ticks ({(1.0001 ** to_upper - 1) * 100:+.2f}%)\n\n"
+
+            amounts = self.tracker.calculate_token_amounts(
+                position['liquidity'],
+                pool_info['sqrt_price_x96'],
+                tick_lower,
+                tick_upper,
+                current_tick,
+                decimals0,
+                decimals1
+            )
+
+            msg += f"💵 *Composition:*\n"
+            msg += f"  {token0_sym}: {amounts['amount0']:.6f} ({amounts['percentage0']:.1f}%)\n"
+            msg += f"  {token1_sym}: {amounts['amount1']:.6f} ({amounts['percentage1']:.1f}%)\n"
+            value = self._position_value(position, pool_info)
+            if value is not None:
+                msg += f"  Value: {self._format_usd(value)}\n\n"
+            else:
+                # No route to a stablecoin for these tokens
+                msg += f"  Value: {amounts['value0_in_token1'] + amounts['value1_in_token1']:.6f} {token1_sym}\n\n"
+        else:
+            msg += "⚠️ Pool state unavailable\n\n"
+
+        if fees:
+            msg += f"💰 *Uncollected Fees:*\n"
+            fees0, fees1 = fees['fees0'], fees['fees1']
+        else:
+            msg += f"💰 *Uncollected Fees* (as of last position update):\n"
+            fees0, fees1 = position.get('tokens_owed0', 0), position.get('tokens_owed1', 0)
+
+        msg += f"  {token0_sym}: {fees0 / (10 ** decimals0):.6f}\n"
+        msg += f"  {token1_sym}: {fees1 / (10 ** decimals1):.6f}\n"
+
+        return msg
+
+    async def show_position_details(self, query, context: ContextTypes.DEFAULT_TYPE, position_ref: str, refresh: bool = False):
+        """
+        Deep fetch of a single position, sent as a new message or refreshed in place. position_ref
+        is the token ID, followed by @protocol for positions of another protocol than the default one.
+        """
+        user_id = query.from_user.id
+        view = context.user_data.get('positions_views', {}).get(query.message.message_id)
+        owner = view['wallet'] if view else self.db.get_active_wallet(user_id)
+        token_id, _, protocol_name = position_ref.partition('@')
+        token_id = int(token_id)
+
+        try:
+            protocol = self.trackers.protocol(protocol_name or None)
+            details = await asyncio.to_thread(
+                self.trackers.tracker_for(protocol).get_position_details,
+                token_id,
+                owner,
+                protocol['position_manager'],
+                pool_max_age=0 if refresh else 15
+            )
+        except Exception as e:
+            await query.message.reply_text(f"❌ Error: {str(e)}")
+            return
+
+        msg = self._format_position_details(details)
+        reply_markup = InlineKeyboardMarkup([[
+            InlineKeyboardButton("🔄 Refresh", callback_data=self._details_callback(details['position'], 'details_refresh_'))
+        ]])
+
+        if refresh:
+            try:
+                await query.message.edit_text(msg, parse_mode='Markdown', reply_markup=reply_markup)
+            except Exception as e:
+                print(f"Failed to refresh details of position {token_id}: {e}")
+        else:
+            details_msg = await query.message.reply_text(msg, parse_mode='Markdown', reply_markup=reply_markup)
+            if view:
+                # Refreshes of the details message read the same wallet
+                self._remember_view(context, details_msg.message_id, view)
+
     async def handle_text(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         user_id = update.effective_user.id
         text = update.message.text
 
         if context.user_data.get('adding_wallet'):
-            if Web3.is_address(text.strip()):
+            if is_address(text.strip()):
                 return await self.receive_address(update, context)
             else:
                 await update.message.reply_text("❌ Invalid address format. Please send a valid address starting with 0x")
@@ -429,6 +924,39 @@ class TelegramLPBot:
                 reply_markup=self.get_main_keyboard()
             )
 
+    def _alert_mode_button(self, user_id: int) -> InlineKeyboardButton:
+        mode = self.db.get_alert_mode(user_id)
+        label = "📬 Alert mode: Digest" if mode == 'digest' else "📨 Alert mode: Instant"
+        return InlineKeyboardButton(label, callback_data="toggle_alert_mode")
+
+    def _edge_warning_button(self, user_id: int) -> InlineKeyboardButton:
+        pct = self.db.get_edge_warning_pct(user_id)
+        label = f"⚠️ Edge warning: {pct:g}%" if pct else "⚠️ Edge warning: Off"
+        return InlineKeyboardButton(label, callback_data="cycle_edge_warning")
+
+    def _escalation_button(self, user_id: int) -> InlineKeyboardButton:
+        stages = self.db.get_escalation_stages(user_id)
+        label = "⏰ Reminders: " + (", ".join(stage_label(minutes) for minutes in stages) if stages else "Off")
+        return InlineKeyboardButton(label, callback_data="cycle_escalation")
+
+    def _notification_keyboard(self, user_id: int) -> InlineKeyboardMarkup:
+        keyboard = []
+        for wallet in self.db.get_user_wallets(user_id):
+            display_name = self.db.get_wallet_display_name(wallet['address'], wallet['alias'])
+            notif_status = "🔔" if wallet.get('notifications_enabled', True) else "🔕"
+            keyboard.append([
+                InlineKeyboardButton(
+                    f"{notif_status} {display_name}",
+                    callback_data=f"toggle_notif_{wallet['address']}"
+                )
+            ])
+
+        keyboard.append([self._alert_mode_button(user_id)])
+        keyboard.append([self._edge_warning_button(user_id)])
+        keyboard.append([self._escalation_button(user_id)])
+        keyboard.append([InlineKeyboardButton("« Back", callback_data="back_to_wallets")])
+        return InlineKeyboardMarkup(keyboard)
+
     async def button_handler(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         query = update.callback_query
         user_id = update.effective_user.id
@@ -437,28 +965,56 @@ class TelegramLPBot:
             await self.broadcast_confirm_handler(update, context)
             return
 
-        if query.data == 'manage_notifications':
+        if query.data == 'noop':
             await query.answer()
-            wallets = self.db.get_user_wallets(user_id)
+            return
 
-            keyboard = []
-            for wallet in wallets:
-                display_name = self.db.get_wallet_display_name(wallet['address'], wallet['alias'])
-                notif_status = "🔔" if wallet.get('notifications_enabled', True) else "🔕"
-                keyboard.append([
-                    InlineKeyboardButton(
-                        f"{notif_status} {display_name}",
-                        callback_data=f"toggle_notif_{wallet['address']}"
-                    )
-                ])
+        if query.data.startswith('details_refresh_'):
+            await query.answer()
+            await self.show_position_details(query, context, query.data.replace('details_refresh_', ''), refresh=True)
+            return
 
-            keyboard.append([InlineKeyboardButton("« Back", callback_data="back_to_wallets")])
-            reply_markup = InlineKeyboardMarkup(keyboard)
+        if query.data.startswith('details_'):
+            await query.answer()
+            await self.show_position_details(query, context, query.data.replace('details_', ''))
+            return
+
+        if query.data.startswith('positions_page_'):
+            await query.answer()
+            page, _, wallet_address = query.data.replace('positions_page_', '').partition('_')
+            page = int(page)
+
+            try:
+                view = context.user_data.get('positions_views', {}).get(query.message.message_id)
+                if view is None or (wallet_address and view['wallet'] != wallet_address):
+                    # View state is lost after a restart, rebuild it for the wallet the message shows
+                    if not any(wallet['address'] == wallet_address for wallet in self.db.get_user_wallets(user_id)):
+                        wallet_address = self.db.get_active_wallet(user_id)
+                    if not wallet_address:
+                        await query.message.edit_text("❌ No active wallet. Use /wallets to select or add a wallet.")
+                        return
+                    view = await self._load_positions_view(user_id, wallet_address)
+                    if view['balance'] == 0:
+                        await query.message.edit_text("❌ No positions found.")
+                        return
+                    self._remember_view(context, query.message.message_id, view)
+
+                await self._render_positions_page(query.message, view, page)
+            except Exception as e:
+                await query.message.reply_text(f"❌ Error: {str(e)}")
+            return
+
+        if query.data == 'manage_notifications':
+            await query.answer()
+            reply_markup = self._notification_keyboard(user_id)
 
             await query.message.edit_text(
                 "🔔 *Notification Settings*\n\n"
                 "Toggle notifications for each wallet:\n"
-                "🔔 = ON | 🔕 = OFF",
+                "🔔 = ON | 🔕 = OFF\n\n"
+                "📬 Digest groups all alerts of a monitoring cycle into one message.\n"
+                "⚠️ Edge warning alerts you when the price gets within this distance of a range bound.\n"
+                "⏰ Reminders repeat an out-of-range alert after these delays.",
                 parse_mode='Markdown',
                 reply_markup=reply_markup
             )
@@ -476,22 +1032,35 @@ class TelegramLPBot:
                 status = "enabled" if new_state else "disabled"
                 await query.answer(f"✅ Notifications {status}!")
 
-                wallets = self.db.get_user_wallets(user_id)
-                keyboard = []
-                for w in wallets:
-                    display_name = self.db.get_wallet_display_name(w['address'], w['alias'])
-                    notif_status = "🔔" if w.get('notifications_enabled', True) else "🔕"
-                    keyboard.append([
-                        InlineKeyboardButton(
-                            f"{notif_status} {display_name}",
-                            callback_data=f"toggle_notif_{w['address']}"
-                        )
-                    ])
-
-                keyboard.append([InlineKeyboardButton("« Back", callback_data="back_to_wallets")])
-                reply_markup = InlineKeyboardMarkup(keyboard)
-
-                await query.message.edit_reply_markup(reply_markup=reply_markup)
+                await query.message.edit_reply_markup(reply_markup=self._notification_keyboard(user_id))
+            return
+
+        if query.data == 'toggle_alert_mode':
+            new_mode = 'instant' if self.db.get_alert_mode(user_id) == 'digest' else 'digest'
+            self.db.set_alert_mode(user_id, new_mode)
+            await query.answer(f"✅ Alert mode: {new_mode}")
+
+            await query.message.edit_reply_markup(reply_markup=self._notification_keyboard(user_id))
+            return
+
+        if query.data == 'cycle_edge_warning':
+            pct = self.db.get_edge_warning_pct(user_id)
+            next_pct = next((option for option in EDGE_WARNING_OPTIONS if option > pct), EDGE_WARNING_OPTIONS[0])
+            self.db.set_edge_warning_pct(user_id, next_pct)
+            await query.answer(f"✅ Edge warning: {next_pct:g}%" if next_pct else "✅ Edge warning: off")
+
+            await query.message.edit_reply_markup(reply_markup=self._notification_keyboard(user_id))
+            return
+
+        if query.data == 'cycle_escalation':
+            stages = self.db.get_escalation_stages(user_id)
+            index = ESCALATION_PRESETS.index(stages) if stages in ESCALATION_PRESETS else -1
+            next_stages = ESCALATION_PRESETS[(index + 1) % len(ESCALATION_PRESETS)]
+            self.db.set_escalation_stages(user_id, next_stages)
+            self.escalations.set_user_stages(user_id, next_stages)
+            await query.answer("✅ Reminders: " + (", ".join(stage_label(minutes) for minutes in next_stages) or "off"))
+
+            await query.message.edit_reply_markup(reply_markup=self._notification_keyboard(user_id))
             return
 
         if query.data == 'back_to_wallets':
@@ -581,6 +1150,8 @@ class TelegramLPBot:
 
             active = self.db.get_active_wallet(user_id)
             self.db.delete_wallet(user_id, address)
+            # Its alert rows are deleted with it, the reminders in memory are dropped here
+            self.escalations.stop_wallet(user_id, address)
 
             if active == address:
                 wallets = self.db.get_user_wallets(user_id)
@@ -595,69 +1166,324 @@ class TelegramLPBot:
             await query.message.edit_text("❌ Deletion cancelled.")
 
     async def monitor_positions(self, context: ContextTypes.DEFAULT_TYPE):
-        """Background task to monitor positions"""
+        """Background task refreshing the positions of every monitored wallet, then evaluating them"""
         print(f"[{datetime.now().strftime('%H:%M:%S')}] 🔍 Monitoring positions...")
 
-        try:
-            user_ids = self.db.get_all_user_ids()
+        cycle_start = time.perf_counter()
+        phases = metrics.PhaseTimer()
+        pool_infos = {}
+        synced_wallets = []
+        refreshed = {}
+        processed = {'users': 0, 'wallets': 0, 'refreshed': 0, 'positions': 0, 'alerts': 0}
 
-            for user_id in user_ids:
+        try:
+            with phases.time('db'):
+                user_wallets = {}
+                for user_id in self.db.get_all_user_ids():
+                    try:
+                        user_wallets[user_id] = (self.db.get_user_wallets_for_monitoring(user_id),
+                                                 self.db.get_edge_warning_pct(user_id))
+                    except Exception as e:
+                        print(f"Error monitoring user {user_id}: {e}")
+
+            # One scan of the position manager events for every wallet, see wallet_tiers
+            with phases.time('fetch'):
                 try:
-                    wallets = self.db.get_user_wallets_for_monitoring(user_id)
+                    addresses = [wallet['address'] for wallets, _ in user_wallets.values() for wallet in wallets]
+                    await asyncio.to_thread(self.wallet_tiers.scan, self.trackers, addresses)
+                except Exception as e:
+                    print(f"Error while checking wallet activity: {e}")
+
+            for user_id, (wallets, edge_warning_pct) in user_wallets.items():
+                processed['users'] += 1
 
+                try:
                     for wallet in wallets:
                         address = wallet['address']
-
-                        positions = await asyncio.to_thread(
-                            self.tracker.get_positions,
-                            address,
-                            include_pool_info=True
-                        )
-
-                        for position in positions:
-                            if not position.get('pool_address'):
-                                continue
-
-                            pool_info = self.tracker.get_pool_current_tick(position['pool_address'])
-                            if not pool_info:
-                                continue
-
-                            current_tick = pool_info['current_tick']
-                            position_id = position['token_id']
-                            in_range = position['tick_lower'] <= current_tick <= position['tick_upper']
-
-                            if not in_range:
-                                out_of_range_since = self.db.get_out_of_range_since(user_id, address, position_id)
-
-                                if not out_of_range_since:
-                                    current_time = datetime.now().isoformat()
-                                    await self.send_out_of_range_alert(user_id, wallet, position, pool_info)
-                                    self.db.mark_as_alerted(user_id, address, position_id, 'out_of_range', current_time)
-                                else:
-                                    out_time = datetime.fromisoformat(out_of_range_since)
-                                    hours_out = (datetime.now() - out_time).total_seconds() / 3600
-
-                                    if hours_out >= 4 and not self.db.has_been_alerted(user_id, address, position_id, 'out_4h'):
-                                        await self.send_extended_out_of_range_alert(user_id, wallet, position, pool_info, hours_out)
-                                        self.db.mark_as_alerted(user_id, address, position_id, 'out_4h')
-                            else:
-                                if self.db.has_been_alerted(user_id, address, position_id, 'out_of_range'):
-                                    await self.send_back_in_range_alert(user_id, wallet, position, pool_info)
-
-                                self.db.clear_position_alert(user_id, address, position_id)
-
-                        await asyncio.sleep(2)
+                        processed['wallets'] += 1
+
+                        # Wallets without activity keep the positions of their last refresh; a wallet
+                        # monitored by several users is refreshed once
+                        positions = refreshed.get(address)
+                        if positions is None and not self.wallet_tiers.needs_refresh(address):
+                            positions = self.triggers.wallet_positions(user_id, address)
+
+                        if positions is None:
+                            with phases.time('fetch'):
+                                positions = await asyncio.to_thread(
+                                    self.ownership.fetch_positions, self.trackers, address, self.wallet_tiers.head_blocks
+                                )
+                            self.wallet_tiers.refreshed(address, positions)
+                            refreshed[address] = positions
+                            processed['refreshed'] += 1
+
+                            with phases.time('pause'):
+                                await asyncio.sleep(self.monitor_wallet_pause)
+
+                        processed['positions'] += len(positions)
+                        with phases.time('evaluate'):
+                            self.triggers.sync_wallet(user_id, wallet, positions, edge_warning_pct)
+                        synced_wallets.append((user_id, address))
 
                 except Exception as e:
                     print(f"Error monitoring user {user_id}: {e}")
-                    continue
 
-            print(f"[{datetime.now().strftime('%H:%M:%S')}] ✅ Monitoring complete")
+            self.triggers.retain_wallets(synced_wallets)
+            pool_infos = await self._evaluate_pools(phases, processed)
 
         except Exception as e:
             print(f"Error in monitor_positions: {e}")
 
-    async def send_out_of_range_alert(self, user_id: int, wallet: Dict, position: Dict, pool_info: Dict):
+        processed['pools'] = len(pool_infos)
+        self._record_cycle_metrics(time.perf_counter() - cycle_start, phases, processed)
+
+    async def consume_blocks(self, chain_id: int):
+        """
+        Background task evaluating the pools after every new block published by a chain's block
+        feed. Blocks landing during an evaluation are coalesced into the next one.
+        """
+        feed = self.block_feeds[chain_id]
+        while True:
+            event = await feed.queue.get()
+            try:
+                fresh_pools = {(chain_id, pool) for pool in event['pools']}
+                await self._evaluate_pools(metrics.PhaseTimer(), {'alerts': 0}, fresh_pools=fresh_pools)
+            except Exception as e:
+                print(f"Error while evaluating pools at block {event['block']} of chain {chain_id}: {e}")
+
+    def _chain_pools(self, chain_id: int) -> List[str]:
+        """Addresses of the monitored pools of a chain, for its block feed"""
+        return [pool for chain, pool in self.triggers.pools() if chain == chain_id]
+
+    async def _read_pool_states(self, pools: List[tuple], max_age: float = 0) -> Dict[tuple, Optional[Dict]]:
+        """States of (chain_id, pool address) pools, the chains being read in parallel with one batch each"""
+        chain_pools: Dict[int, List[str]] = {}
+        for chain_id, pool in pools:
+            chain_pools.setdefault(chain_id, []).append(pool)
+
+        chain_ids = list(chain_pools)
+        states = await asyncio.gather(*(
+            asyncio.to_thread(self.trackers.trackers[chain_id].get_pool_states, chain_pools[chain_id], max_age)
+            for chain_id in chain_ids
+        ), return_exceptions=True)
+
+        pool_infos = {}
+        for chain_id, chain_states in zip(chain_ids, states):
+            if isinstance(chain_states, Exception):
+                print(f"Error while reading the pools of chain {chain_id}: {chain_states}")
+                continue
+            pool_infos.update({(chain_id, pool): pool_info for pool, pool_info in chain_states.items()})
+        return pool_infos
+
+    async def _evaluate_pools(self, phases: metrics.PhaseTimer, processed: Dict[str, int],
+                              fresh_pools: Optional[set] = None) -> Dict[str, Dict]:
+        """
+        Read the pools that are due, evaluate the positions whose trigger ticks were crossed since
+        the previous read of their pool and send the resulting alerts.
+
+        Pools that are not due, and fresh_pools whose state was just updated from their Swap logs,
+        are evaluated on their cached state. Returns the pool states used.
+
+        Block evaluations and monitoring cycles are serialized by evaluation_lock, so a block never
+        sees the triggers, pool states and escalations of an evaluation still in progress.
+        """
+        async with self.evaluation_lock:
+            pools = self.triggers.pools()
+            fresh_pools = fresh_pools or set()
+
+            with phases.time('fetch'):
+                # Pools whose positions were just synced or changed are read now, whatever the budget
+                due = self.pool_polls.due([pool for pool in pools if pool not in fresh_pools])
+                due = list(dict.fromkeys(due + self.triggers.pending_pools()))
+                pool_infos = await self._read_pool_states(due)
+                pool_infos.update(await self._read_pool_states([pool for pool in pools if pool not in pool_infos], math.inf))
+
+            events: Dict[int, List[Dict]] = {}
+            for pool in pools:
+                pool_info = pool_infos.get(pool)
+                if not pool_info:
+                    continue
+
+                current_tick = pool_info['current_tick']
+                with phases.time('evaluate'):
+                    changes = self.triggers.check_pool(pool, current_tick)
+                    self.pool_polls.observe(pool, current_tick, pool_info['read_at'], self.triggers.boundary_distance(pool, current_tick))
+
+                for trigger, zone, _ in changes:
+                    with phases.time('db'):
+                        event = self._zone_change_event(trigger, zone, pool_info)
+                    if event:
+                        events.setdefault(trigger['user_id'], []).append(event)
+
+            self.pool_polls.retain(pools)
+
+            for user_id, user_events in self._due_escalations(pool_infos, phases).items():
+                events.setdefault(user_id, []).extend(user_events)
+
+            for user_id, user_events in events.items():
+                processed['alerts'] += len(user_events)
+                with phases.time('alert'):
+                    self.send_alerts(user_id, user_events)
+
+            return pool_infos
+
+    def _zone_change_event(self, trigger: Dict, zone: str, pool_info: Dict) -> Optional[Dict]:
+        """
+        Alert event for a position that entered `zone`, if any. Out-of-range state lives in the
+        escalation scheduler, so the database is only written on transitions.
+        """
+        user_id = trigger['user_id']
+        address = trigger['wallet']['address']
+        position_ref = position_key(trigger['position'])
+        key = (user_id, address, position_ref)
+        event = {'wallet': trigger['wallet'], 'position': trigger['position'], 'pool_info': pool_info}
+
+        if zone in OUT_ZONES:
+            if self.escalations.is_out_of_range(key):
+                return None
+            self.db.mark_as_alerted(user_id, address, position_ref, 'out_of_range', datetime.now().isoformat())
+            self.escalations.start(key)
+            return {'type': 'out_of_range', **event}
+
+        if self.escalations.is_out_of_range(key):
+            self.db.clear_out_of_range_alerts(user_id, address, position_ref)
+            self.escalations.stop(key)
+            # Coming back into range through a warning zone is reported by the back in range alert only
+            if zone in NEAR_ZONES:
+                self.db.mark_as_alerted(user_id, address, position_ref, 'near_edge')
+            return {'type': 'back_in_range', **event}
+
+        if zone in NEAR_ZONES:
+            if self.db.has_been_alerted(user_id, address, position_ref, 'near_edge'):
+                return None
+            self.db.mark_as_alerted(user_id, address, position_ref, 'near_edge')
+            return {'type': 'near_edge', **event, 'side': 'lower' if zone == 'near_lower' else 'upper',
+                    'warning_pct': trigger['warning_pct']}
+
+        if self.db.has_been_alerted(user_id, address, position_ref, 'near_edge'):
+            self.db.clear_position_alert(user_id, address, position_ref, 'near_edge')
+        return None
+
+    def _due_escalations(self, pool_infos: Dict[str, Dict], phases: metrics.PhaseTimer) -> Dict[int, List[Dict]]:
+        """Reminders of the out-of-range positions whose next escalation stage is due, grouped per user"""
+        events: Dict[int, List[Dict]] = {}
+
+        for key, stage, minutes, seconds_out in self.escalations.pop_due():
+            user_id, address, position_ref = key
+
+            # Monitored positions are in the trigger index. A position missing from a synced wallet
+            # was closed or transferred, and a wallet missing from the monitored ones was deleted or
+            # muted: their reminders are dropped. Those of wallets not synced yet (after a restart)
+            # and of pools that could not be read are tried again later, the stage only advances
+            # once its reminder is sent
+            trigger = self.triggers.get(key)
+            if trigger is None and (self.triggers.is_synced(user_id, address) or not self._is_monitored(user_id, address)):
+                self.escalations.stop(key)
+                with phases.time('db'):
+                    self.db.clear_out_of_range_alerts(user_id, address, position_ref)
+                continue
+
+            pool_info = pool_infos.get(trigger['pool']) if trigger else None
+            if not pool_info:
+                self.escalations.retry(key)
+                continue
+
+            with phases.time('db'):
+                self.db.mark_as_alerted(user_id, address, position_ref, stage_alert_type(minutes))
+            self.escalations.sent(key, stage)
+
+            events.setdefault(user_id, []).append({
+                'type': 'extended', 'wallet': trigger['wallet'], 'position': trigger['position'],
+                'pool_info': pool_info, 'hours_out': seconds_out / 3600
+            })
+
+        return events
+
+    def _is_monitored(self, user_id: int, address: str) -> bool:
+        return any(wallet['address'] == address for wallet in self.db.get_user_wallets_for_monitoring(user_id))
+
+    def _record_cycle_metrics(self, duration: float, phases: metrics.PhaseTimer, processed: Dict[str, int]):
+        metrics.MONITOR_CYCLES.inc()
+        metrics.MONITOR_CYCLE_SECONDS.observe(duration)
+        for phase in ('fetch', 'evaluate', 'alert', 'db', 'pause'):
+            seconds = phases.durations.get(phase, 0)
+            metrics.MONITOR_PHASE_SECONDS.observe(seconds, phase=phase)
+            metrics.MONITOR_LAST_PHASE_SECONDS.set(seconds, phase=phase)
+        for kind, count in processed.items():
+            metrics.MONITOR_LAST_PROCESSED.set(count, kind=kind)
+
+        breakdown = ", ".join(f"{phase} {seconds:.1f}s" for phase, seconds in sorted(phases.durations.items()))
+        counts = ", ".join(f"{count} {kind}" for kind, count in processed.items())
+        print(f"[{datetime.now().strftime('%H:%M:%S')}] ✅ Monitoring complete in {duration:.1f}s ({breakdown}) - {counts}")
+
+    def send_alerts(self, user_id: int, events: List[Dict]):
+        """Deliver the alert events of one monitoring cycle, one message each or a single digest"""
+        for event in events:
+            metrics.ALERTS_QUEUED.inc(type=event['type'])
+
+        if len(events) == 1 or self.db.get_alert_mode(user_id) == 'instant':
+            for event in events:
+                if event['type'] == 'out_of_range':
+                    self.send_out_of_range_alert(user_id, event['wallet'], event['position'], event['pool_info'])
+                elif event['type'] == 'back_in_range':
+                    self.send_back_in_range_alert(user_id, event['wallet'], event['position'], event['pool_info'])
+                elif event['type'] == 'extended':
+                    self.send_extended_out_of_range_alert(user_id, event['wallet'], event['position'], event['pool_info'], event['hours_out'])
+                elif event['type'] == 'near_edge':
+                    self.send_near_edge_alert(user_id, event['wallet'], event['position'], event['pool_info'], event['side'], event['warning_pct'])
+            return
+
+        for chunk in self._format_alert_digest(events):
+            self.scheduler.send(user_id, chunk, PRIORITY_ALERT, parse_mode='Markdown')
+
+    def _format_alert_digest(self, events: List[Dict]) -> List[str]:
+        """Render a cycle's events as one digest, split only if it exceeds Telegram's message size"""
+        sections = [
+            ('out_of_range', "🚨 *Went out of range*"),
+            ('near_edge', "⚠️ *Near range edge*"),
+            ('extended', "⏰ *Still out of range*"),
+            ('back_in_range', "✅ *Back in range*")
+        ]
+
+        lines = []
+        for event_type, title in sections:
+            section_events = [e for e in events if e['type'] == event_type]
+            if not section_events:
+                continue
+
+            lines.append(f"\n{title} ({len(section_events)})")
+            for event in section_events:
+                position = event['position']
+                pool_info = event['pool_info']
+                wallet_display = self.db.get_wallet_display_name(event['wallet']['address'], event['wallet'].get('alias'))
+                token0_sym = position.get('token0_symbol', 'Token0')
+                token1_sym = position.get('token1_symbol', 'Token1')
+
+                line = f"• #{position['token_id']} {token0_sym}/{token1_sym} - {wallet_display}"
+                if event_type == 'out_of_range':
+                    side = "below" if pool_info['current_tick'] < position['tick_lower'] else "above"
+                    line += f" ({side})"
+                elif event_type == 'extended':
+                    line += f" ({format_duration(event['hours_out'] * 3600)})"
+                elif event_type == 'near_edge':
+                    line += f" ({event['side']} bound)"
+                lines.append(line)
+
+        header = f"🔔 *ALERT DIGEST* - {len(events)} update(s)\n"
+        footer = "\n\nUse /positions to view details."
+
+        chunks = []
+        current = header
+        for line in lines:
+            if len(current) + len(line) + len(footer) + 1 > MAX_MESSAGE_LENGTH:
+                chunks.append(current)
+                current = header
+            current += line + "\n"
+        chunks.append(current.rstrip("\n") + footer)
+
+        return chunks
+
+    def send_out_of_range_alert(self, user_id: int, wallet: Dict, position: Dict, pool_info: Dict):
         token0_sym = position.get('token0_symbol', 'Token0')
         token1_sym = position.get('token1_symbol', 'Token1')
         wallet_display = self.db.get_wallet_display_name(wallet['address'], wallet.get('alias'))
@@ -671,7 +1497,7 @@ class TelegramLPBot:
             f"🔄 Pair: *{token0_sym}/{token1_sym}*\n\n"
             f"📊 Range: {position['tick_lower']} to {position['tick_upper']}\n"
             f"🎯 Current Tick: {current_tick}\n"
-            f"💰 Current Price: ${pool_info['price']:.6f}\n\n"
+            f"💰 Current Price: {self._format_pool_price(position, pool_info)}\n\n"
         )
 
         if current_tick < position['tick_lower']:
@@ -681,16 +1507,31 @@ class TelegramLPBot:
 
         alert_msg += f"\nUse /positions to view details."
 
-        try:
-            await self.application.bot.send_message(
-                chat_id=user_id,
-                text=alert_msg,
-                parse_mode='Markdown'
-            )
-        except Exception as e:
-            print(f"Failed to send alert to {user_id}: {e}")
+        self.scheduler.send(user_id, alert_msg, PRIORITY_ALERT, parse_mode='Markdown')
 
-    async def send_back_in_range_alert(self, user_id: int, wallet: Dict, position: Dict, pool_info: Dict):
+    def send_near_edge_alert(self, user_id: int, wallet: Dict, position: Dict, pool_info: Dict, side: str, warning_pct: float):
+        """Send an early warning when the price gets within warning_pct of a range bound"""
+        token0_sym = position.get('token0_symbol', 'Token0')
+        token1_sym = position.get('token1_symbol', 'Token1')
+        wallet_display = self.db.get_wallet_display_name(wallet['address'], wallet.get('alias'))
+
+        current_tick = pool_info['current_tick']
+        edge_tick = position['tick_lower'] if side == 'lower' else position['tick_upper']
+
+        alert_msg = (
+            f"⚠️ *NEAR RANGE EDGE*\n\n"
+            f"💼 Wallet: {wallet_display}\n"
+            f"📌 Position #{position['token_id']}\n"
+            f"🔄 Pair: *{token0_sym}/{token1_sym}*\n\n"
+            f"📊 Range: {position['tick_lower']} to {position['tick_upper']}\n"
+            f"🎯 Current Tick: {current_tick} ({abs(current_tick - edge_tick)} ticks from the {side} bound)\n"
+            f"💰 Current Price: {self._format_pool_price(position, pool_info)}\n\n"
+            f"💡 Price is within {warning_pct:g}% of the {side} bound of your range."
+        )
+
+        self.scheduler.send(user_id, alert_msg, PRIORITY_ALERT, parse_mode='Markdown')
+
+    def send_back_in_range_alert(self, user_id: int, wallet: Dict, position: Dict, pool_info: Dict):
         """Send notification when position comes back in range"""
         token0_sym = position.get('token0_symbol', 'Token0')
         token1_sym = position.get('token1_symbol', 'Token1')
@@ -702,21 +1543,14 @@ class TelegramLPBot:
             f"📌 Position #{position['token_id']}\n"
             f"🔄 Pair: *{token0_sym}/{token1_sym}*\n\n"
             f"🎯 Current Tick: {pool_info['current_tick']}\n"
-            f"💰 Current Price: ${pool_info['price']:.6f}\n\n"
+            f"💰 Current Price: {self._format_pool_price(position, pool_info)}\n\n"
             f"✅ Your position is now actively earning fees again!"
         )
 
-        try:
-            await self.application.bot.send_message(
-                chat_id=user_id,
-                text=alert_msg,
-                parse_mode='Markdown'
-            )
-        except Exception as e:
-            print(f"Failed to send back in range alert to {user_id}: {e}")
+        self.scheduler.send(user_id, alert_msg, PRIORITY_ALERT, parse_mode='Markdown')
 
-    async def send_extended_out_of_range_alert(self, user_id: int, wallet: Dict, position: Dict, pool_info: Dict, hours_out: float):
-        """Send alert when position has been out of range for >4 hours"""
+    def send_extended_out_of_range_alert(self, user_id: int, wallet: Dict, position: Dict, pool_info: Dict, hours_out: float):
+        """Send a reminder when a position is still out of range at one of the user's escalation stages"""
         token0_sym = position.get('token0_symbol', 'Token0')
         token1_sym = position.get('token1_symbol', 'Token1')
         wallet_display = self.db.get_wallet_display_name(wallet['address'], wallet.get('alias'))
@@ -726,20 +1560,13 @@ class TelegramLPBot:
             f"💼 Wallet: {wallet_display}\n"
             f"📌 Position #{position['token_id']}\n"
             f"🔄 Pair: *{token0_sym}/{token1_sym}*\n\n"
-            f"⚠️ Out of range for *{hours_out:.1f} hours*\n\n"
+            f"⚠️ Out of range for *{format_duration(hours_out * 3600)}*\n\n"
             f"🎯 Current Tick: {pool_info['current_tick']}\n"
-            f"💰 Current Price: ${pool_info['price']:.6f}\n\n"
+            f"💰 Current Price: {self._format_pool_price(position, pool_info)}\n\n"
             f"💡 Consider adjusting your position range."
         )
 
-        try:
-            await self.application.bot.send_message(
-                chat_id=user_id,
-                text=alert_msg,
-                parse_mode='Markdown'
-            )
-        except Exception as e:
-            print(f"Failed to send extended alert to {user_id}: {e}")
+        self.scheduler.send(user_id, alert_msg, PRIORITY_ALERT, parse_mode='Markdown')
 
     async def cancel(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         context.user_data.clear()
@@ -757,13 +1584,16 @@ class TelegramLPBot:
             f"/start - Launch bot and show menu\n"
             f"/menu - Display main menu\n"
             f"/add - Add a new wallet\n"
+            f"/import - Add many wallets from a list or CSV\n"
             f"/wallets - Manage your wallets\n\n"
             f"📊 *Positions:*\n"
             f"/positions - View all LP positions\n"
-            f"/alerts - View OUT OF RANGE positions\n\n"
+            f"/alerts - View OUT OF RANGE positions\n"
+            f"/portfolio - Summary of all your wallets\n\n"
             f"🔔 *Notifications:*\n"
             f"• Managed via /wallets → 🔔 Notifications\n"
-            f"• Receive alerts when positions go OUT OF RANGE\n\n"
+            f"• Receive alerts when positions go OUT OF RANGE\n"
+            f"• Choose instant alerts or one digest per check\n\n"
             f"🎛️ *Admin Commands:*\n"
             f"/broadcast - Send message to all users (admin only)\n\n"
             f"💡 *Tip:* Use the buttons below for quick access!"
@@ -857,39 +1687,13 @@ class TelegramLPBot:
                 f"Progress: 0/{len(user_ids)}"
             )
 
-            success_count = 0
-            failed_count = 0
-
-            for idx, target_user_id in enumerate(user_ids):
-                try:
-                    await context.bot.send_message(
-                        chat_id=target_user_id,
-                        text=f"📢 *Announcement*\n\n{broadcast_message}",
-                        parse_mode='Markdown'
-                    )
-                    success_count += 1
-
-                    if (idx + 1) % 10 == 0 or (idx + 1) == len(user_ids):
-                        await status_msg.edit_text(
-                            f"📤 Sending broadcast...\n"
-                            f"Progress: {idx + 1}/{len(user_ids)}\n"
-                            f"✅ Success: {success_count}\n"
-                            f"❌ Failed: {failed_count}"
-                        )
-
-                    await asyncio.sleep(0.05)
-
-                except Exception as e:
-                    failed_count += 1
-                    print(f"Failed to send to {target_user_id}: {e}")
-
-            await status_msg.edit_text(
-                f"✅ *Broadcast Complete!*\n\n"
-                f"📊 Results:\n"
-                f"✅ Sent: {success_count}\n"
-                f"❌ Failed: {failed_count}\n"
-                f"📊 Total: {len(user_ids)}",
-                parse_mode='Markdown'
+            # The job runs in the background so the handler returns immediately
+            self.broadcasts.start_job(
+                user_id,
+                status_msg.chat_id,
+                status_msg.message_id,
+                f"📢 *Announcement*\n\n{broadcast_message}",
+                user_ids
             )
 
             context.user_data.clear()
@@ -906,8 +1710,163 @@ class TelegramLPBot:
         )
         return WAITING_ADDRESS
 
-    def run(self):
-        self.application = Application.builder().token(self.token).build()
+    async def import_start(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Bulk wallet import, from the text after /import or from the next message or CSV file"""
+        parts = (update.message.text or "").split(None, 1)
+        if len(parts) > 1:
+            await self._import_wallets(update, parts[1])
+            return ConversationHandler.END
+
+        await update.message.reply_text(
+            f"📥 *Import wallets*\n\n"
+            f"Paste your wallets, one per line, or upload a CSV file:\n"
+            f"`0x1234...abcd,Main wallet`\n"
+            f"`0x5678...ef01`\n\n"
+            f"Up to {MAX_IMPORT_WALLETS} wallets, the alias is optional.\n"
+            f"Send /cancel to abort.",
+            parse_mode='Markdown'
+        )
+        return WAITING_IMPORT
+
+    async def receive_import(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        document = update.message.document
+        if document:
+            if document.file_size and document.file_size > MAX_IMPORT_FILE_SIZE:
+                await update.message.reply_text(f"❌ File too large (max {MAX_IMPORT_FILE_SIZE // 1024} KB).")
+                return WAITING_IMPORT
+            file = await document.get_file()
+            text = bytes(await file.download_as_bytearray()).decode('utf-8', errors='replace')
+        else:
+            text = update.message.text
+
+        await self._import_wallets(update, text)
+        return ConversationHandler.END
+
+    async def _import_wallets(self, update: Update, text: str):
+        """
+        Validate a wallet list, count the positions of every wallet with one balanceOf batch per
+        protocol, register them in one transaction and load their positions in the background.
+        """
+        user_id = update.effective_user.id
+        entries, errors = parse_wallet_list(text)
+
+        if len(entries) > MAX_IMPORT_WALLETS:
+            await update.message.reply_text(
+                f"❌ {len(entries)} wallets found, at most {MAX_IMPORT_WALLETS} can be imported at once."
+            )
+            return
+        if not entries:
+            await update.message.reply_text(
+                "❌ No valid wallet found.\n" + "\n".join(errors[:IMPORT_ERRORS_SHOWN])
+            )
+            return
+
+        loading_msg = await update.message.reply_text(f"⏳ Checking {len(entries)} wallet(s)...")
+
+        try:
+            counts = await asyncio.to_thread(
+                self.trackers.get_wallets_position_counts, [address for address, _ in entries]
+            )
+            added = self.db.add_wallets(user_id, entries)
+        except Exception as e:
+            await loading_msg.edit_text(f"❌ Error: {str(e)}")
+            return
+
+        with_positions = [address for address in added if counts.get(address)]
+        unchecked = [address for address in added if counts.get(address) is None]
+
+        msg = "📥 Import finished\n\n"
+        msg += f"✅ Added: {len(added)} wallet(s)"
+        if added:
+            msg += f", {len(with_positions)} holding {sum(counts[a] for a in with_positions)} position NFT(s)"
+        msg += "\n"
+        if len(entries) > len(added):
+            msg += f"↩️ Already registered: {len(entries) - len(added)}\n"
+        if unchecked:
+            msg += f"⚠️ Could not be checked on-chain: {len(unchecked)}\n"
+        if errors:
+            msg += f"❌ Rejected: {len(errors)}\n"
+            msg += "".join(f"  • {error}\n" for error in errors[:IMPORT_ERRORS_SHOWN])
+            if len(errors) > IMPORT_ERRORS_SHOWN:
+                msg += f"  • ... and {len(errors) - IMPORT_ERRORS_SHOWN} more\n"
+        if with_positions:
+            msg += "\n⏳ Their positions are being loaded, alerts start with the next check."
+
+        await loading_msg.edit_text(msg)
+
+        if with_positions:
+            task = asyncio.create_task(self._warm_imported_wallets(user_id, with_positions))
+            self.import_tasks.add(task)
+            task.add_done_callback(self.import_tasks.discard)
+
+    async def _warm_imported_wallets(self, user_id: int, addresses: List[str]):
+        """
+        Seed the ownership index and the alert triggers of imported wallets, as a monitoring cycle
+        would, so the next cycle finds them refreshed instead of enumerating them all at once
+        """
+        wallets = {wallet['address']: wallet for wallet in self.db.get_user_wallets_for_monitoring(user_id)}
+        edge_warning_pct = self.db.get_edge_warning_pct(user_id)
+        semaphore = asyncio.Semaphore(IMPORT_WARM_CONCURRENCY)
+
+        async def _warm(address: str):
+            async with semaphore:
+                try:
+                    positions = await asyncio.to_thread(
+                        self.ownership.fetch_positions, self.trackers, address, self.wallet_tiers.head_blocks
+                    )
+                except Exception as e:
+                    print(f"Error while loading the positions of imported wallet {address}: {e}")
+                    return
+
+            self.wallet_tiers.refreshed(address, positions)
+            if address in wallets:
+                self.triggers.sync_wallet(user_id, wallets[address], positions, edge_warning_pct)
+
+        await asyncio.gather(*(_warm(address) for address in addresses))
+
+    async def post_init(self, application: Application):
+        self.scheduler = MessageScheduler(application.bot, self.db)
+        await self.scheduler.start()
+
+        self.broadcasts = BroadcastEngine(application.bot, self.db, self.scheduler)
+        self.broadcasts.resume_jobs()
+
+        if self.metrics_port:
+            self.metrics_server = await metrics.start_metrics_server("0.0.0.0", self.metrics_port)
+            print(f"📈 Metrics available on :{self.metrics_port}/metrics")
+
+        for chain_id, feed in self.block_feeds.items():
+            feed.start()
+            self.block_consumers.append(asyncio.create_task(self.consume_blocks(chain_id)))
+
+    async def post_shutdown(self, application: Application):
+        for feed in self.block_feeds.values():
+            await feed.stop()
+        for task in self.block_consumers:
+            task.cancel()
+        for task in list(self.import_tasks):
+            task.cancel()
+        if self.metrics_server:
+            self.metrics_server.close()
+        if self.rpc_recorder:
+            self.rpc_recorder.close()
+        if self.broadcasts:
+            await self.broadcasts.stop()
+        if self.scheduler:
+            await self.scheduler.stop()
+
+    def build_application(self, concurrent_updates: int = 1):
+        builder = (
+            Application.builder()
+            .token(self.token)
+            .concurrent_updates(concurrent_updates)
+            .post_init(self.post_init)
+            .post_shutdown(self.post_shutdown)
+        )
+        if self.api_base_url:
+            builder = builder.base_url(f"{self.api_base_url}/bot")
+
+        self.application = builder.build()
 
         add_wallet_handler = ConversationHandler(
             entry_points=[
@@ -938,13 +1897,26 @@ class TelegramLPBot:
             per_message=False
         )
 
+        import_handler = ConversationHandler(
+            entry_points=[CommandHandler("import", self.import_start)],
+            states={
+                WAITING_IMPORT: [
+                    MessageHandler((filters.TEXT & ~filters.COMMAND) | filters.Document.ALL, self.receive_import)
+                ]
+            },
+            fallbacks=[CommandHandler("cancel", self.cancel)],
+            per_message=False
+        )
+
         self.application.add_handler(add_wallet_handler)
         self.application.add_handler(broadcast_handler)
+        self.application.add_handler(import_handler)
         self.application.add_handler(CommandHandler("menu", self.show_menu))
         self.application.add_handler(CommandHandler("help", self.help_command))
         self.application.add_handler(CommandHandler("wallets", self.my_wallets))
         self.application.add_handler(CommandHandler("positions", self.view_positions))
         self.application.add_handler(CommandHandler("alerts", self.out_of_range_positions))
+        self.application.add_handler(CommandHandler("portfolio", self.portfolio))
         self.application.add_handler(CallbackQueryHandler(self.button_handler))
         self.application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, self.handle_text))
 
@@ -955,16 +1927,90 @@ class TelegramLPBot:
             first=60
         )
 
+    def run(self):
+        # Long polling delivers updates one batch at a time, handlers run sequentially
+        self.build_application()
+
         print("🤖 Bot started!")
+        if self.concurrent_updates > 1:
+            print("ℹ️ CONCURRENT_UPDATES only applies in webhook mode, updates are handled one at a time")
         print(f"🔍 Monitoring interval: {self.monitor_interval} minutes")
         self.application.run_polling(allowed_updates=Update.ALL_TYPES)
 
+    def run_webhook(self, webhook_url: str, port: int = 8080, secret_token: Optional[str] = None,
+                    path: str = "/telegram", host: str = "0.0.0.0", record_file: Optional[str] = None,
+                    max_connections: int = 40):
+        """
+        Receive updates through a webhook served by an embedded ASGI server instead of long polling.
+        max_connections is how many HTTPS connections Telegram opens to deliver updates, independent
+        of how many updates the application handles concurrently.
+        """
+        import uvicorn
+        from webhook_server import create_webhook_app
+
+        self.build_application(self.concurrent_updates)
+        webhook_app = create_webhook_app(self.application, path, secret_token, record_file)
+        server = uvicorn.Server(uvicorn.Config(webhook_app, host=host, port=port, log_level="warning"))
+
+        async def _serve():
+            await self.application.initialize()
+            # post_init/post_shutdown are only called automatically by run_polling/run_webhook
+            await self.post_init(self.application)
+            await self.application.bot.set_webhook(
+                url=f"{webhook_url.rstrip('/')}{path}",
+                secret_token=secret_token,
+                allowed_updates=Update.ALL_TYPES,
+                max_connections=min(max(max_connections, WEBHOOK_CONNECTIONS_RANGE[0]), WEBHOOK_CONNECTIONS_RANGE[1])
+            )
+            await self.application.start()
+
+            print("🤖 Bot started (webhook)!")
+            print(f"🌐 Listening on {host}:{port}{path}")
+            print(f"🔍 Monitoring interval: {self.monitor_interval} minutes")
+
+            try:
+                await server.serve()
+            finally:
+                await self.application.stop()
+                await self.post_shutdown(self.application)
+                await self.application.shutdown()
+
+        asyncio.run(_serve())
+
 
 if __name__ == "__main__":
     TELEGRAM_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN')
     RPC_URL = os.getenv('RPC_URL')
     CHAIN_ID = int(os.getenv('CHAIN_ID', '999'))
     MONITOR_INTERVAL = int(os.getenv('MONITOR_INTERVAL_MINUTES', '60'))
+    # Updates handled concurrently in webhook mode (opt-in, polling always handles them one at a time)
+    CONCURRENT_UPDATES = int(os.getenv('CONCURRENT_UPDATES', '1'))
+    TELEGRAM_API_BASE_URL = os.getenv('TELEGRAM_API_BASE_URL')
+
+    # Webhook mode is enabled when WEBHOOK_URL (public base URL of this service) is set
+    WEBHOOK_URL = os.getenv('WEBHOOK_URL')
+    WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', '/telegram')
+    WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET')
+    WEBHOOK_HOST = os.getenv('WEBHOOK_HOST', '0.0.0.0')
+    WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', os.getenv('PORT', '8080')))
+    WEBHOOK_RECORD_FILE = os.getenv('WEBHOOK_RECORD_FILE')
+    # Connections Telegram opens to deliver updates (1-100), separate from CONCURRENT_UPDATES
+    WEBHOOK_MAX_CONNECTIONS = int(os.getenv('WEBHOOK_MAX_CONNECTIONS', '40'))
+
+    # Prometheus /metrics, served by the webhook server in webhook mode or on METRICS_PORT
+    METRICS_PORT = int(os.getenv('METRICS_PORT', '0')) or None
+
+    # Reads issued by concurrent handlers within this window share one JSON-RPC batch request (0 disables)
+    RPC_BATCH_WINDOW_MS = float(os.getenv('RPC_BATCH_WINDOW_MS', '10'))
+
+    # Budget of slot0 reads spread over the pools by distance to the nearest range edge
+    POOL_READS = float(os.getenv('POOL_READS_PER_MINUTE', '60'))
+
+    # newHeads and pool Swap logs over WebSocket drive the pool checks, eth_blockNumber polling without it
+    WS_URL = os.getenv('WS_URL')
+
+    # Record every RPC request/response to replay it offline with benchmark.py --replay
+    RPC_RECORD_FILE = os.getenv('RPC_RECORD_FILE')
 
     admin_ids_str = os.getenv('ADMIN_USER_IDS', '')
     ADMIN_IDS = [int(id.strip()) for id in admin_ids_str.split(',') if id.strip().isdigit()]
@@ -976,5 +2022,18 @@ if __name__ == "__main__":
         print("❌ Error: RPC_URL not defined in .env")
         exit(1)
 
-    bot = TelegramLPBot(TELEGRAM_TOKEN, RPC_URL, CHAIN_ID, ADMIN_IDS, MONITOR_INTERVAL)
-    bot.run()
\ No newline at end of file
+    bot = TelegramLPBot(TELEGRAM_TOKEN, RPC_URL, CHAIN_ID, ADMIN_IDS, MONITOR_INTERVAL,
+                        concurrent_updates=CONCURRENT_UPDATES, api_base_url=TELEGRAM_API_BASE_URL,
+                        metrics_port=METRICS_PORT, rpc_batch_window=RPC_BATCH_WINDOW_MS / 1000,
+                        pool_reads_per_minute=POOL_READS, ws_url=WS_URL)
+
+    if RPC_RECORD_FILE:
+        import rpc_replay
+        bot.rpc_recorder = rpc_replay.record(bot.tracker, RPC_RECORD_FILE)
+        print(f"📼 Recording RPC traffic to {RPC_RECORD_FILE}")
+
+    if WEBHOOK_URL:
+        bot.run_webhook(WEBHOOK_URL, WEBHOOK_PORT, WEBHOOK_SECRET, WEBHOOK_PATH, WEBHOOK_HOST, WEBHOOK_RECORD_FILE,
+                        WEBHOOK_MAX_CONNECTIONS)
+    else:
+        bot.run()
\ No newline at end of file
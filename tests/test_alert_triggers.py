@@ -0,0 +1,13 @@
+from alert_triggers import OUT_ZONES, edge_warning_ticks, is_in_range, zone
+
+
+def test_zone_and_range_check_agree_on_the_bounds():
+    for warning_pct in (0.0, 5.0):
+        trigger = {'tick_lower': -100, 'tick_upper': 100}
+        trigger['warn_lower'], trigger['warn_upper'] = edge_warning_ticks(-100, 100, warning_pct)
+
+        for tick in range(-102, 103):
+            assert is_in_range(trigger, tick) == (zone(trigger, tick) not in OUT_ZONES), (warning_pct, tick)
+
+    assert is_in_range(trigger, 100) and is_in_range(trigger, -100)
+    assert not is_in_range(trigger, 101) and not is_in_range(trigger, -101)
@@ -0,0 +1,158 @@
+import asyncio
+
+import pytest
+
+import block_feed
+from block_feed import BlockFeed, CoalescingQueue
+from fake_rpc import FakeChain, FakeRpcServer, FakeWebSocketServer
+from PoolManager import LiquidityPoolTracker
+from rpc_client import checksum_address
+
+
+async def _wait_for(condition, timeout: float = 5.0):
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while not condition():
+        if loop.time() > deadline:
+            raise AssertionError("condition not met in time")
+        await asyncio.sleep(0.01)
+
+
+@pytest.fixture
+def chain():
+    return FakeChain(wallet_count=2, positions_per_wallet=1, pool_count=3)
+
+
+@pytest.fixture
+def tracker(chain):
+    server = FakeRpcServer(chain).start()
+    yield LiquidityPoolTracker(server.url, 999, delay_between_calls=0)
+    server.stop()
+
+
+def test_coalescing_queue_merges_pending_events():
+    async def _run():
+        queue = CoalescingQueue()
+        queue.put(10, ['0xa'])
+        queue.put(12, ['0xb'])
+        queue.put(11)
+        event = await queue.get()
+        assert event == {'block': 12, 'pools': {'0xa', '0xb'}, 'blocks': 3}
+
+        queue.put(13)
+        assert await queue.get() == {'block': 13, 'pools': set(), 'blocks': 1}
+
+    asyncio.run(_run())
+
+
+def test_new_heads_and_swap_logs(chain, tracker):
+    pool, other_pool = [checksum_address(address) for address in list(chain.pools)[:2]]
+
+    async def _run():
+        ws = await FakeWebSocketServer(chain).start()
+        feed = BlockFeed(tracker, ws.url, pools=lambda: [pool])
+        feed.start()
+        try:
+            await _wait_for(lambda: feed.mode == 'websocket' and len(ws.subscriptions) == 2)
+
+            # newHeads: a new block is published, here by a swap in a pool that is not followed
+            chain.move_pool(other_pool, 60)
+            event = await asyncio.wait_for(feed.queue.get(), 5)
+            assert event['block'] == chain.block_number
+
+            # Swap log: the pool state is updated from the log, without any read
+            chain.move_pool(pool, 600)
+            await _wait_for(lambda: pool in tracker.pool_state_cache)
+            assert tracker.pool_state_cache[pool][1]['current_tick'] == chain.pools[pool.lower()]['tick']
+            event = await asyncio.wait_for(feed.queue.get(), 5)
+            while pool not in event['pools']:
+                event = await asyncio.wait_for(feed.queue.get(), 5)
+            assert event['block'] == chain.block_number
+        finally:
+            await feed.stop()
+            await ws.stop()
+
+    asyncio.run(_run())
+
+
+def test_replaced_logs_subscription_is_unsubscribed(chain, tracker):
+    pools = [checksum_address(address) for address in chain.pools]
+    subscribed = [pools[0]]
+
+    async def _run():
+        # Subscribe answers arrive late, the pool set changes twice meanwhile
+        ws = await FakeWebSocketServer(chain, subscribe_delay=0.2).start()
+        feed = BlockFeed(tracker, ws.url, pools=lambda: list(subscribed))
+        feed.start()
+        try:
+            await _wait_for(lambda: feed.mode == 'websocket')
+            for count in (2, 3):
+                subscribed[:] = pools[:count]
+                chain.move_pool(pools[-1], 60)
+                await asyncio.sleep(0.05)
+
+            def _settled():
+                filters = [f for f in ws.subscriptions.values() if f is not None]
+                return len(ws.subscriptions) == 2 and len(filters) == 1 and filters[0]['address'] == sorted(pools)
+
+            await _wait_for(_settled)
+            await asyncio.sleep(0.3)
+            assert _settled()
+        finally:
+            await feed.stop()
+            await ws.stop()
+
+    asyncio.run(_run())
+
+
+def test_polls_with_backoff_while_websocket_is_down(chain, tracker, monkeypatch):
+    monkeypatch.setattr(block_feed, 'RECONNECT_DELAY', 0.1)
+    monkeypatch.setattr(block_feed, 'MAX_RECONNECT_DELAY', 0.4)
+
+    async def _run():
+        ws = await FakeWebSocketServer(chain).start()
+        url = ws.url
+        await ws.stop()
+
+        feed = BlockFeed(tracker, url, poll_interval=0.01)
+        delays = []
+        poll = feed._poll
+
+        async def _recording_poll(until=None):
+            delays.append(until - asyncio.get_running_loop().time())
+            await poll(until)
+
+        feed._poll = _recording_poll
+        feed.start()
+        try:
+            # Blocks keep being published by polling while the endpoint is down
+            event = await asyncio.wait_for(feed.queue.get(), 5)
+            assert event['block'] == chain.block_number
+            assert feed.mode == 'poll'
+
+            await _wait_for(lambda: len(delays) >= 4)
+        finally:
+            await feed.stop()
+
+        assert [round(delay, 1) for delay in delays[:4]] == [0.1, 0.2, 0.4, 0.4]
+
+    asyncio.run(_run())
+
+
+def test_reconnects_after_connection_drop(chain, tracker, monkeypatch):
+    monkeypatch.setattr(block_feed, 'RECONNECT_DELAY', 0.1)
+
+    async def _run():
+        ws = await FakeWebSocketServer(chain).start()
+        feed = BlockFeed(tracker, ws.url, poll_interval=0.01)
+        feed.start()
+        try:
+            await _wait_for(lambda: feed.mode == 'websocket')
+            await ws.close_connections()
+            await _wait_for(lambda: feed.mode == 'poll')
+            await _wait_for(lambda: feed.mode == 'websocket')
+        finally:
+            await feed.stop()
+            await ws.stop()
+
+    asyncio.run(_run())
@@ -0,0 +1,123 @@
+import asyncio
+
+import pytest
+
+import metrics
+from benchmark import StubScheduler
+from escalation import EscalationScheduler
+from fake_rpc import FakeChain, FakeRpcServer
+from telegram_bot import TelegramLPBot
+
+KEY = (1, '0xA', (999, 'projectx', 7))
+
+
+class StagesOnly:
+    """The escalation settings the scheduler loads, without stored alerts"""
+
+    def get_all_escalation_stages(self):
+        return {1: [15, 60]}
+
+    def get_out_of_range_alerts(self):
+        return []
+
+
+def _scheduler() -> EscalationScheduler:
+    scheduler = EscalationScheduler(StagesOnly())
+    scheduler.load()
+    scheduler.start(KEY, since=0)
+    return scheduler
+
+
+def test_stage_advances_only_once_sent():
+    scheduler = _scheduler()
+
+    assert scheduler.pop_due(now=15 * 60) == [(KEY, 0, 15, 15 * 60)]
+    assert scheduler.pop_due(now=15 * 60) == []
+    scheduler.sent(KEY, 0)
+
+    assert scheduler.pop_due(now=59 * 60) == []
+    assert scheduler.pop_due(now=60 * 60) == [(KEY, 1, 60, 60 * 60)]
+
+
+def test_unsent_reminder_is_retried_at_the_same_stage():
+    scheduler = _scheduler()
+    [(key, _, _, _)] = scheduler.pop_due(now=15 * 60)
+
+    scheduler.retry(key, delay=30, now=15 * 60)
+    assert scheduler.pop_due(now=15 * 60 + 29) == []
+    assert scheduler.pop_due(now=15 * 60 + 30) == [(KEY, 0, 15, 15 * 60 + 30)]
+
+
+def test_retry_of_a_position_back_in_range_is_dropped():
+    scheduler = _scheduler()
+    [(key, _, _, _)] = scheduler.pop_due(now=15 * 60)
+
+    scheduler.stop(key)
+    scheduler.retry(key, delay=0, now=15 * 60)
+    scheduler.sent(key, 0)
+    assert scheduler.pop_due(now=24 * 3600) == []
+
+
+@pytest.fixture
+def monitored_bot(tmp_path):
+    """Bot after one monitoring cycle of a fake chain, with out-of-range positions tracked for reminders"""
+    chain = FakeChain(wallet_count=8, positions_per_wallet=4)
+    server = FakeRpcServer(chain).start()
+    bot = TelegramLPBot("0:test", server.url, db_path=str(tmp_path / "bot.db"))
+    for tracker in bot.trackers.trackers.values():
+        tracker.delay = 0
+    bot.scheduler = StubScheduler()
+    bot.monitor_wallet_pause = 0
+    for wallet in chain.wallets:
+        bot.db.add_wallet(1, wallet)
+    asyncio.run(bot.monitor_positions(None))
+
+    yield bot
+    server.stop()
+
+
+def _alerted_wallets(bot):
+    return sorted({key[1] for key in bot.escalations.tracked})
+
+
+def _wallet_reminders(bot, wallet):
+    keys = [key for key in bot.escalations.tracked if key[1] == wallet]
+    assert keys
+    for key in keys:
+        bot.escalations.start(key, since=0)
+    return keys
+
+
+def test_reminders_of_dropped_positions_and_wallets_are_forgotten(monitored_bot):
+    bot = monitored_bot
+    closed, muted, unsynced = _alerted_wallets(bot)[:3]
+
+    # Positions closed or transferred away are no longer in their synced wallet
+    closed_keys = _wallet_reminders(bot, closed)
+    bot.triggers.sync_wallet(1, {'address': closed}, [], 0.0)
+    # A muted wallet is dropped from the trigger index by the next cycle
+    muted_keys = _wallet_reminders(bot, muted)
+    bot.db.toggle_notifications(1, muted, False)
+    # A monitored wallet not synced yet, as after a restart
+    unsynced_keys = _wallet_reminders(bot, unsynced)
+    bot.triggers.retain_wallets([(1, closed)])
+
+    assert bot._due_escalations({}, metrics.PhaseTimer()) == {}
+
+    alerted = {(alert['wallet_address'], alert['position']) for alert in bot.db.get_out_of_range_alerts()}
+    for key in closed_keys + muted_keys:
+        assert not bot.escalations.is_out_of_range(key) and key[1:] not in alerted
+    for key in unsynced_keys:
+        assert bot.escalations.is_out_of_range(key) and key[1:] in alerted
+
+
+def test_deleted_wallets_lose_their_alert_rows(monitored_bot):
+    bot = monitored_bot
+    wallet = _alerted_wallets(bot)[0]
+    assert any(alert['wallet_address'] == wallet for alert in bot.db.get_out_of_range_alerts())
+
+    bot.db.delete_wallet(1, wallet)
+    bot.escalations.stop_wallet(1, wallet)
+
+    assert not any(alert['wallet_address'] == wallet for alert in bot.db.get_out_of_range_alerts())
+    assert not any(key[1] == wallet for key in bot.escalations.tracked)
@@ -0,0 +1,84 @@
+import pytest
+
+import log_scanner
+from log_scanner import CEILING_RESET_CHUNKS, LogScanner
+from rpc_client import RpcError
+
+
+class StubNode:
+    """eth_getLogs endpoint with a log every 10 blocks, refusing ranges over `max_range` and failing scripted requests"""
+
+    def __init__(self, max_range=None):
+        self.max_range = max_range
+        self.failures = []
+        self.requests = 0
+
+    def request_batch(self, requests, method):
+        responses = []
+        for _, [params] in requests:
+            self.requests += 1
+            start, end = int(params['fromBlock'], 16), int(params['toBlock'], 16)
+            if self.failures:
+                responses.append(RpcError(self.failures.pop(0)))
+            elif self.max_range and end - start + 1 > self.max_range:
+                responses.append(RpcError({'code': -32602, 'message': f"block range is too large, max {self.max_range}"}))
+            else:
+                responses.append([{'blockNumber': block} for block in _expected(start, end)])
+        return responses
+
+
+@pytest.fixture(autouse=True)
+def no_retry_delay(monkeypatch):
+    monkeypatch.setattr(log_scanner, 'RETRY_DELAY', 0)
+
+
+def _expected(start, end):
+    return [block for block in range(start, end + 1) if block % 10 == 0]
+
+
+def _blocks(scanner, start, end):
+    return [log['blockNumber'] for log in scanner.fetch(start, end)]
+
+
+def test_transient_errors_are_retried_without_shrinking_the_window():
+    node = StubNode()
+    scanner = LogScanner(node, "0x0", [], concurrency=1)
+    window = scanner.chunk_blocks
+
+    # A head block the node has not seen yet, on the short tail of a scan
+    node.failures = [{'code': -32000, 'message': "header not found"}, {'code': -32005, 'message': "rate limited"}]
+    assert _blocks(scanner, 100, 119) == _expected(100, 119)
+    assert (scanner.chunk_blocks, scanner.chunk_ceiling) == (window, log_scanner.MAX_CHUNK_BLOCKS)
+
+    node.requests = 0
+    assert _blocks(scanner, 120, 10_119) == _expected(120, 10_119)
+    assert node.requests <= 5
+
+    node.failures = [{'code': -32000, 'message': "header not found"}] * (log_scanner.TRANSIENT_RETRIES + 1)
+    with pytest.raises(RpcError):
+        scanner.fetch(10_120, 10_130)
+
+
+def test_range_limit_sets_a_ceiling_that_is_lifted_later():
+    node = StubNode(max_range=500)
+    scanner = LogScanner(node, "0x0", [], concurrency=1)
+
+    assert _blocks(scanner, 0, 9_999) == _expected(0, 9_999)
+    assert scanner.chunk_ceiling < 1000
+
+    # A refused tail chunk shrinks the window but is not evidence of the limit
+    ceiling = scanner.chunk_ceiling
+    scanner.chunk_blocks = 1000
+    assert _blocks(scanner, 10_000, 10_599) == _expected(10_000, 10_599)
+    assert scanner.chunk_ceiling == ceiling
+
+    # The endpoint's limit is raised: after enough full-size chunks the window grows past the old ceiling
+    node.max_range = None
+    start = 10_600
+    for _ in range(CEILING_RESET_CHUNKS + 1):
+        end = start + scanner.chunk_blocks - 1
+        assert _blocks(scanner, start, end) == _expected(start, end)
+        start = end + 1
+    assert scanner.chunk_ceiling == log_scanner.MAX_CHUNK_BLOCKS
+    _blocks(scanner, start, start + 100_000)
+    assert scanner.chunk_blocks > ceiling
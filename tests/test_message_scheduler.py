@@ -0,0 +1,65 @@
+import asyncio
+import time
+
+from telegram.error import RetryAfter
+
+from message_scheduler import PRIORITY_ALERT, PRIORITY_BROADCAST, PRIORITY_NORMAL, MessageScheduler
+
+
+class RecordingBot:
+    """Bot recording when each message is sent, raising RetryAfter for the first `flood` sends"""
+
+    def __init__(self, flood: float = 0):
+        self.sent = []
+        self.flood = flood
+
+    async def send_message(self, chat_id, text, parse_mode=None):
+        if self.flood:
+            retry_after, self.flood = self.flood, 0
+            raise RetryAfter(retry_after)
+        self.sent.append((time.monotonic(), chat_id, text))
+
+
+class NoStore:
+    def get_pending_outbound_messages(self):
+        return []
+
+
+async def _deliver(bot, messages, per_chat_rate=20):
+    scheduler = MessageScheduler(bot, NoStore(), global_rate=1000, per_chat_rate=per_chat_rate)
+    await scheduler.start()
+    futures = [scheduler.send(chat_id, text, priority, persist=False) for chat_id, text, priority in messages]
+    await asyncio.wait_for(asyncio.gather(*futures), timeout=5)
+    await scheduler.stop()
+
+
+def test_chat_messages_are_released_in_order_one_per_token():
+    bot = RecordingBot()
+    messages = [(1, f"m{i}", PRIORITY_BROADCAST) for i in range(4)] + [(2, "other", PRIORITY_BROADCAST), (1, "alert", PRIORITY_ALERT)]
+    asyncio.run(_deliver(bot, messages))
+
+    chat = [(at, text) for at, chat_id, text in bot.sent if chat_id == 1]
+    # The alert jumps ahead of the parked broadcasts, which keep their order
+    assert [text for _, text in chat] == ["alert", "m0", "m1", "m2", "m3"]
+    assert all(later - earlier >= 0.045 for (earlier, _), (later, _) in zip(chat, chat[1:]))
+    # The other chat is not held back by the parked messages
+    assert bot.sent[1][1:] == (2, "other")
+
+
+def test_retry_after_pauses_every_chat():
+    bot = RecordingBot(flood=0.3)
+
+    async def flood_then_other_chat():
+        scheduler = MessageScheduler(bot, NoStore(), global_rate=1000)
+        await scheduler.start()
+        first = scheduler.send(1, "first", PRIORITY_ALERT, persist=False)
+        await asyncio.sleep(0.05)
+        flooded = time.monotonic()
+        await asyncio.wait_for(asyncio.gather(first, scheduler.send(2, "second", PRIORITY_NORMAL, persist=False)), timeout=5)
+        await scheduler.stop()
+        return flooded
+
+    flooded = asyncio.run(flood_then_other_chat())
+    assert sorted(text for _, _, text in bot.sent) == ["first", "second"]
+    # The other chat waited for the flood control pause too
+    assert min(at for at, _, _ in bot.sent) - flooded >= 0.2
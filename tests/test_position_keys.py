@@ -0,0 +1,128 @@
+import asyncio
+import sqlite3
+
+import pytest
+
+import protocols
+from benchmark import StubScheduler
+from database import Database
+from fake_rpc import FACTORY, POSITION_MANAGER, FakeChain, FakeRpcServer
+from pool_polling import PoolPollScheduler
+from telegram_bot import TelegramLPBot
+
+
+@pytest.fixture
+def mirrored_bot(monkeypatch, tmp_path):
+    """Bot monitoring the fake chain twice: as projectx on chain 999 and as a mirror protocol on chain 998"""
+    chain = FakeChain(wallet_count=2, positions_per_wallet=3)
+    primary, mirror = FakeRpcServer(chain).start(), FakeRpcServer(chain).start()
+
+    monkeypatch.setitem(protocols.CHAINS, 998, {'chain_id': 998, 'name': "Mirror", 'rpc_urls': [mirror.url], 'delay': 0})
+    monkeypatch.setattr(protocols, 'PROTOCOLS', protocols.PROTOCOLS + [{
+        'name': "mirror", 'label': "Mirror", 'chain_id': 998, 'position_manager': POSITION_MANAGER,
+        'factory': FACTORY, 'init_code_hash': None, 'multicall': None,
+    }])
+
+    bot = TelegramLPBot("0:test", primary.url, db_path=str(tmp_path / "bot.db"))
+    for tracker in bot.trackers.trackers.values():
+        tracker.delay = 0
+    bot.scheduler = StubScheduler()
+    bot.monitor_wallet_pause = 0
+    bot.pool_polls = PoolPollScheduler(60, max_interval=0, min_interval=0)
+    for user_id, wallet in enumerate(chain.wallets, 1):
+        bot.db.add_wallet(user_id, wallet)
+
+    yield bot, chain
+    primary.stop()
+    mirror.stop()
+
+
+def test_colliding_token_ids_are_monitored_per_protocol(mirrored_bot):
+    bot, chain = mirrored_bot
+    asyncio.run(bot.monitor_positions(None))
+
+    for user_id, wallet in enumerate(chain.wallets, 1):
+        positions = bot.triggers.wallet_positions(user_id, wallet)
+        open_ids = sorted(token_id for token_id in chain.owned[wallet.lower()] if chain.positions[token_id][7])
+        for chain_id, protocol in ((999, 'projectx'), (998, 'mirror')):
+            assert sorted(p['token_id'] for p in positions if (p['chain_id'], p['protocol']) == (chain_id, protocol)) == open_ids
+            assert bot.db.get_owned_token_ids(chain_id, protocol, wallet, include_closed=True) == sorted(chain.owned[wallet.lower()])
+
+    # Every out-of-range position is alerted once per protocol
+    alerts = bot.db.get_out_of_range_alerts()
+    projectx = sorted(a['position'][2] for a in alerts if a['position'][:2] == (999, 'projectx'))
+    mirror = sorted(a['position'][2] for a in alerts if a['position'][:2] == (998, 'mirror'))
+    assert projectx and projectx == mirror
+    assert len(bot.escalations.tracked) == len(alerts)
+    assert {chain_id for chain_id, _ in bot.triggers.pools()} == {998, 999}
+
+
+def test_portfolio_values_add_up_every_protocol(mirrored_bot):
+    bot, chain = mirrored_bot
+    for tracker in bot.trackers.trackers.values():
+        tracker.prices.stablecoins = {token.lower() for token in chain.tokens}
+    asyncio.run(bot.monitor_positions(None))
+
+    primary = bot.trackers.trackers[999]
+    for user_id, wallet in enumerate(chain.wallets, 1):
+        positions = bot.triggers.wallet_positions(user_id, wallet)
+        projectx = sum(
+            bot._position_value(p, primary.pool_state_cache[p['pool_address']][1])
+            for p in positions if p['protocol'] == 'projectx'
+        )
+        assert projectx > 0
+        assert bot._portfolio_values(user_id)[wallet] == pytest.approx(2 * projectx)
+
+
+def test_legacy_rows_are_rekeyed_to_the_legacy_protocol(tmp_path):
+    path = str(tmp_path / "legacy.db")
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE position_alerts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER NOT NULL, wallet_address TEXT NOT NULL,
+            position_id INTEGER NOT NULL, alert_type TEXT NOT NULL, alerted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            out_of_range_since TIMESTAMP, UNIQUE(user_id, wallet_address, position_id, alert_type)
+        );
+        CREATE TABLE position_owners (
+            token_id INTEGER PRIMARY KEY, owner TEXT NOT NULL, closed BOOLEAN NOT NULL DEFAULT 0, updated_block INTEGER NOT NULL
+        );
+        CREATE TABLE sync_checkpoints (name TEXT PRIMARY KEY, block_number INTEGER NOT NULL, updated_at TIMESTAMP);
+        INSERT INTO position_alerts (user_id, wallet_address, position_id, alert_type, out_of_range_since)
+            VALUES (1, '0xA', 7, 'out_of_range', '2026-01-01T00:00:00');
+        INSERT INTO position_owners VALUES (7, '0xA', 0, 100);
+        INSERT INTO sync_checkpoints (name, block_number) VALUES ('owners:0xA', 100), ('wallet_activity', 120);
+    """)
+    conn.close()
+
+    db = Database(path)
+    legacy = (protocols.LEGACY_CHAIN_ID, protocols.LEGACY_PROTOCOL)
+
+    assert db.has_been_alerted(1, '0xA', legacy + (7,))
+    assert not db.has_been_alerted(1, '0xA', (998, 'mirror', 7))
+    assert [alert['position'] for alert in db.get_out_of_range_alerts()] == [legacy + (7,)]
+    assert db.get_indexed_owners() == [legacy + ('0xA',)]
+    assert db.get_owned_token_ids(*legacy, '0xA') == [7]
+    assert db.get_sync_checkpoint(f"wallet_activity:{legacy[0]}:{legacy[1]}") == 120
+
+    # The same token ID on another protocol is a different position
+    db.mark_as_alerted(1, '0xA', (998, 'mirror', 7))
+    db.replace_owned_tokens(998, 'mirror', '0xA', [7], 130)
+    assert len(db.get_out_of_range_alerts()) == 2
+    assert db.get_owned_token_ids(*legacy, '0xA') == [7]
+
+
+def test_position_details_are_valued_in_usd_when_priced(mirrored_bot):
+    bot, chain = mirrored_bot
+    primary = bot.trackers.trackers[999]
+    primary.prices.stablecoins = {token.lower() for token in chain.tokens}
+    asyncio.run(bot.monitor_positions(None))
+
+    position = next(p for p in bot.triggers.wallet_positions(1, chain.wallets[0]) if p['protocol'] == 'projectx')
+    pool_info = primary.pool_state_cache[position['pool_address']][1]
+    details = {'position': position, 'pool_info': pool_info, 'fees': None}
+    assert f"Value: {bot._format_usd(bot._position_value(position, pool_info))}" in bot._format_position_details(details)
+
+    # Without a route to a stablecoin the value stays in token1
+    primary.prices.stablecoins = set()
+    primary.prices.built_at = None
+    assert f"{position['token1_symbol']}\n" in bot._format_position_details(details).split("Value: ")[1]
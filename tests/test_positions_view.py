@@ -0,0 +1,82 @@
+import asyncio
+import itertools
+from types import SimpleNamespace
+
+import pytest
+
+from fake_rpc import FakeChain, FakeRpcServer
+from telegram_bot import TelegramLPBot
+
+message_ids = itertools.count(1)
+
+
+class FakeMessage:
+    """Chat message recording its latest text and buttons"""
+
+    def __init__(self, text=""):
+        self.message_id = next(message_ids)
+        self.text = text
+        self.buttons = []
+        self.replies = []
+
+    async def reply_text(self, text, **kwargs):
+        self.replies.append(FakeMessage(text))
+        return self.replies[-1]
+
+    async def edit_text(self, text, reply_markup=None, **kwargs):
+        self.text = text
+        if reply_markup is not None:
+            self.buttons = [button.callback_data for row in reply_markup.inline_keyboard for button in row]
+
+
+def _press(bot, context, message, data):
+    async def answer():
+        pass
+
+    query = SimpleNamespace(data=data, message=message, from_user=SimpleNamespace(id=1), answer=answer)
+    update = SimpleNamespace(callback_query=query, effective_user=SimpleNamespace(id=1))
+    return bot.button_handler(update, context)
+
+
+@pytest.fixture
+def bot(tmp_path):
+    chain = FakeChain(wallet_count=2, positions_per_wallet=7)
+    server = FakeRpcServer(chain).start()
+    bot = TelegramLPBot("0:test", server.url, db_path=str(tmp_path / "bot.db"))
+    for tracker in bot.trackers.trackers.values():
+        tracker.delay = 0
+    for wallet in chain.wallets:
+        bot.db.add_wallet(1, wallet)
+    yield bot, chain.wallets
+    server.stop()
+
+
+async def _open_positions(bot, context, wallet):
+    bot.db.set_active_wallet(1, wallet)
+    chat = FakeMessage()
+    update = SimpleNamespace(callback_query=None, message=chat, effective_user=SimpleNamespace(id=1))
+    await bot.view_positions(update, context)
+    return chat.replies[0]
+
+
+def test_each_positions_message_pages_its_own_wallet(bot):
+    bot, (first, second) = bot
+    context = SimpleNamespace(user_data={})
+    first_name, second_name = bot.db.get_wallet_display_name(first), bot.db.get_wallet_display_name(second)
+
+    async def _run():
+        first_msg = await _open_positions(bot, context, first)
+        second_msg = await _open_positions(bot, context, second)
+        assert first_name in first_msg.text and second_name in second_msg.text
+
+        # Paging the older message keeps showing its wallet, not the latest one opened
+        next_page = next(data for data in first_msg.buttons if data.startswith('positions_page_1_'))
+        await _press(bot, context, first_msg, next_page)
+        assert first_name in first_msg.text and "page 2/" in first_msg.text
+
+        # After a restart the view is reloaded for the wallet in the callback data
+        context.user_data.clear()
+        await _press(bot, context, first_msg, next_page.replace('positions_page_1_', 'positions_page_0_'))
+        assert first_name in first_msg.text and "page 1/" in first_msg.text
+
+    asyncio.run(_run())
@@ -0,0 +1,71 @@
+import math
+
+import pytest
+
+from price_oracle import PriceOracle
+
+USDC = "0x00000000000000000000000000000000000000c0"
+FAKE_USDC = "0x00000000000000000000000000000000000000f0"
+HYPE = "0x00000000000000000000000000000000000000a1"
+UBTC = "0x00000000000000000000000000000000000000b1"
+
+
+class PoolCaches:
+    """The tracker caches the oracle reads, filled by hand"""
+
+    def __init__(self):
+        self.pool_tokens = {}
+        self.pool_state_cache = {}
+        self.pool_liquidity = {}
+        self.pool_state_version = 0
+        self.token_info_cache = {
+            USDC: {'symbol': 'USDC', 'decimals': 6},
+            FAKE_USDC: {'symbol': 'USDC', 'decimals': 6},
+            HYPE: {'symbol': 'HYPE', 'decimals': 18},
+            UBTC: {'symbol': 'UBTC', 'decimals': 8},
+        }
+
+    def add_pool(self, pool: str, token0: str, token1: str, price: float, liquidity: int = 0):
+        """Pool quoting `price` token1 per token0, in whole tokens"""
+        decimals0 = self.token_info_cache[token0]['decimals']
+        decimals1 = self.token_info_cache[token1]['decimals']
+        sqrt_price_x96 = int(math.sqrt(price * 10 ** (decimals1 - decimals0)) * 2 ** 96)
+        self.pool_tokens[pool] = (token0, token1)
+        self.pool_state_cache[pool] = (0, {'sqrt_price_x96': sqrt_price_x96})
+        if liquidity:
+            self.pool_liquidity[pool] = (0, liquidity)
+        self.pool_state_version += 1
+
+
+def test_stablecoins_are_only_trusted_by_address():
+    caches = PoolCaches()
+    caches.add_pool("0x1", HYPE, FAKE_USDC, 1000.0)
+    caches.add_pool("0x2", HYPE, USDC, 40.0)
+
+    assert PriceOracle(caches, [USDC]).usd_price(HYPE) == pytest.approx(40.0)
+    assert PriceOracle(caches, [USDC]).usd_price(FAKE_USDC) == pytest.approx(0.04)
+    assert PriceOracle(caches).usd_prices() == {}
+
+
+def test_prices_follow_the_deepest_route():
+    caches = PoolCaches()
+    caches.add_pool("0x1", HYPE, USDC, 40.0, liquidity=10 ** 20)
+    # UBTC quoted at 50,000 by a thin direct pool, at 100,000 through the deep HYPE pools
+    caches.add_pool("0x2", UBTC, USDC, 50_000.0, liquidity=10 ** 9)
+    caches.add_pool("0x3", UBTC, HYPE, 2_500.0, liquidity=10 ** 18)
+    oracle = PriceOracle(caches, [USDC])
+
+    assert oracle.usd_price(UBTC) == pytest.approx(100_000.0)
+
+    # The direct pool becomes the deepest route once its liquidity grows
+    caches.pool_liquidity["0x2"] = (0, 10 ** 22)
+    caches.pool_state_version += 1
+    assert oracle.usd_price(UBTC) == pytest.approx(50_000.0)
+
+
+def test_pools_without_known_liquidity_are_a_last_resort():
+    caches = PoolCaches()
+    caches.add_pool("0x1", HYPE, USDC, 40.0)
+    caches.add_pool("0x2", UBTC, HYPE, 2_500.0)
+
+    assert PriceOracle(caches, [USDC]).usd_price(UBTC) == pytest.approx(100_000.0)
@@ -0,0 +1,11 @@
+from benchmark import overhead_calls
+
+
+def test_rpc_client_decodes_like_web3():
+    _, _, calls = overhead_calls()
+
+    for name, (web3_call, lean_call, _) in calls.items():
+        expected, result = web3_call(), lean_call()
+        if isinstance(expected, (list, tuple)):
+            expected, result = list(expected), list(result)
+        assert result == expected, name
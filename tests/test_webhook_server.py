@@ -0,0 +1,26 @@
+import asyncio
+import json
+
+from starlette.testclient import TestClient
+from telegram.ext import Application
+
+from webhook_server import create_webhook_app
+
+UPDATE = {'update_id': 1, 'message': {'message_id': 1, 'date': 0, 'chat': {'id': 1, 'type': 'private'}, 'text': "/start"}}
+
+
+def test_invalid_updates_are_rejected_and_recorded_updates_are_flushed(tmp_path):
+    application = Application.builder().token("0:test").build()
+    record_file = tmp_path / "updates.jsonl"
+    app = create_webhook_app(application, "/telegram", record_file=str(record_file))
+
+    with TestClient(app) as client:
+        assert client.post("/telegram", content=b"not json").status_code == 400
+        assert client.post("/telegram", json={}).status_code == 400
+        assert client.post("/telegram", json=[1, 2]).status_code == 400
+        assert client.post("/telegram", json=UPDATE).status_code == 200
+
+    # Only the valid update was queued and recorded, and the file is closed with the lifespan
+    assert application.update_queue.qsize() == 1
+    assert asyncio.run(application.update_queue.get()).update_id == 1
+    assert [json.loads(line) for line in record_file.read_text().splitlines()] == [UPDATE]
@@ -0,0 +1,164 @@
+"""
+Trackers of every registered chain, queried together.
+
+Each chain of the protocol registry gets its own LiquidityPoolTracker, with its own RPC pool,
+throttling and caches, so a slow or rate-limited chain never holds back the others. Wallet
+queries are fanned out to every protocol at once, one worker per protocol, and merged: the time
+of a query is that of the slowest protocol rather than the sum.
+"""
+
+import queue
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import protocols as registry
+from PoolManager import LiquidityPoolTracker
+
+
+class TrackerManager:
+    """One tracker per chain, with helpers running a wallet query against every protocol in parallel"""
+
+    def __init__(self, primary_chain_id: int = 999, rpc_urls: Optional[Dict[int, str]] = None,
+                 batch_window: float = 0, protocols: Optional[List[Dict]] = None, delay_between_calls: Optional[float] = None):
+        """
+        rpc_urls overrides the first URL of the RPC pool of some chains (e.g. RPC_URL for the
+        primary chain). The primary chain's tracker is the one the monitor uses.
+        """
+        self.protocols = list(protocols if protocols is not None else registry.PROTOCOLS)
+        # Protocols of the primary chain come first, its first protocol is the default one
+        self.protocols.sort(key=lambda p: p['chain_id'] != primary_chain_id)
+        rpc_urls = rpc_urls or {}
+
+        self.trackers: Dict[int, LiquidityPoolTracker] = {}
+        for chain_id in dict.fromkeys([primary_chain_id] + [p['chain_id'] for p in self.protocols]):
+            chain = registry.CHAINS.get(chain_id, {'rpc_urls': [], 'delay': 1.0})
+            urls = list(chain['rpc_urls'])
+            if chain_id in rpc_urls:
+                urls = [rpc_urls[chain_id]] + [url for url in urls if url != rpc_urls[chain_id]]
+            if not urls:
+                print(f"No RPC URL for chain {chain_id}, its protocols are skipped")
+                continue
+
+            self.trackers[chain_id] = LiquidityPoolTracker(
+                urls[0], chain_id,
+                delay_between_calls=chain['delay'] if delay_between_calls is None else delay_between_calls,
+                batch_window=batch_window,
+                protocols=[p for p in self.protocols if p['chain_id'] == chain_id],
+                fallback_urls=tuple(urls[1:])
+            )
+
+        self.protocols = [p for p in self.protocols if p['chain_id'] in self.trackers]
+        self.primary = self.trackers[primary_chain_id]
+        self.executor = ThreadPoolExecutor(max_workers=max(4, len(self.protocols)), thread_name_prefix="tracker")
+
+    def protocol(self, name: Optional[str] = None) -> Dict:
+        """Registered protocol by name, the default protocol if name is None"""
+        if name is None:
+            return self.protocols[0]
+        for protocol in self.protocols:
+            if protocol['name'] == name:
+                return protocol
+        raise ValueError(f"Unknown protocol {name}")
+
+    def tracker_for(self, protocol: Dict) -> LiquidityPoolTracker:
+        return self.trackers[protocol['chain_id']]
+
+    def map_protocols(self, func: Callable[[LiquidityPoolTracker, Dict], object]) -> Dict[str, object]:
+        """Run func(tracker, protocol) for every protocol in parallel; protocol name -> result or exception"""
+        futures = {p['name']: self.executor.submit(func, self.tracker_for(p), p) for p in self.protocols}
+        results = {}
+        for name, future in futures.items():
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                results[name] = e
+        return results
+
+    def get_position_counts(self, wallet_address: str) -> Dict[str, Optional[int]]:
+        """Number of position NFTs of a wallet per protocol, None where it could not be read"""
+        results = self.map_protocols(
+            lambda tracker, protocol: tracker.get_position_count(wallet_address, protocol['position_manager'])
+        )
+        for name, result in results.items():
+            if isinstance(result, Exception):
+                print(f"Error while counting positions of {wallet_address} on {name}: {result}")
+        return {name: None if isinstance(result, Exception) else result for name, result in results.items()}
+
+    def get_wallets_position_counts(self, wallet_addresses: List[str]) -> Dict[str, Optional[int]]:
+        """
+        Number of position NFTs of several wallets over every protocol, with one balanceOf batch
+        per protocol. None for wallets that could not be read on some protocol.
+        """
+        results = self.map_protocols(
+            lambda tracker, protocol: tracker.get_position_counts(wallet_addresses, protocol['position_manager'])
+        )
+
+        totals = {address: 0 for address in wallet_addresses}
+        for name, result in results.items():
+            if isinstance(result, Exception):
+                print(f"Error while counting positions on {name}: {result}")
+                result = {}
+            for address in wallet_addresses:
+                count = result.get(address)
+                totals[address] = None if count is None or totals[address] is None else totals[address] + count
+        return totals
+
+    def get_positions(self, wallet_address: str, include_pool_info: bool = True) -> List[Dict]:
+        """Open positions of a wallet on every protocol, in registry order"""
+        results = self.map_protocols(
+            lambda tracker, protocol: tracker.get_positions(wallet_address, protocol['position_manager'], include_pool_info)
+        )
+        return [position for result in results.values() if not isinstance(result, Exception) for position in result]
+
+    def get_wallets_positions(self, wallet_addresses: List[str]) -> Dict[str, Optional[List[Dict]]]:
+        """
+        Open positions of several wallets on every protocol, batched across the wallets and read
+        in parallel across the protocols. None for wallets that could not be read on some protocol.
+        """
+        results = self.map_protocols(
+            lambda tracker, protocol: tracker.get_wallets_positions(wallet_addresses, protocol['position_manager'])
+        )
+
+        wallets = {address: [] for address in wallet_addresses}
+        for name, result in results.items():
+            if isinstance(result, Exception):
+                print(f"Error while fetching positions on {name}: {result}")
+                result = {}
+            for address in wallet_addresses:
+                positions = result.get(address)
+                if positions is None or wallets[address] is None:
+                    wallets[address] = None
+                else:
+                    wallets[address].extend(positions)
+        return wallets
+
+    def iter_positions(self, wallet_address: str, windows: List[Tuple[str, int, int, int]],
+                       include_closed: bool = False) -> Iterator[Tuple[LiquidityPoolTracker, Dict]]:
+        """
+        Stream (tracker, position) for (protocol name, start, count, balance) owner index windows,
+        the protocols being read in parallel and their positions yielded as they arrive.
+        """
+        results = queue.Queue()
+        done = object()
+
+        def _produce(protocol: Dict, start: int, count: int, balance: int):
+            tracker = self.tracker_for(protocol)
+            try:
+                for position in tracker.iter_positions(wallet_address, protocol['position_manager'], start=start,
+                                                       count=count, balance=balance, include_closed=include_closed):
+                    results.put((tracker, position))
+            except Exception as e:
+                print(f"Error while fetching positions of {wallet_address} on {protocol['name']}: {e}")
+            finally:
+                results.put(done)
+
+        for name, start, count, balance in windows:
+            self.executor.submit(_produce, self.protocol(name), start, count, balance)
+
+        remaining = len(windows)
+        while remaining:
+            item = results.get()
+            if item is done:
+                remaining -= 1
+            else:
+                yield item
@@ -0,0 +1,61 @@
+"""
+Parsing of bulk wallet imports.
+
+A wallet list is pasted as text or uploaded as a CSV file, one wallet per line:
+
+    0x1234...abcd
+    0x1234...abcd,Main wallet
+    0x1234...abcd;Main wallet
+    0x1234...abcd Main wallet
+
+A header line (first field "address") and blank lines are skipped. Addresses are checked against
+their EIP-55 checksum when they are mixed-case, and repeated addresses keep the first alias given.
+"""
+
+import csv
+import io
+from typing import Dict, List, Optional, Tuple
+
+from rpc_client import checksum_address, has_valid_checksum, is_address
+
+MAX_IMPORT_WALLETS = 200  # Wallets accepted per import, larger lists are refused
+MAX_IMPORT_FILE_SIZE = 256 * 1024
+MAX_ALIAS_LENGTH = 64
+
+
+def _split_line(line: str) -> List[str]:
+    delimiter = next((d for d in (',', ';', '\t') if d in line), None)
+    if delimiter is None:
+        return line.split(None, 1)
+    return next(csv.reader([line], delimiter=delimiter))
+
+
+def parse_wallet_list(text: str) -> Tuple[List[Tuple[str, Optional[str]]], List[str]]:
+    """
+    Parse a wallet list. Returns the (checksummed address, alias or None) entries, in order and
+    without duplicates, and the errors of the rejected lines.
+    """
+    entries: Dict[str, Optional[str]] = {}
+    errors = []
+
+    for line_number, line in enumerate(io.StringIO(text.lstrip('\ufeff')), start=1):
+        line = line.strip()
+        if not line:
+            continue
+
+        fields = [field.strip() for field in _split_line(line)]
+        address = fields[0] if fields else ""
+        alias = fields[1][:MAX_ALIAS_LENGTH] if len(fields) > 1 and fields[1] else None
+
+        if line_number == 1 and address.lower() == 'address':
+            continue
+        if not is_address(address):
+            errors.append(f"line {line_number}: invalid address {address[:20]!r}")
+            continue
+        if not has_valid_checksum(address):
+            errors.append(f"line {line_number}: bad checksum for {address}")
+            continue
+
+        entries.setdefault(checksum_address(address), alias)
+
+    return list(entries.items()), errors
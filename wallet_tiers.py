@@ -0,0 +1,197 @@
+"""
+Tiered refresh of the monitored wallets.
+
+Positions only change through the position manager: NFT transfers, IncreaseLiquidity and
+DecreaseLiquidity. Each monitoring cycle reads those events once for all wallets, and the
+positions of a wallet are only read again when
+
+  - it had activity since its last refresh (or its balanceOf changed, when logs cannot be read),
+  - it was not refreshed yet by this process, since the alert trigger index lives in memory,
+  - its back-off expired: hot wallets (recent changes) every cycle, warm wallets (open positions)
+    after 1, 2, 4 and at most 8 cycles without change, cold wallets (no open position) after up
+    to 64 cycles.
+
+Dormant wallets cost no RPC call besides their share of the log requests, read by a checkpointed
+LogScanner per protocol that replays the last blocks after a reorg. Other consumers of the same
+events (the ownership index) subscribe through `listeners`.
+"""
+
+import hashlib
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from protocols import position_key
+
+HOT, WARM, COLD = 'hot', 'warm', 'cold'
+HOT_REFRESHES = 2  # Refreshes without change before a wallet leaves the hot tier
+MAX_BACKOFF = {HOT: 0, WARM: 3, COLD: 6}  # Exponent of the longest refresh interval, in cycles
+MAX_SCAN_BLOCKS = 50_000  # Further behind than this (bot stopped for a long time), every wallet is refreshed instead
+CHECKPOINT = 'wallet_activity'
+
+
+def positions_hash(positions: List[Dict]) -> str:
+    """Fingerprint of what the monitor uses from a wallet's positions (fees are left out)"""
+    signature = sorted((position_key(p), p['liquidity'], p['tick_lower'], p['tick_upper']) for p in positions)
+    return hashlib.sha1(repr(signature).encode()).hexdigest()
+
+
+class WalletTiers:
+    """Refresh state of every wallet seen by the monitor, persisted in wallet_sync_state"""
+
+    def __init__(self, db, cycle_seconds: float):
+        self.db = db
+        self.cycle_seconds = cycle_seconds
+        self.lock = threading.Lock()
+        self.states: Dict[str, Dict] = db.get_wallet_sync_states()
+        self.active: Set[str] = set()
+        self.refreshed_here: Set[str] = set()
+        self.head_blocks: Dict[str, int] = {}  # Block of the last successful scan, per protocol name
+        self.token_owners: Dict[Tuple, str] = {}  # position_key -> wallet
+        # LogScanners of the position manager events per protocol name, created on their first scan
+        self.scanners: Dict[str, object] = {}
+        # Objects with apply_events(events) -> wallets to refresh, and reset(protocol) when events were missed
+        self.listeners: List = []
+
+    @staticmethod
+    def tier(state: Dict) -> str:
+        if state['unchanged_refreshes'] < HOT_REFRESHES:
+            return HOT
+        return WARM if state['open_positions'] else COLD
+
+    def next_refresh_at(self, state: Dict) -> float:
+        tier = self.tier(state)
+        exponent = min(state['unchanged_refreshes'] - HOT_REFRESHES + 1, MAX_BACKOFF[tier]) if tier != HOT else 0
+        return state['refreshed_at'] + self.cycle_seconds * 2 ** exponent
+
+    def needs_refresh(self, address: str, now: Optional[float] = None) -> bool:
+        now = now if now is not None else time.time()
+
+        with self.lock:
+            state = self.states.get(address)
+            if state is None or address in self.active or address not in self.refreshed_here:
+                return True
+            # Half a cycle of slack, cycles do not start at exact intervals
+            return now >= self.next_refresh_at(state) - self.cycle_seconds / 2
+
+    def refreshed(self, address: str, positions: List[Dict]):
+        """Record a full refresh of a wallet and back off if nothing changed"""
+        fingerprint = positions_hash(positions)
+
+        with self.lock:
+            state = self.states.get(address) or {
+                'address': address, 'open_positions': 0, 'positions_hash': None, 'balance': None,
+                'last_activity_block': None, 'unchanged_refreshes': 0, 'refreshed_at': None
+            }
+
+            changed = address in self.active or state['positions_hash'] != fingerprint
+            state['unchanged_refreshes'] = 0 if changed else state['unchanged_refreshes'] + 1
+            state['open_positions'] = len(positions)
+            state['positions_hash'] = fingerprint
+            state['refreshed_at'] = time.time()
+
+            self.states[address] = state
+            self.active.discard(address)
+            self.refreshed_here.add(address)
+            for position in positions:
+                self.token_owners[position_key(position)] = address
+
+        self.db.save_wallet_sync_state(state)
+
+    def apply_events(self, events: List[Dict]) -> Set[str]:
+        """Mark the known wallets touched by position manager events as active, returns them"""
+        active = set()
+        for listener in self.listeners:
+            active |= {address for address in listener.apply_events(events) if address in self.states}
+
+        with self.lock:
+            for event in events:
+                if event['event'] == 'Transfer':
+                    addresses = (event['from'], event['to'])
+                    if event['to'] in self.states:
+                        self.token_owners[position_key(event)] = event['to']
+                else:
+                    addresses = (self.token_owners.get(position_key(event)),)
+
+                for address in addresses:
+                    if address in self.states:
+                        self.states[address]['last_activity_block'] = event['block']
+                        active.add(address)
+
+            self.active |= active
+
+        for address in active:
+            self.db.save_wallet_sync_state(self.states[address])
+        return active
+
+    def apply_balances(self, balances: Dict[str, Optional[int]]) -> Set[str]:
+        """Mark the known wallets whose balanceOf changed as active, returns them"""
+        active = set()
+
+        with self.lock:
+            for address, balance in balances.items():
+                state = self.states.get(address)
+                if state is None or balance is None:
+                    continue
+                if state['balance'] is not None and state['balance'] != balance:
+                    active.add(address)
+                state['balance'] = balance
+
+            self.active |= active
+
+        for address in balances:
+            if address in self.states:
+                self.db.save_wallet_sync_state(self.states[address])
+        return active
+
+    def scan(self, trackers, addresses: Iterable[str]) -> Set[str]:
+        """
+        Find the wallets with position manager activity since the previous scan, on every protocol
+        of a TrackerManager in parallel. Blocking, meant to run in a worker thread once per
+        monitoring cycle. Returns the active wallets.
+        """
+        active = set()
+        active_lock = threading.Lock()
+
+        def _scan(tracker, protocol: Dict) -> int:
+            name = protocol['name']
+            if name not in self.scanners:
+                self.scanners[name] = tracker.position_event_scanner(
+                    self.db, f"{CHECKPOINT}:{protocol['chain_id']}:{name}",
+                    position_manager_address=protocol['position_manager'], max_lag=MAX_SCAN_BLOCKS
+                )
+
+            def _apply(events: List[Dict]):
+                touched = self.apply_events(events)
+                with active_lock:
+                    active.update(touched)
+
+            def _rollback(block: Optional[int]):
+                # After a reorg the orphaned events cannot be undone, and after a gap they were never
+                # seen: every wallet is refreshed and the listeners start over on this protocol
+                with self.lock:
+                    self.active |= set(self.states)
+                with active_lock:
+                    active.update(self.states)
+                for listener in self.listeners:
+                    listener.reset(protocol)
+
+            return self.scanners[name].scan(_apply, _rollback)
+
+        failed = []
+        for name, result in trackers.map_protocols(_scan).items():
+            if isinstance(result, Exception):
+                self.head_blocks.pop(name, None)
+                failed.append(name)
+                print(f"Error while scanning wallet activity on {name}, checking balances instead: {result}")
+            else:
+                self.head_blocks[name] = result
+
+        if not failed:
+            return active
+
+        # Wallets refreshed this cycle anyway do not need the check
+        candidates = [address for address in dict.fromkeys(addresses) if not self.needs_refresh(address)]
+        if not candidates:
+            return active
+        return active | self.apply_balances(trackers.get_wallets_position_counts(candidates))
@@ -0,0 +1,168 @@
+﻿"""
+Replay recorded Telegram updates against a running bot in webhook mode and report latencies.
+
+Record updates by running the bot with WEBHOOK_RECORD_FILE set, then:
+
+    1. python webhook_loadtest.py --updates updates.jsonl --webhook-url http://127.0.0.1:8080/telegram
+    2. start the bot with WEBHOOK_URL=http://127.0.0.1:8080 and TELEGRAM_API_BASE_URL=http://127.0.0.1:8081
+
+The script serves a stub Bot API on --stub-port. Every replayed update gets a unique chat/user id,
+so the first Bot API call the bot makes for that chat marks the end of its handler (handler latency).
+The time to get the webhook's HTTP response is reported as ack latency.
+"""
+
+import argparse
+import asyncio
+import copy
+import json
+import time
+from typing import Dict, List
+
+import aiohttp
+from aiohttp import web
+
+SYNTHETIC_ID_BASE = 9_000_000_000
+
+
+class StubBotApi:
+    """Minimal Bot API answering every method with a plausible result and timestamping replies per chat"""
+
+    def __init__(self):
+        self.first_reply_at: Dict[int, float] = {}
+        self.calls = 0
+
+    async def handle(self, request: web.Request) -> web.Response:
+        self.calls += 1
+        method = request.match_info['method']
+
+        try:
+            params = await request.json()
+        except Exception:
+            params = dict(await request.post())
+
+        chat_id = params.get('chat_id')
+        if chat_id is None and params.get('callback_query_id'):
+            chat_id = int(params['callback_query_id'])
+        if chat_id is not None:
+            self.first_reply_at.setdefault(int(chat_id), time.perf_counter())
+
+        if method == 'getMe':
+            result = {'id': 1, 'is_bot': True, 'first_name': 'Stub', 'username': 'stub_bot',
+                      'can_join_groups': False, 'can_read_all_group_messages': False, 'supports_inline_queries': False}
+        elif method in ('sendMessage', 'editMessageText'):
+            result = {'message_id': 1, 'date': int(time.time()),
+                      'chat': {'id': int(chat_id or 0), 'type': 'private'}, 'text': params.get('text', '')}
+        else:
+            result = True
+
+        return web.json_response({'ok': True, 'result': result})
+
+
+def rewrite_ids(update: Dict, update_id: int, synthetic_id: int) -> Dict:
+    """Give a recorded update a fresh update_id and a unique chat/user id"""
+    update = copy.deepcopy(update)
+    update['update_id'] = update_id
+
+    for key in ('message', 'edited_message', 'callback_query'):
+        payload = update.get(key)
+        if not payload:
+            continue
+        if 'from' in payload:
+            payload['from']['id'] = synthetic_id
+        message = payload.get('message', payload)
+        if 'chat' in message:
+            message['chat']['id'] = synthetic_id
+        if key == 'callback_query':
+            payload['id'] = str(synthetic_id)
+
+    return update
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return values[index]
+
+
+async def wait_for_bot(session: aiohttp.ClientSession, webhook_url: str):
+    health_url = webhook_url.rsplit('/', 1)[0] + '/healthz'
+    print(f"Waiting for the bot at {health_url}...")
+    while True:
+        try:
+            async with session.get(health_url) as response:
+                if response.status == 200:
+                    return
+        except aiohttp.ClientError:
+            pass
+        await asyncio.sleep(0.5)
+
+
+async def replay(args):
+    with open(args.updates, encoding='utf-8') as f:
+        recorded = [json.loads(line) for line in f if line.strip()]
+    if not recorded:
+        print("No updates to replay")
+        return
+
+    stub = StubBotApi()
+    stub_app = web.Application()
+    stub_app.router.add_post('/bot{token}/{method}', stub.handle)
+    runner = web.AppRunner(stub_app)
+    await runner.setup()
+    await web.TCPSite(runner, '127.0.0.1', args.stub_port).start()
+    print(f"Stub Bot API listening on http://127.0.0.1:{args.stub_port}")
+
+    headers = {'X-Telegram-Bot-Api-Secret-Token': args.secret} if args.secret else {}
+    semaphore = asyncio.Semaphore(args.concurrency)
+    sent_at: Dict[int, float] = {}
+    ack_latencies = []
+
+    async with aiohttp.ClientSession() as session:
+        await wait_for_bot(session, args.webhook_url)
+
+        async def _post(n: int, update: Dict):
+            synthetic_id = SYNTHETIC_ID_BASE + n
+            payload = rewrite_ids(update, n + 1, synthetic_id)
+            async with semaphore:
+                start = time.perf_counter()
+                sent_at[synthetic_id] = start
+                async with session.post(args.webhook_url, json=payload, headers=headers) as response:
+                    await response.read()
+                    if response.status != 200:
+                        print(f"Update {n} rejected with HTTP {response.status}")
+                ack_latencies.append(time.perf_counter() - start)
+
+        total = len(recorded) * args.repeat
+        started = time.perf_counter()
+        await asyncio.gather(*[_post(n, recorded[n % len(recorded)]) for n in range(total)])
+
+        # Give handlers time to reach their first Bot API call
+        deadline = time.perf_counter() + args.drain_timeout
+        while len(stub.first_reply_at) < total and time.perf_counter() < deadline:
+            await asyncio.sleep(0.1)
+        elapsed = time.perf_counter() - started
+
+    await runner.cleanup()
+
+    handler_latencies = [stub.first_reply_at[chat_id] - sent for chat_id, sent in sent_at.items()
+                         if chat_id in stub.first_reply_at]
+
+    print(f"\nReplayed {total} updates in {elapsed:.2f}s ({total / elapsed:.1f} updates/s), concurrency {args.concurrency}")
+    print(f"Ack latency     p50: {percentile(ack_latencies, 50) * 1000:.1f} ms  p99: {percentile(ack_latencies, 99) * 1000:.1f} ms")
+    print(f"Handler latency p50: {percentile(handler_latencies, 50) * 1000:.1f} ms  p99: {percentile(handler_latencies, 99) * 1000:.1f} ms"
+          f"  ({len(handler_latencies)}/{total} handled)")
+    print(f"Bot API calls: {stub.calls}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay recorded updates against the bot webhook")
+    parser.add_argument('--updates', required=True, help="JSON lines file written through WEBHOOK_RECORD_FILE")
+    parser.add_argument('--webhook-url', default='http://127.0.0.1:8080/telegram')
+    parser.add_argument('--secret', default=None, help="WEBHOOK_SECRET of the bot")
+    parser.add_argument('--stub-port', type=int, default=8081)
+    parser.add_argument('--concurrency', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=10, help="Number of times the recorded updates are replayed")
+    parser.add_argument('--drain-timeout', type=float, default=30.0)
+    asyncio.run(replay(parser.parse_args()))
@@ -0,0 +1,73 @@
+﻿import contextlib
+import hmac
+import json
+from typing import Optional
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse, Response
+from starlette.routing import Route
+from telegram import Update
+from telegram.ext import Application
+
+import metrics
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+def create_webhook_app(application: Application, path: str, secret_token: Optional[str] = None,
+                       record_file: Optional[str] = None) -> Starlette:
+    """
+    ASGI app receiving Telegram updates.
+
+    Updates are validated against the secret token, then put on the application's update queue
+    so they are processed by PTB (concurrently when concurrent_updates is enabled) while the
+    request is acknowledged right away. Bodies that are not a valid update get a 400. If
+    record_file is set, raw updates are appended to it as JSON lines so they can be replayed by
+    webhook_loadtest.py; the file is opened and closed with the app's lifespan.
+    """
+    record = None
+
+    async def telegram_webhook(request: Request) -> Response:
+        if secret_token:
+            received = request.headers.get(SECRET_HEADER, '')
+            if not hmac.compare_digest(received, secret_token):
+                return Response(status_code=403)
+
+        try:
+            data = await request.json()
+            update = Update.de_json(data, application.bot)
+        except Exception as e:
+            print(f"Invalid webhook update: {e}")
+            return Response(status_code=400)
+
+        if record:
+            record.write(json.dumps(data) + "\n")
+            record.flush()
+
+        await application.update_queue.put(update)
+        return Response()
+
+    async def healthcheck(request: Request) -> PlainTextResponse:
+        return PlainTextResponse("ok")
+
+    async def metrics_endpoint(request: Request) -> PlainTextResponse:
+        return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+    @contextlib.asynccontextmanager
+    async def lifespan(app: Starlette):
+        nonlocal record
+        if record_file:
+            record = open(record_file, 'a', encoding='utf-8')
+        try:
+            yield
+        finally:
+            if record:
+                record.close()
+                record = None
+
+    return Starlette(routes=[
+        Route(path, telegram_webhook, methods=["POST"]),
+        Route("/healthz", healthcheck, methods=["GET"]),
+        Route("/metrics", metrics_endpoint, methods=["GET"]),
+    ], lifespan=lifespan)